@@ -0,0 +1,321 @@
+# alertas.py - ALERTAS POR SERIE (Z-SCORE MOVEL, QUEBRA NA VARIACAO ANUAL, MUDANCA DE NIVEL)
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import configuracao
+import esquema
+import metricas
+import tipos
+from previsoes import codigos_periodo, indices_periodo
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+CAMINHO_FEED = configuracao.caminho_dados('alertas', 'alertas.json')
+
+# Uma serie = uma tabela SIDRA, uma variavel, um territorio
+CHAVE_SERIE = ['tabela', 'D2C', 'D1C']
+
+# Janela do z-score em meses (8 trimestres ou 24 trimestres moveis); tambem e o
+# numero de valores guardados por serie (cobre o mesmo periodo do ano anterior)
+JANELA_MESES = 24
+# Valores minimos na janela para calcular o z-score
+MINIMO_JANELA = 4
+
+Z_ALERTA = 2.5
+Z_ALTA = 3.5
+
+# Quebra na variacao anual: troca de sinal com salto de pelo menos isto (p.p.);
+# a partir de SALTO_ALTA a severidade e alta
+SALTO_VARIACAO_ANUAL = 0.5
+SALTO_ALTA = 1.5
+
+TIPOS = ['zscore', 'quebra_anual', 'nivel']
+
+# Alertas levados ao feed JSON (os mais recentes)
+MAXIMO_FEED = 500
+
+
+def garantir_tabelas(conn):
+    """estado_alertas: ultimos valores de cada serie (janela movel); alertas: um por (serie, periodo, tipo)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS estado_alertas (
+            tabela TEXT NOT NULL,
+            D2C TEXT NOT NULL,
+            D1C TEXT NOT NULL,
+            ultimo_periodo TEXT NOT NULL,
+            janela TEXT NOT NULL,
+            media REAL,
+            desvio REAL,
+            atualizado_em TEXT NOT NULL,
+            PRIMARY KEY (tabela, D2C, D1C)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS alertas (
+            tabela TEXT NOT NULL,
+            D2C TEXT NOT NULL,
+            D1C TEXT NOT NULL,
+            D3C TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            severidade TEXT NOT NULL,
+            direcao TEXT,
+            valor REAL,
+            referencia REAL,
+            medida REAL,
+            mensagem TEXT NOT NULL,
+            criado_em TEXT NOT NULL,
+            PRIMARY KEY (tabela, D2C, D1C, D3C, tipo)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alertas_criado_em ON alertas (criado_em)")
+
+    # bancos anteriores a coluna direcao: em quebra_anual a severidade guardava a direcao
+    colunas = {coluna for _, coluna, *_ in conn.execute("PRAGMA table_info(alertas)")}
+    if 'direcao' not in colunas:
+        with conn:
+            conn.execute("ALTER TABLE alertas ADD COLUMN direcao TEXT")
+            conn.execute(f"""
+                UPDATE alertas SET
+                    direcao = CASE tipo
+                        WHEN 'quebra_anual' THEN severidade
+                        WHEN 'zscore' THEN CASE WHEN medida > 0 THEN 'alta' ELSE 'baixa' END
+                        ELSE CASE WHEN medida > referencia THEN 'alta' ELSE 'baixa' END
+                    END,
+                    severidade = CASE WHEN tipo <> 'quebra_anual' THEN severidade
+                        WHEN ABS(medida) >= {SALTO_ALTA} THEN 'alta' ELSE 'media' END
+            """)
+
+
+def _nivel(valores):
+    """Codigo do nivel_desocupacao (0 Baixa, 1 Moderada, 2 Alta; -1 sem valor)"""
+    baixa, alta = valores <= metricas.LIMITES_NIVEL[0], valores > metricas.LIMITES_NIVEL[1]
+    return np.where(np.isnan(valores), -1, np.select([baixa, alta], [0, 2], default=1))
+
+
+def avaliar(matriz, inicio, fim, passo):
+    """Alertas das colunas inicio..fim-1 de cada linha; colunas anteriores sao o historico
+
+    matriz: (series, colunas) com periodos consecutivos (NaN sem valor); a
+    janela do z-score sao as `janela` colunas antes de cada valor. O laco e so
+    nas colunas novas; cada passo e vetorizado nas series. Devolve lista de
+    arrays (linha, coluna, tipo, severidade, direcao, valor, referencia, medida);
+    direcao e 'alta' ou 'baixa' (sentido do movimento da taxa).
+    """
+    janela = JANELA_MESES // passo
+    defasagem = 12 // passo
+    alertas = []
+    for coluna in range(int(inicio.min()), int(fim.max())):
+        nova = (coluna >= inicio) & (coluna < fim)
+        valor = matriz[:, coluna]
+        nova &= ~np.isnan(valor)
+        if not nova.any():
+            continue
+
+        # z-score contra a janela anterior
+        anteriores = matriz[:, coluna - janela:coluna]
+        n = (~np.isnan(anteriores)).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            media = np.nansum(anteriores, axis=1) / n
+            desvio = np.sqrt(np.nansum((anteriores - media[:, None]) ** 2, axis=1) / (n - 1))
+            z = (valor - media) / desvio
+        disparou = nova & (n >= MINIMO_JANELA) & (desvio > 0) & (np.abs(z) >= Z_ALERTA)
+        alertas.append((disparou, coluna, 'zscore', np.where(np.abs(z) >= Z_ALTA, 'alta', 'media'),
+                        np.where(z > 0, 'alta', 'baixa'), valor, media, z))
+
+        # variacao anual (p.p.) troca de sinal com salto relevante
+        # (arredondada: ruido de ponto flutuante nao troca o sinal de uma variacao nula)
+        anual = np.round(valor - matriz[:, coluna - defasagem], 6)
+        anual_anterior = np.round(matriz[:, coluna - 1] - matriz[:, coluna - 1 - defasagem], 6)
+        disparou = nova & (np.sign(anual) * np.sign(anual_anterior) < 0) & (
+            np.abs(anual - anual_anterior) >= SALTO_VARIACAO_ANUAL
+        )
+        salto = anual - anual_anterior
+        alertas.append((disparou, coluna, 'quebra_anual', np.where(np.abs(salto) >= SALTO_ALTA, 'alta', 'media'),
+                        np.where(anual > 0, 'alta', 'baixa'), anual, anual_anterior, salto))
+
+        # mudanca de faixa do nivel_desocupacao
+        nivel, nivel_anterior = _nivel(valor), _nivel(matriz[:, coluna - 1])
+        disparou = nova & (nivel_anterior >= 0) & (nivel != nivel_anterior)
+        severidade = np.select([nivel == 2, nivel > nivel_anterior], ['alta', 'media'], 'baixa')
+        alertas.append((disparou, coluna, 'nivel', severidade, np.where(nivel > nivel_anterior, 'alta', 'baixa'),
+                        valor, nivel_anterior.astype(float), nivel))
+
+    return [
+        (np.flatnonzero(disparou), coluna, tipo, severidade[disparou], direcao[disparou], valor[disparou],
+         referencia[disparou], medida[disparou])
+        for disparou, coluna, tipo, severidade, direcao, valor, referencia, medida in alertas if disparou.any()
+    ]
+
+
+def _mensagem(tipo, valor, referencia, medida):
+    if tipo == 'zscore':
+        return f"Taxa de {valor:.1f}% a {medida:+.1f} desvios da media movel ({referencia:.1f}%)"
+    if tipo == 'quebra_anual':
+        return f"Variacao anual passou de {referencia:+.1f} p.p. para {valor:+.1f} p.p."
+    return (f"Nivel de desocupacao passou de {metricas.NIVEIS[int(referencia)]} para "
+            f"{metricas.NIVEIS[int(medida)]} ({valor:.1f}%)")
+
+
+def _preparar(df):
+    """Chave, indice sequencial do periodo e taxa, ordenado por serie e periodo"""
+    dados = pd.DataFrame({coluna: df[coluna].astype(str).to_numpy() for coluna in CHAVE_SERIE + ['D3C']})
+    dados['indice'], dados['passo'] = indices_periodo(dados['D3C'], dados['tabela'])
+    dados['valor'] = tipos.para_float64(df['taxa_desocupacao']).to_numpy()
+    return dados
+
+
+def _avaliar_periodicidade(dados, estado, passo):
+    """Alertas e novo estado das series de um mesmo passo (meses entre periodos)
+
+    Na matriz, as `janela` primeiras colunas sao os valores guardados (ate o
+    ultimo periodo avaliado, `base`) e as seguintes os periodos novos; so
+    estes entram na matriz a partir de dados.
+    """
+    janela = JANELA_MESES // passo
+    series = dados.groupby(CHAVE_SERIE, sort=True)['indice'].agg(['min', 'max'])
+    series = series.join(estado, how='left')
+    conhecida = series['ultimo_periodo'].notna().to_numpy()
+
+    base = series['min'].to_numpy() - 1
+    if conhecida.any():
+        tabelas = series.index.get_level_values('tabela')[conhecida]
+        base[conhecida] = indices_periodo(series.loc[conhecida, 'ultimo_periodo'], tabelas)[0]
+    fim = janela + series['max'].to_numpy() - base
+    com_novos = fim > janela
+    series, base, fim = series[com_novos], base[com_novos], fim[com_novos]
+    if series.empty:
+        return None, None
+
+    # coluna c <-> periodo base - janela + 1 + c
+    linha = pd.Series(np.arange(len(series)), index=series.index)
+    chaves_dados = pd.MultiIndex.from_frame(dados[CHAVE_SERIE])
+    dados = dados[chaves_dados.isin(series.index)]
+    posicao = linha[pd.MultiIndex.from_frame(dados[CHAVE_SERIE])].to_numpy()
+    coluna = janela - 1 + dados['indice'].to_numpy() - base[posicao]
+    novos = coluna >= janela
+
+    matriz = np.full((len(series), int(fim.max())), np.nan)
+    matriz[posicao[novos], coluna[novos]] = dados['valor'].to_numpy()[novos]
+    guardadas = series['janela'].to_numpy()
+    for i in np.flatnonzero(series['janela'].notna().to_numpy()):
+        matriz[i, :janela] = np.array(json.loads(guardadas[i]), dtype=np.float64)
+
+    chaves = series.index.to_frame(index=False)
+    alertas = []
+    for linhas, coluna_alerta, tipo, severidade, direcao, valor, referencia, medida in avaliar(
+            matriz, np.full(len(series), janela), fim, passo):
+        alertas.append(chaves.iloc[linhas].assign(
+            D3C=codigos_periodo(base[linhas] - janela + 1 + coluna_alerta, passo),
+            tipo=tipo, severidade=severidade, direcao=direcao, valor=valor, referencia=referencia, medida=medida
+        ))
+
+    # ultimos `janela` valores de cada serie: o estado da proxima avaliacao
+    nova_janela = np.take_along_axis(matriz, fim[:, None] - janela + np.arange(janela), axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n = (~np.isnan(nova_janela)).sum(axis=1)
+        media = np.nansum(nova_janela, axis=1) / n
+        desvio = np.sqrt(np.nansum((nova_janela - media[:, None]) ** 2, axis=1) / (n - 1))
+    novo_estado = chaves.assign(
+        ultimo_periodo=codigos_periodo(series['max'].to_numpy(), passo),
+        janela=[json.dumps([None if np.isnan(x) else round(float(x), 6) for x in valores]) for valores in nova_janela],
+        media=media, desvio=desvio
+    )
+    return (pd.concat(alertas, ignore_index=True) if alertas else None), novo_estado
+
+
+def _linhas_sql(df):
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def atualizar_alertas(conn, df, caminho_feed=CAMINHO_FEED):
+    """Avalia so os periodos posteriores ao ultimo avaliado de cada serie
+
+    A janela movel de cada serie vem de estado_alertas (nao do historico),
+    entao o custo acompanha os periodos novos. Serie sem estado e avaliada
+    desde o inicio. Revisoes de periodos ja avaliados nao reabrem alertas.
+    Grava os alertas novos em `alertas` e no feed JSON; devolve os alertas novos.
+    """
+    garantir_tabelas(conn)
+    dados = _preparar(df)
+    estado = pd.read_sql("SELECT tabela, D2C, D1C, ultimo_periodo, janela FROM estado_alertas", conn)
+    estado = estado.set_index(CHAVE_SERIE)
+
+    # so as linhas depois do ultimo periodo avaliado da serie (comparacao de texto no D3C)
+    ultimo = estado['ultimo_periodo'].reindex(pd.MultiIndex.from_frame(dados[CHAVE_SERIE])).to_numpy()
+    conhecida = pd.notna(ultimo)
+    dados = dados[~conhecida | (dados['D3C'].to_numpy() > np.where(conhecida, ultimo, ''))]
+
+    alertas, estados = [], []
+    for passo in np.unique(dados['passo']):
+        novos, novo_estado = _avaliar_periodicidade(dados[dados['passo'] == passo], estado, int(passo))
+        if novos is not None:
+            alertas.append(novos)
+        if novo_estado is not None:
+            estados.append(novo_estado)
+
+    colunas = CHAVE_SERIE + ['D3C', 'tipo', 'severidade', 'direcao', 'valor', 'referencia', 'medida', 'mensagem', 'criado_em']
+    alertas = pd.concat(alertas, ignore_index=True) if alertas else pd.DataFrame(columns=colunas)
+    alertas['mensagem'] = [
+        _mensagem(tipo, valor, referencia, medida)
+        for tipo, valor, referencia, medida in zip(alertas['tipo'], alertas['valor'], alertas['referencia'],
+                                                   alertas['medida'])
+    ]
+    alertas['criado_em'] = datetime.now().isoformat(timespec='seconds')
+    alertas = alertas[colunas]
+
+    if estados:
+        estados = pd.concat(estados, ignore_index=True).assign(atualizado_em=alertas['criado_em'].iloc[0]
+                                                               if len(alertas) else datetime.now().isoformat(timespec='seconds'))
+        colunas_estado = CHAVE_SERIE + ['ultimo_periodo', 'janela', 'media', 'desvio', 'atualizado_em']
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO alertas ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+                _linhas_sql(alertas)
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO estado_alertas ({', '.join(colunas_estado)}) "
+                f"VALUES ({', '.join('?' * len(colunas_estado))})",
+                _linhas_sql(estados[colunas_estado])
+            )
+        if caminho_feed:
+            exportar_feed(conn, caminho_feed)
+
+    contagem = alertas['tipo'].value_counts().to_dict()
+    print(f" Alertas: {len(estados)} series com periodos novos, {len(alertas)} alertas "
+          f"({', '.join(f'{tipo} {contagem.get(tipo, 0)}' for tipo in TIPOS)})")
+    return alertas
+
+
+def exportar_feed(conn, caminho=CAMINHO_FEED, maximo=MAXIMO_FEED):
+    """Feed JSON com os alertas mais recentes (por data de criacao e periodo)"""
+    recentes = pd.read_sql(
+        "SELECT * FROM alertas ORDER BY criado_em DESC, D3C DESC, tabela, D2C, D1C, tipo LIMIT ?",
+        conn, params=(maximo,)
+    )
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    registros = recentes.astype(object).where(recentes.notna(), None).to_dict('records')
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump({'gerado_em': datetime.now().isoformat(timespec='seconds'), 'alertas': registros},
+                  arquivo, ensure_ascii=False, indent=1)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def ler_alertas(conn, onde='', parametros=()):
+    """Tabela alertas (ex.: "WHERE severidade = 'alta'")"""
+    garantir_tabelas(conn)
+    return pd.read_sql(f"SELECT * FROM alertas {onde} ORDER BY D3C DESC, tabela, D2C, D1C, tipo",
+                       conn, params=parametros)
+
+
+if __name__ == "__main__":
+    # python alertas.py: avalia dashboard_pnad e lista os alertas de severidade alta
+    conn = esquema.conectar(CAMINHO_BANCO)
+    try:
+        dashboard = pd.read_sql(f"SELECT {', '.join(CHAVE_SERIE)}, D3C, taxa_desocupacao FROM dashboard_pnad", conn)
+        atualizar_alertas(conn, dashboard)
+        print(ler_alertas(conn, "WHERE severidade = 'alta'").head(20).to_string(index=False))
+    finally:
+        conn.close()
@@ -0,0 +1,48 @@
+# benchmark_alertas.py - ALERTAS: AVALIACAO COMPLETA x INCREMENTAL (UM TRIMESTRE NOVO)
+import sqlite3
+import sys
+import time
+
+import alertas
+from benchmark_previsoes import gerar_series
+
+N_SERIES = 2_000
+HISTORICOS = (40, 160)
+
+
+def medir(descricao, funcao, n_linhas):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+    print(f"  {descricao:<40} {duracao:8.3f} s {n_linhas / duracao:12,.0f} linhas/s")
+    return resultado
+
+
+def executar_benchmark(n_series=N_SERIES, historicos=HISTORICOS):
+    print(f"BENCHMARK DE ALERTAS ({n_series:,} series trimestrais, janela de "
+          f"{alertas.JANELA_MESES // 3} trimestres)")
+    for n_periodos in historicos:
+        completo = gerar_series(n_series, n_periodos + 1)
+        ultimo = completo['D3C'].max()
+        historico = completo[completo['D3C'] < ultimo]
+        novo = completo[completo['D3C'] == ultimo]
+
+        print(f"\n  {n_periodos} trimestres de historico")
+        conn = sqlite3.connect(':memory:')
+        medir("avaliacao completa", lambda: alertas.atualizar_alertas(conn, historico, caminho_feed=None),
+              len(historico))
+        # so o trimestre novo chega (ex.: etapa incremental) x dashboard inteiro reenviado
+        medir("trimestre novo (so linhas novas)", lambda: alertas.atualizar_alertas(conn, novo, caminho_feed=None),
+              len(novo))
+        conn.close()
+
+        conn = sqlite3.connect(':memory:')
+        alertas.atualizar_alertas(conn, historico, caminho_feed=None)
+        medir("trimestre novo (dashboard inteiro)", lambda: alertas.atualizar_alertas(conn, completo, caminho_feed=None),
+              len(completo))
+        conn.close()
+
+
+if __name__ == "__main__":
+    # python benchmark_alertas.py [series]
+    executar_benchmark(*[int(argumento) for argumento in sys.argv[1:2]])
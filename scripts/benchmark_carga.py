@@ -0,0 +1,63 @@
+# benchmark_carga.py - to_sql x upsert x CARGA EM MASSA NO SQLITE
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import esquema
+import tipos
+from dados_sinteticos import gerar_dashboard_sintetico
+
+TABELA = 'dashboard_pnad'
+LINHAS = 1_000_000
+
+
+def gravar_to_sql(df, caminho_banco):
+    """Referencia: pandas.to_sql em tabela sem chave nem indices"""
+    conn = sqlite3.connect(caminho_banco)
+    df.to_sql(TABELA, conn, if_exists='replace', index=False)
+    conn.close()
+
+
+def gravar_upsert(df, caminho_banco):
+    """Caminho anterior: INSERT ... ON CONFLICT com remocao das chaves ausentes"""
+    conn = esquema.conectar(caminho_banco)
+    esquema.upsert(conn, TABELA, df, remover_ausentes=True)
+    conn.close()
+
+
+def gravar_em_massa(df, caminho_banco):
+    """Caminho novo: DELETE + INSERT em lotes, indices recriados no fim"""
+    conn = esquema.conectar(caminho_banco)
+    esquema.carregar_em_massa(conn, TABELA, df)
+    conn.close()
+
+
+MODOS = {'to_sql': gravar_to_sql, 'upsert': gravar_upsert, 'em_massa': gravar_em_massa}
+
+
+def executar_benchmark(linhas=LINHAS):
+    print(f"BENCHMARK DE CARGA NO SQLITE ({linhas:,} linhas, formato {TABELA})")
+    df = tipos.aplicar_tipos(gerar_dashboard_sintetico(linhas))
+
+    with tempfile.TemporaryDirectory() as pasta:
+        modelo = os.path.join(pasta, 'modelo.db')
+        esquema.conectar(modelo).close()
+
+        for modo, funcao in MODOS.items():
+            # tabela ja populada: o caso do pipeline, que substitui o conteudo a cada execucao
+            caminho_banco = os.path.join(pasta, f'{modo}.db')
+            shutil.copyfile(modelo, caminho_banco)
+            funcao(df, caminho_banco)
+
+            inicio = time.perf_counter()
+            funcao(df, caminho_banco)
+            tempo = time.perf_counter() - inicio
+            print(f"  {modo:<9} {tempo:7.2f} s  {linhas / tempo:>10,.0f} linhas/s")
+
+
+if __name__ == "__main__":
+    # python benchmark_carga.py [linhas]
+    executar_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else LINHAS)
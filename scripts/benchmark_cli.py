@@ -0,0 +1,55 @@
+# benchmark_cli.py - TEMPO DE PARTIDA (PROCESSO NOVO) DE CADA COMANDO DO pnad.py
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from dados_sinteticos import gerar_registros_sidra
+from servidor_sidra_local import iniciar_servidor
+
+REPETICOES = 5
+PNAD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pnad.py')
+
+
+def medir(argumentos, ambiente, repeticoes):
+    """Mediana do tempo de parede de `python <argumentos>` em processos novos"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable] + argumentos, env=ambiente, cwd=os.path.dirname(PNAD),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def executar_benchmark(repeticoes=REPETICOES):
+    print(f"BENCHMARK DE PARTIDA DO pnad.py (mediana de {repeticoes} processos novos)")
+    # serie Brasil sintetica (6381, trimestre movel) servida por um SIDRA local
+    servidor, url = iniciar_servidor(gerar_registros_sidra(n_territorios=1, nivel='1', periodicidade='movel'))
+    with tempfile.TemporaryDirectory() as pasta:
+        ambiente = dict(os.environ, PNAD_DADOS=pasta, SIDRA_BASE_URL=url, PNAD_METRICAS='nenhum')
+        # carga inicial, pipeline e uma busca incremental: as seguintes saem do cache sem dados novos
+        for comando in (['fetch'], ['build'], ['fetch']):
+            subprocess.run([sys.executable, PNAD] + comando, env=ambiente, cwd=os.path.dirname(PNAD),
+                           stdout=subprocess.DEVNULL, check=True)
+
+        casos = [
+            ("python -c pass (interpretador)", ['-c', 'pass']),
+            ("import pipeline (todas as etapas)", ['-c', 'import pipeline']),
+            ("import pnad_etl + matplotlib (antes)", ['-c', 'import pnad_etl, graficos']),
+            ("pnad.py --help", [PNAD, '--help']),
+            ("pnad.py check", [PNAD, 'check']),
+            ("pnad.py fetch (do cache)", [PNAD, 'fetch']),
+            ("pnad.py build (nada mudou)", [PNAD, 'build'])
+        ]
+        print(f"\n  {'comando':<40} {'tempo':>9}")
+        for descricao, argumentos in casos:
+            print(f"  {descricao:<40} {medir(argumentos, ambiente, repeticoes):7.3f} s")
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    # python benchmark_cli.py [repeticoes]
+    executar_benchmark(*[int(argumento) for argumento in sys.argv[1:2]])
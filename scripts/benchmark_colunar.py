@@ -0,0 +1,81 @@
+# benchmark_colunar.py - CSV x PARQUET x ARROW IPC
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import exportar_colunar
+from dados_sinteticos import gerar_dashboard_sintetico
+
+TAMANHOS = [10_000, 1_000_000, 10_000_000]
+
+
+def tamanho_em_disco(caminho):
+    if os.path.isfile(caminho):
+        return os.path.getsize(caminho)
+    return sum(
+        os.path.getsize(os.path.join(pasta, nome))
+        for pasta, _, nomes in os.walk(caminho) for nome in nomes
+    )
+
+
+def cronometrar(funcao, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    return time.perf_counter() - inicio, resultado
+
+
+def medir_tamanho(n_linhas, pasta):
+    df = gerar_dashboard_sintetico(n_linhas)
+    caminho_csv = os.path.join(pasta, 'dashboard.csv')
+    diretorio_parquet = os.path.join(pasta, 'parquet')
+    caminho_arrow = os.path.join(pasta, 'dashboard.arrow')
+
+    resultados = {}
+
+    escrita, _ = cronometrar(df.to_csv, caminho_csv, index=False, encoding='utf-8-sig')
+    leitura, _ = cronometrar(pd.read_csv, caminho_csv, encoding='utf-8-sig')
+    resultados['CSV'] = (escrita, leitura, tamanho_em_disco(caminho_csv))
+
+    escrita, _ = cronometrar(exportar_colunar.exportar_parquet, df, diretorio_parquet)
+    reescrita, _ = cronometrar(exportar_colunar.exportar_parquet, df, diretorio_parquet)
+    leitura, _ = cronometrar(exportar_colunar.ler_parquet, diretorio_parquet)
+    resultados['Parquet'] = (escrita, leitura, tamanho_em_disco(diretorio_parquet))
+    resultados['Parquet (sem mudancas)'] = (reescrita, None, None)
+
+    escrita, _ = cronometrar(exportar_colunar.exportar_arrow, df, caminho_arrow)
+    leitura, _ = cronometrar(exportar_colunar.ler_arrow, caminho_arrow)
+    leitura_mmap, _ = cronometrar(exportar_colunar.ler_arrow, caminho_arrow, como_pandas=False)
+    resultados['Arrow IPC'] = (escrita, leitura, tamanho_em_disco(caminho_arrow))
+    resultados['Arrow IPC (mmap, sem pandas)'] = (None, leitura_mmap, None)
+
+    return resultados
+
+
+def formatar(valor, sufixo):
+    return f"{valor:>10.2f}{sufixo}" if valor is not None else f"{'-':>10} "
+
+
+def executar_benchmark(tamanhos=TAMANHOS):
+    if not exportar_colunar.pyarrow_disponivel():
+        return
+
+    print("BENCHMARK DE EXPORTACAO (formato dashboard_pnad)")
+    for n_linhas in tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            resultados = medir_tamanho(n_linhas, pasta)
+
+        print(f"\n {n_linhas:,} linhas")
+        print(f"  {'formato':<30}{'escrita':>11}{'leitura':>11}{'tamanho':>11}")
+        for formato, (escrita, leitura, tamanho) in resultados.items():
+            tamanho_mb = tamanho / 1024 ** 2 if tamanho is not None else None
+            print(f"  {formato:<30}{formatar(escrita, 's')}{formatar(leitura, 's')}{formatar(tamanho_mb, 'M')}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        executar_benchmark([int(n) for n in sys.argv[1].split(',')])
+    else:
+        executar_benchmark()
@@ -0,0 +1,45 @@
+# benchmark_extrator.py - EXTRACAO SERIAL x CONCORRENTE
+import time
+
+from dados_sinteticos import gerar_registros_sidra
+from extrator_sidra import UFS, ExtratorSIDRA, gerar_consultas
+from servidor_sidra_local import iniciar_servidor
+
+# Latencia simulada por requisicao (segundos)
+ATRASO_API = 0.05
+
+
+def medir(url_base, consultas, max_simultaneas):
+    extrator = ExtratorSIDRA(url_base, max_simultaneas=max_simultaneas, requisicoes_por_segundo=1000)
+    inicio = time.perf_counter()
+    df = extrator.extrair(consultas)
+    tempo = time.perf_counter() - inicio
+
+    print(f"\n max_simultaneas={max_simultaneas}: {len(df)} linhas em {tempo:.2f} s")
+    extrator.imprimir_relatorio()
+    extrator.fechar()
+    return tempo
+
+
+def executar_benchmark(tamanho_bloco=40):
+    print("BENCHMARK DO EXTRATOR SIDRA (27 UFs x 160 trimestres)")
+
+    registros = gerar_registros_sidra(n_territorios=27, n_variaveis=1, n_periodos=160)
+    servidor, url_base = iniciar_servidor(registros, atraso=ATRASO_API)
+
+    try:
+        consultas = gerar_consultas(
+            [('4099', '4099')], {'n3': UFS}, inicio='201201', fim='205112', tamanho_bloco=tamanho_bloco
+        )
+        print(f" Consultas: {len(consultas)} (latencia simulada {ATRASO_API * 1000:.0f} ms)")
+
+        tempo_serial = medir(url_base, consultas, max_simultaneas=1)
+        tempo_concorrente = medir(url_base, consultas, max_simultaneas=16)
+
+        print(f"\n Ganho: {tempo_serial / tempo_concorrente:.1f}x")
+    finally:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    executar_benchmark()
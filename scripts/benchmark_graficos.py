@@ -0,0 +1,66 @@
+# benchmark_graficos.py - GRAFICOS POR SEGUNDO: PYPLOT x MODELO AGG x PROCESSOS
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import graficos
+from dados_sinteticos import gerar_dashboard_sintetico
+
+N_SERIES = 500
+N_PERIODOS = 160
+
+
+def renderizar_pyplot(tarefas):
+    """Abordagem anterior: uma figura nova por grafico, via maquina de estados do pyplot"""
+    for datas, taxa, media, titulo, caminho in tarefas:
+        plt.figure(figsize=(graficos.LARGURA, graficos.ALTURA))
+        plt.plot(datas, taxa, marker='o', linewidth=2)
+        plt.plot(datas, media, linestyle='--')
+        plt.title(titulo)
+        plt.xlabel('Periodo')
+        plt.ylabel('Taxa de Desocupacao (%)')
+        plt.grid(True, alpha=0.3)
+        plt.tight_layout()
+        plt.savefig(caminho, dpi=graficos.DPI)
+        plt.close()
+
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+
+def executar_benchmark(n_series=N_SERIES):
+    df = gerar_dashboard_sintetico(n_series * N_PERIODOS, n_territorios=n_series, n_periodos=N_PERIODOS)
+    processos = os.cpu_count() or 1
+
+    print("BENCHMARK DE RENDERIZACAO DE GRAFICOS")
+    print(f" {n_series} series x {N_PERIODOS} periodos, {graficos.DPI} dpi, {processos} CPU(s)")
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        tarefas = graficos.montar_tarefas(df, pasta)
+        resultados['pyplot (figura por grafico)'] = cronometrar(lambda: renderizar_pyplot(tarefas))
+        resultados['modelo Agg reaproveitado'] = cronometrar(
+            lambda: graficos.renderizar_tarefas(tarefas, pasta, processos=1, forcar=True)
+        )
+        if processos > 1:
+            resultados[f'modelo Agg em {processos} processos'] = cronometrar(
+                lambda: graficos.renderizar_tarefas(tarefas, pasta, processos=processos, forcar=True)
+            )
+        resultados['dados inalterados (hash)'] = cronometrar(
+            lambda: graficos.renderizar_tarefas(tarefas, pasta)
+        )
+
+    for nome, tempo in resultados.items():
+        print(f"  {nome:<32} {tempo:8.2f} s  {n_series / tempo:10.1f} graficos/s")
+
+
+if __name__ == "__main__":
+    executar_benchmark(*(int(argumento) for argumento in sys.argv[1:2]))
@@ -0,0 +1,78 @@
+# benchmark_metricas.py - MOTOR DE METRICAS x PANDAS GROUPBY/APPLY
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import metricas
+from dados_sinteticos import gerar_registros_sidra
+from preparar_dados_powerbi import transformar_para_powerbi
+
+N_TERRITORIOS = 27
+N_VARIAVEIS = 20
+N_PERIODOS = 160
+
+
+def gerar_entrada(n_territorios, n_variaveis, n_periodos):
+    """Frame no formato powerbi_otimizado (saida da etapa preparar)"""
+    df = pd.DataFrame(gerar_registros_sidra(n_territorios, n_variaveis, n_periodos))
+    df['tabela'] = '4099'
+    return transformar_para_powerbi(df)
+
+
+def metricas_pandas(df):
+    """Mesmas metricas com groupby-rolling/transform e status via apply"""
+    df = df.sort_values(metricas.CHAVE_SERIE + ['data_referencia'])
+    taxa = df['taxa_desocupacao'].astype('float64')
+    grupos = taxa.groupby([df[coluna] for coluna in metricas.CHAVE_SERIE], observed=True)
+
+    resultado = pd.DataFrame(index=df.index)
+    resultado['variacao_periodo'] = grupos.pct_change(fill_method=None) * 100
+    resultado['media_movel_4p'] = grupos.rolling(4, min_periods=1).mean().droplevel([0, 1, 2])
+    resultado['vs_media_historica'] = taxa - grupos.transform('mean')
+    resultado['status'] = resultado['vs_media_historica'].apply(
+        lambda x: 'Acima da Media' if x > 0 else 'Abaixo da Media'
+    )
+    resultado['nivel_desocupacao'] = np.select([taxa <= 7, taxa > 10], ['Baixa', 'Alta'], 'Moderada')
+    resultado['variacao_anual'] = taxa - grupos.shift(4)
+    sazonal = taxa.groupby([df[coluna] for coluna in metricas.CHAVE_SERIE] + [df['trimestre']], observed=True)
+    resultado['desvio_sazonal'] = taxa - sazonal.transform('mean')
+    return resultado
+
+
+def cronometrar(funcao, repeticoes=3):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def executar_benchmark(n_territorios=N_TERRITORIOS, n_variaveis=N_VARIAVEIS, n_periodos=N_PERIODOS):
+    df = gerar_entrada(n_territorios, n_variaveis, n_periodos)
+    processos = os.cpu_count() or 1
+
+    print("BENCHMARK DE METRICAS DERIVADAS")
+    print(f" {n_territorios} territorios x {n_variaveis} variaveis x {n_periodos} trimestres = {len(df):,} linhas")
+
+    tempos = {
+        'pandas (groupby + apply)': cronometrar(lambda: metricas_pandas(df)),
+        'motor vetorizado': cronometrar(lambda: metricas.calcular_metricas(df, processos=1))
+    }
+    if processos > 1:
+        tempos[f'motor em {processos} processos'] = cronometrar(
+            lambda: metricas.calcular_metricas(df, processos=processos, limiar_paralelo=0)
+        )
+    else:
+        print("  (1 CPU: execucao em processos omitida)")
+
+    referencia = tempos['pandas (groupby + apply)']
+    for nome, tempo in tempos.items():
+        print(f"  {nome:<28} {tempo:8.3f} s  ({referencia / tempo:5.1f}x)")
+
+
+if __name__ == "__main__":
+    executar_benchmark(*(int(argumento) for argumento in sys.argv[1:4]))
@@ -0,0 +1,88 @@
+# benchmark_microdados.py - LEITURA DOS MICRODADOS: BLOCOS DE BYTES x read_fwf, MEMORIA E PROCESSOS
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import microdados
+from dados_sinteticos import escrever_dicionario_microdados, escrever_microdados
+
+REGISTROS = 1_000_000
+AMOSTRA_FWF = 100_000
+
+
+def medir_arquivo(caminho, caminho_dicionario):
+    """Executado em subprocesso: tempo e pico de memoria de agregar_arquivo"""
+    especificacao = microdados.especificacao_colunas(microdados.ler_dicionario(caminho_dicionario))
+    inicio = time.perf_counter()
+    _, registros = microdados.agregar_arquivo(caminho, especificacao)
+    tempo = time.perf_counter() - inicio
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{registros} {tempo:.3f} {pico_mb:.1f}")
+
+
+def _em_subprocesso(caminho, caminho_dicionario):
+    saida = subprocess.run(
+        [sys.executable, __file__, '--medir', caminho, caminho_dicionario],
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+    return int(saida[0]), float(saida[1]), float(saida[2])
+
+
+def medir_read_fwf(caminho, caminho_dicionario, registros):
+    """Mesmas colunas com pd.read_fwf (chunksize), nas primeiras `registros` linhas"""
+    especificacao = microdados.especificacao_colunas(microdados.ler_dicionario(caminho_dicionario))
+    colspecs = [(inicio, inicio + tamanho) for inicio, tamanho in especificacao.values()]
+    inicio = time.perf_counter()
+    lidos = 0
+    for bloco in pd.read_fwf(caminho, colspecs=colspecs, names=list(especificacao), header=None,
+                             nrows=registros, chunksize=microdados.LINHAS_POR_BLOCO):
+        lidos += len(bloco)
+    return lidos / (time.perf_counter() - inicio)
+
+
+def executar_benchmark(registros=REGISTROS):
+    print(f"BENCHMARK DE MICRODADOS (arquivos sinteticos de largura fixa, blocos de "
+          f"{microdados.LINHAS_POR_BLOCO:,} registros)")
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_dicionario = os.path.join(pasta, 'input_PNADC_trimestral.txt')
+        escrever_dicionario_microdados(caminho_dicionario)
+
+        print(f"\n  {'registros':>10} {'arquivo':>10} {'tempo':>9} {'MB/s':>8} {'registros/s':>12} {'pico RSS':>10}")
+        for n in (registros // 4, registros):
+            caminho = os.path.join(pasta, f"PNADC_{n}.txt")
+            tamanho_mb = escrever_microdados(caminho, n) / 1e6
+            lidos, tempo, pico_mb = _em_subprocesso(caminho, caminho_dicionario)
+            print(f"  {lidos:>10,} {tamanho_mb:>7.0f} MB {tempo:>7.2f} s {tamanho_mb / tempo:>8.0f} "
+                  f"{lidos / tempo:>12,.0f} {pico_mb:>7.0f} MB")
+
+        amostra = min(AMOSTRA_FWF, registros)
+        print(f"\n  pd.read_fwf (so leitura, {amostra:,} registros): {medir_read_fwf(caminho, caminho_dicionario, amostra):,.0f} registros/s")
+        os.remove(caminho)
+
+        # dois trimestres: um processo x um processo por trimestre
+        diretorio = os.path.join(pasta, 'microdados')
+        os.makedirs(diretorio)
+        escrever_dicionario_microdados(os.path.join(diretorio, 'input_PNADC_trimestral.txt'))
+        for trimestre in (1, 2):
+            escrever_microdados(os.path.join(diretorio, f"PNADC_0{trimestre}2023.txt"), registros // 4,
+                                trimestre=trimestre, semente=trimestre)
+        print()
+        for processos in (1, 2):
+            caminho_banco = os.path.join(pasta, f"microdados_{processos}.db")
+            inicio = time.perf_counter()
+            microdados.ingerir_microdados(caminho_banco, diretorio, processos=processos)
+            print(f"  2 trimestres, {processos} processo(s): {time.perf_counter() - inicio:.2f} s "
+                  f"({os.cpu_count()} CPUs)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--medir':
+        medir_arquivo(sys.argv[2], sys.argv[3])
+    else:
+        # python benchmark_microdados.py [registros]
+        executar_benchmark(*[int(argumento) for argumento in sys.argv[1:2]])
@@ -0,0 +1,203 @@
+# benchmark_pipeline.py - TEMPO E MEMORIA POR ETAPA COM HISTORICO E REFERENCIA
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+import configuracao
+import corrigir_trimestres
+import esquema
+import powerbi_final
+import preparar_dados_powerbi
+import validacao
+from dados_sinteticos import PERIODICIDADES, escrever_payload_sidra
+from decodificador_sidra import COLUNAS_SIDRA, iterar_blocos_arquivo, iterar_elementos_json, iterar_linhas_tipadas
+
+DIRETORIO_BENCHMARKS = configuracao.caminho_dados('benchmarks')
+ARQUIVO_HISTORICO = 'historico.json'
+ARQUIVO_REFERENCIA = 'referencia.json'
+
+# 27 UFs x 10 variaveis x 160 trimestres moveis = 43.200 linhas
+DIMENSOES = {'n_territorios': 27, 'n_variaveis': 10, 'n_periodos': 160, 'periodicidade': 'movel'}
+
+REPETICOES = 3
+
+# Regressao: mais lento/maior que a referencia alem da tolerancia relativa
+# (e da margem absoluta, que evita alarmes em etapas de milissegundos)
+TOLERANCIA_TEMPO = 0.25
+MARGEM_TEMPO = 0.01
+TOLERANCIA_MEMORIA = 0.10
+MARGEM_MEMORIA_MB = 1.0
+
+
+def decodificar_payload(caminho, tabela_sidra):
+    """Payload SIDRA em disco -> DataFrame no formato de pnad_historico"""
+    linhas = iterar_linhas_tipadas(iterar_elementos_json(iterar_blocos_arquivo(caminho)), tabela_sidra)
+    return pd.DataFrame.from_records(linhas, columns=COLUNAS_SIDRA + ['tabela'])
+
+
+def criar_banco_modelo(caminho_banco):
+    """Banco vazio com o esquema ja migrado (copiado a cada gravacao)"""
+    esquema.conectar(caminho_banco).close()
+    return caminho_banco
+
+
+def gravar_sqlite(df, caminho_modelo, caminho_banco):
+    """Grava o dashboard em um banco novo, como a etapa final do pipeline"""
+    shutil.copyfile(caminho_modelo, caminho_banco)
+    conn = esquema.conectar(caminho_banco)
+    try:
+        esquema.carregar_em_massa(conn, powerbi_final.TABELA_DASHBOARD, df)
+    finally:
+        conn.close()
+
+
+def montar_etapas(pasta, tabela_sidra):
+    """(nome, funcao(saidas) -> resultado) na ordem do pipeline"""
+    payload = os.path.join(pasta, 'payload.json')
+    modelo = criar_banco_modelo(os.path.join(pasta, 'modelo.db'))
+    return [
+        ('parse', lambda s: decodificar_payload(payload, tabela_sidra)),
+        ('preparar', lambda s: preparar_dados_powerbi.transformar_para_powerbi(s['parse'])),
+        ('corrigir', lambda s: corrigir_trimestres.filtrar_trimestres_padrao(s['preparar'])),
+        ('final', lambda s: powerbi_final.transformar_dataset_final(s['preparar'])),
+        ('validar', lambda s: validacao.validar(s['final'], 'dashboard', salvar=False)),
+        ('sqlite', lambda s: gravar_sqlite(s['final'], modelo, os.path.join(pasta, 'benchmark.db'))),
+        ('csv', lambda s: s['final'].to_csv(os.path.join(pasta, 'dashboard.csv'), index=False,
+                                            encoding='utf-8-sig'))
+    ]
+
+
+def medir_etapas(etapas, repeticoes=REPETICOES):
+    """Melhor tempo de `repeticoes` execucoes e pico de memoria (tracemalloc) por etapa
+
+    O pico e medido numa execucao separada: o rastreamento deixa o codigo mais lento.
+    """
+    saidas, resultados = {}, {}
+    for nome, funcao in etapas:
+        melhor = float('inf')
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            saidas[nome] = funcao(saidas)
+            melhor = min(melhor, time.perf_counter() - inicio)
+
+        tracemalloc.start()
+        funcao(saidas)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        resultados[nome] = {'tempo_s': round(melhor, 4), 'pico_mb': round(pico / 1024 ** 2, 2)}
+    return resultados
+
+
+def chave_dimensoes(dimensoes):
+    return (f"{dimensoes['n_territorios']}x{dimensoes['n_variaveis']}x{dimensoes['n_periodos']}"
+            f"-{dimensoes['periodicidade']}")
+
+
+def versao_codigo():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _ler_json(caminho, padrao):
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return padrao
+
+
+def _gravar_json(caminho, dados):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False, indent=2)
+
+
+def comparar(resultados, referencia):
+    """Lista de regressoes (etapa, medida, atual, referencia) contra a referencia gravada"""
+    regressoes = []
+    for nome, atual in resultados.items():
+        base = referencia.get(nome)
+        if not base:
+            continue
+        if atual['tempo_s'] > base['tempo_s'] * (1 + TOLERANCIA_TEMPO) + MARGEM_TEMPO:
+            regressoes.append((nome, 'tempo_s', atual['tempo_s'], base['tempo_s']))
+        if atual['pico_mb'] > base['pico_mb'] * (1 + TOLERANCIA_MEMORIA) + MARGEM_MEMORIA_MB:
+            regressoes.append((nome, 'pico_mb', atual['pico_mb'], base['pico_mb']))
+    return regressoes
+
+
+def executar_benchmark(dimensoes=DIMENSOES, repeticoes=REPETICOES, salvar_referencia=False,
+                       diretorio=DIRETORIO_BENCHMARKS):
+    """Roda a suite, grava o historico e devolve a lista de regressoes"""
+    _, tabela_sidra = PERIODICIDADES[dimensoes['periodicidade']]
+    chave = chave_dimensoes(dimensoes)
+
+    print("BENCHMARK DO PIPELINE")
+    with tempfile.TemporaryDirectory() as pasta:
+        linhas = escrever_payload_sidra(os.path.join(pasta, 'payload.json'), **dimensoes)
+        print(f" {chave}: {linhas:,} linhas, melhor de {repeticoes} execucoes por etapa")
+        resultados = medir_etapas(montar_etapas(pasta, tabela_sidra), repeticoes)
+
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_referencia = os.path.join(diretorio, ARQUIVO_REFERENCIA)
+    referencias = _ler_json(caminho_referencia, {})
+    referencia = referencias.get(chave, {}).get('etapas', {})
+    regressoes = comparar(resultados, referencia)
+
+    print(f"\n  {'etapa':<10} {'tempo':>10} {'referencia':>12} {'pico':>10} {'referencia':>12}")
+    for nome, atual in resultados.items():
+        base = referencia.get(nome, {})
+        tempo_base = f"{base['tempo_s']:.3f} s" if base else '-'
+        pico_base = f"{base['pico_mb']:.1f} MB" if base else '-'
+        print(f"  {nome:<10} {atual['tempo_s']:8.3f} s {tempo_base:>12} {atual['pico_mb']:7.1f} MB {pico_base:>12}")
+    total = sum(atual['tempo_s'] for atual in resultados.values())
+    print(f"  {'total':<10} {total:8.3f} s")
+
+    execucao = {
+        'executado_em': datetime.now().isoformat(timespec='seconds'),
+        'versao': versao_codigo(),
+        'dimensoes': chave,
+        'linhas': linhas,
+        'etapas': resultados,
+        'regressoes': [list(regressao) for regressao in regressoes]
+    }
+    caminho_historico = os.path.join(diretorio, ARQUIVO_HISTORICO)
+    _gravar_json(caminho_historico, _ler_json(caminho_historico, []) + [execucao])
+
+    if salvar_referencia or not referencia:
+        referencias[chave] = execucao
+        _gravar_json(caminho_referencia, referencias)
+        print(f"\n Referencia gravada para {chave} em {caminho_referencia}")
+
+    if regressoes:
+        print("\n REGRESSOES:")
+        for nome, medida, atual, base in regressoes:
+            aumento = f", +{(atual / base - 1) * 100:.0f}%" if base else ''
+            print(f"  {nome}.{medida}: {atual} (referencia {base}{aumento})")
+    else:
+        print("\n Nenhuma regressao contra a referencia")
+    return regressoes
+
+
+if __name__ == "__main__":
+    # python benchmark_pipeline.py [territorios variaveis periodos [trimestral|movel]] [--referencia]
+    argumentos = [argumento for argumento in sys.argv[1:] if not argumento.startswith('--')]
+    dimensoes = dict(DIMENSOES)
+    for nome, valor in zip(['n_territorios', 'n_variaveis', 'n_periodos'], argumentos[:3]):
+        dimensoes[nome] = int(valor)
+    if len(argumentos) > 3:
+        dimensoes['periodicidade'] = argumentos[3]
+
+    regressoes = executar_benchmark(dimensoes, salvar_referencia='--referencia' in sys.argv)
+    sys.exit(1 if regressoes else 0)
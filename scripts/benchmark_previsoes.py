@@ -0,0 +1,67 @@
+# benchmark_previsoes.py - AJUSTES POR SEGUNDO: GRADE VETORIZADA, INCREMENTAL E PROCESSOS
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import previsoes
+from dados_sinteticos import gerar_dashboard_sintetico
+
+N_SERIES = 5_000
+N_PERIODOS = 60
+
+
+def gerar_series(n_series, n_periodos):
+    """dashboard_pnad sintetico com n_series territorios e sazonalidade trimestral"""
+    df = gerar_dashboard_sintetico(n_series * n_periodos, n_territorios=n_series, n_periodos=n_periodos)
+    fase = df['D3C'].str[-2:].astype(int).to_numpy() - 1
+    df['taxa_desocupacao'] = df['taxa_desocupacao'] + np.array([0.8, 0.2, -0.3, -0.7])[fase]
+    return df
+
+
+def medir(descricao, funcao, n_series):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+    print(f"  {descricao:<34} {duracao:8.2f} s {n_series / duracao:12,.0f} series/s")
+    return resultado
+
+
+def executar_benchmark(n_series=N_SERIES, n_periodos=N_PERIODOS):
+    print(f"BENCHMARK DE PREVISOES ({n_series:,} series x {n_periodos} trimestres, "
+          f"{len(previsoes.GRADE)} combinacoes na grade)")
+    completo = gerar_series(n_series, n_periodos + 1)
+    ultimo = completo['D3C'].max()
+    historico = completo[completo['D3C'] < ultimo]
+
+    # so o ajuste, sem SQLite: grade vetorizada vs uma serie por vez
+    dados = previsoes._preparar(historico)
+    valores = dados['valor'].to_numpy().reshape(n_series, n_periodos)
+    comprimento = np.full(n_series, n_periodos)
+    medir("grade vetorizada (arrays)", lambda: previsoes.ajustar_grade_em_blocos(valores, comprimento, 4, 1),
+          n_series)
+    amostra = min(n_series, 200)
+    inicio = time.perf_counter()
+    for i in range(amostra):
+        previsoes.ajustar_grade(valores[i:i + 1], comprimento[i:i + 1], 4)
+    duracao = time.perf_counter() - inicio
+    print(f"  {'grade serie a serie (loop)':<34} {duracao * n_series / amostra:8.2f} s "
+          f"{amostra / duracao:12,.0f} series/s  (estimado com {amostra})")
+    medir("grade vetorizada (processos)", lambda: previsoes.ajustar_grade_em_blocos(valores, comprimento, 4),
+          n_series)
+
+    # fluxo completo com a tabela previsoes
+    conn = sqlite3.connect(':memory:')
+    medir("ajuste completo + previsoes", lambda: previsoes.atualizar_previsoes(conn, historico), n_series)
+    medir("sem periodos novos", lambda: previsoes.atualizar_previsoes(conn, historico), n_series)
+    medir("novo trimestre (incremental)", lambda: previsoes.atualizar_previsoes(conn, completo), n_series)
+    linhas = pd.read_sql("SELECT COUNT(*) AS n FROM previsoes", conn)['n'][0]
+    print(f"  {linhas:,} linhas em previsoes")
+    conn.close()
+
+
+if __name__ == "__main__":
+    # python benchmark_previsoes.py [series [periodos]]
+    executar_benchmark(*[int(argumento) for argumento in sys.argv[1:3]])
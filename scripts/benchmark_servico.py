@@ -0,0 +1,153 @@
+# benchmark_servico.py - CARGA NO SERVICO HTTP: LATENCIA p50/p99 E REQUISICOES/S
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import esquema
+import resumos
+import tipos
+from dados_sinteticos import gerar_dashboard_sintetico
+
+LINHAS = 200_000
+N_TERRITORIOS = 27
+REQUISICOES = 3000
+CONCORRENCIA = 16
+PORTA = 8767
+
+
+def criar_banco(caminho_banco, linhas=LINHAS):
+    """dashboard_pnad sintetico + resumos (o que o pipeline deixaria no banco)"""
+    df = tipos.aplicar_tipos(gerar_dashboard_sintetico(linhas, n_territorios=N_TERRITORIOS))
+    conn = esquema.conectar(caminho_banco)
+    try:
+        esquema.carregar_em_massa(conn, 'dashboard_pnad', df)
+        resumos.atualizar_resumos(conn, df)
+    finally:
+        conn.close()
+    return sorted(df['D1C'].astype(str).unique())
+
+
+def montar_urls(territorios):
+    """Mistura de consultas de dashboard: series por UF, agregados e ultimos valores"""
+    urls = []
+    for territorio in territorios:
+        urls.append(f"/series?territorio={territorio}&colunas=D3C,taxa_desocupacao,media_movel_4p")
+        urls.append(f"/series?territorio={territorio}&ano_inicial=2020&formato=csv")
+        urls.append(f"/agregados?por=ano&territorio={territorio}")
+    urls += ["/agregados?por=D1C", "/agregados?por=ano,trimestre", "/ultimos", "/ultimos?formato=csv",
+             "/series?territorio=35&formato=arrow"]
+    return urls
+
+
+async def _requisitar(leitor, escritor, url, etag=None):
+    """Uma requisicao GET na conexao keep-alive; devolve (status, etag, tamanho do corpo)"""
+    cabecalhos = f"If-None-Match: {etag}\r\n" if etag else ''
+    escritor.write(f"GET {url} HTTP/1.1\r\nHost: localhost\r\n{cabecalhos}\r\n".encode('latin-1'))
+    await escritor.drain()
+    status = int((await leitor.readline()).split()[1])
+    tamanho, etag_resposta = 0, None
+    while True:
+        linha = (await leitor.readline()).decode('latin-1').strip()
+        if not linha:
+            break
+        nome, _, valor = linha.partition(':')
+        if nome.lower() == 'content-length':
+            tamanho = int(valor)
+        elif nome.lower() == 'etag':
+            etag_resposta = valor.strip()
+    await leitor.readexactly(tamanho)
+    return status, etag_resposta, tamanho
+
+
+async def _cliente(porta, fila, latencias, estados, etags, revalidar):
+    leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+    try:
+        while fila:
+            url = fila.pop()
+            inicio = time.perf_counter()
+            status, etag, _ = await _requisitar(leitor, escritor, url, etags.get(url) if revalidar else None)
+            latencias.append(time.perf_counter() - inicio)
+            estados[status] = estados.get(status, 0) + 1
+            if etag:
+                etags[url] = etag
+    finally:
+        escritor.close()
+
+
+async def executar_fase(porta, urls, requisicoes, concorrencia, etags, revalidar=False):
+    """requisicoes GET distribuidas entre `concorrencia` conexoes; devolve as medidas"""
+    fila = [urls[i % len(urls)] for i in range(requisicoes)][::-1]
+    latencias, estados = [], {}
+    inicio = time.perf_counter()
+    await asyncio.gather(*[
+        _cliente(porta, fila, latencias, estados, etags, revalidar) for _ in range(concorrencia)
+    ])
+    duracao = time.perf_counter() - inicio
+    latencias_ms = np.array(latencias) * 1000
+    return {
+        'requisicoes': len(latencias),
+        'rps': len(latencias) / duracao,
+        'p50_ms': float(np.percentile(latencias_ms, 50)),
+        'p99_ms': float(np.percentile(latencias_ms, 99)),
+        'maximo_ms': float(latencias_ms.max()),
+        'status': estados
+    }
+
+
+async def _aguardar_servico(porta, limite_s=30):
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite_s:
+        try:
+            leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+            status, _, _ = await _requisitar(leitor, escritor, '/saude')
+            escritor.close()
+            if status == 200:
+                return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"Servico nao respondeu na porta {porta}")
+
+
+async def medir(porta, urls, requisicoes, concorrencia):
+    await _aguardar_servico(porta)
+    etags = {}
+    return {
+        # cada URL uma vez: consulta no SQLite + serializacao
+        'sem cache': await executar_fase(porta, urls, len(urls), concorrencia, etags),
+        'com cache': await executar_fase(porta, urls, requisicoes, concorrencia, etags),
+        # If-None-Match com a ETag recebida: 304 sem corpo
+        'revalidacao': await executar_fase(porta, urls, requisicoes, concorrencia, etags, revalidar=True)
+    }
+
+
+def executar_benchmark(linhas=LINHAS, requisicoes=REQUISICOES, concorrencia=CONCORRENCIA, porta=PORTA):
+    print(f"BENCHMARK DO SERVICO HTTP ({linhas:,} linhas em dashboard_pnad, {concorrencia} conexoes)")
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_banco = os.path.join(pasta, 'servico.db')
+        urls = montar_urls(criar_banco(caminho_banco, linhas))
+
+        # servidor em outro processo: cliente e servidor nao disputam o GIL
+        servidor = subprocess.Popen([sys.executable, 'servico_pnad.py', str(porta), caminho_banco],
+                                    stdout=subprocess.DEVNULL)
+        try:
+            resultados = asyncio.run(medir(porta, urls, requisicoes, concorrencia))
+        finally:
+            servidor.terminate()
+            servidor.wait()
+
+    print(f"\n  {'fase':<12} {'requisicoes':>11} {'req/s':>9} {'p50':>10} {'p99':>10} {'maximo':>10}  status")
+    for fase, medida in resultados.items():
+        print(f"  {fase:<12} {medida['requisicoes']:>11} {medida['rps']:>9.0f} {medida['p50_ms']:>7.2f} ms "
+              f"{medida['p99_ms']:>7.2f} ms {medida['maximo_ms']:>7.2f} ms  {medida['status']}")
+    return resultados
+
+
+if __name__ == "__main__":
+    # python benchmark_servico.py [linhas [requisicoes [concorrencia]]]
+    argumentos = [int(argumento) for argumento in sys.argv[1:4]]
+    executar_benchmark(*argumentos)
@@ -0,0 +1,78 @@
+# benchmark_streaming.py - json()+DataFrame x DECODIFICACAO EM STREAMING
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from dados_sinteticos import escrever_payload_sidra
+from decodificador_sidra import carregar_em_lotes, iterar_blocos_arquivo
+
+# 100 territorios x 10 variaveis x 1000 periodos = 1M linhas
+DIMENSOES = {'n_territorios': 100, 'n_variaveis': 10, 'n_periodos': 1000}
+
+
+def carregar_atual(caminho_payload, caminho_banco):
+    """Caminho atual: corpo inteiro -> json -> DataFrame -> to_sql"""
+    with open(caminho_payload, 'rb') as arquivo:
+        corpo = arquivo.read()
+    dados = json.loads(corpo)
+    df = pd.DataFrame(dados[1:], columns=list(dados[0]))
+
+    conn = sqlite3.connect(caminho_banco)
+    df.to_sql('pnad_historico', conn, if_exists='replace', index=False)
+    conn.close()
+    return len(df)
+
+
+def carregar_streaming(caminho_payload, caminho_banco):
+    """Caminho novo: blocos de bytes -> elementos -> lotes executemany"""
+    conn = sqlite3.connect(caminho_banco)
+    total = carregar_em_lotes(conn, iterar_blocos_arquivo(caminho_payload), '4099')
+    conn.close()
+    return total
+
+
+def executar_modo(modo, caminho_payload, caminho_banco):
+    """Executado em subprocesso para medir o pico de memoria isoladamente"""
+    funcao = carregar_atual if modo == 'atual' else carregar_streaming
+    inicio = time.perf_counter()
+    linhas = funcao(caminho_payload, caminho_banco)
+    tempo = time.perf_counter() - inicio
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{linhas} {tempo:.3f} {pico_mb:.1f}")
+
+
+def executar_benchmark():
+    print("BENCHMARK DE DECODIFICACAO SIDRA (1M linhas)")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_payload = os.path.join(pasta, 'payload.json')
+        total = escrever_payload_sidra(caminho_payload, **DIMENSOES)
+        tamanho_mb = os.path.getsize(caminho_payload) / 1024 ** 2
+        print(f" Payload: {total} linhas, {tamanho_mb:.0f} MB")
+
+        for modo in ['atual', 'streaming']:
+            caminho_banco = os.path.join(pasta, f'{modo}.db')
+            saida = subprocess.run(
+                [sys.executable, __file__, modo, caminho_payload, caminho_banco],
+                capture_output=True, text=True, check=True
+            ).stdout.split()
+            linhas, tempo, pico_mb = int(saida[0]), float(saida[1]), float(saida[2])
+
+            print(f"\n Modo {modo}:")
+            print(f"  Linhas gravadas: {linhas}")
+            print(f"  Tempo: {tempo:.2f} s ({linhas / tempo:,.0f} linhas/s)")
+            print(f"  Pico de memoria (RSS): {pico_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        executar_modo(*sys.argv[1:])
+    else:
+        executar_benchmark()
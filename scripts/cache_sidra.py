@@ -0,0 +1,186 @@
+# cache_sidra.py - CACHE EM DISCO DAS RESPOSTAS SIDRA
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import unquote, urlsplit, urlunsplit
+
+import configuracao
+
+DIRETORIO_CACHE = os.environ.get('SIDRA_CACHE_DIR', configuracao.caminho_dados('cache_sidra'))
+
+# Validade padrao das entradas sem revalidacao (segundos)
+TTL_PADRAO = int(os.environ.get('SIDRA_CACHE_TTL', 24 * 3600))
+
+MODO_OFFLINE = os.environ.get('SIDRA_OFFLINE', '') == '1'
+
+TAMANHO_BLOCO = 64 * 1024
+
+
+class ErroCacheOffline(LookupError):
+    """URL pedida em modo offline sem entrada no cache"""
+
+
+def normalizar_url(url):
+    """Normaliza a URL SIDRA para uso como chave (caixa, barras e codificacao)"""
+    partes = urlsplit(url.strip())
+    caminho = unquote(partes.path).lower()
+    while '//' in caminho:
+        caminho = caminho.replace('//', '/')
+    caminho = caminho.rstrip('/')
+    consulta = '&'.join(sorted(partes.query.split('&'))) if partes.query else ''
+    return urlunsplit((partes.scheme.lower(), partes.netloc.lower(), caminho, consulta, ''))
+
+
+class EntradaCache:
+    """Resposta armazenada: corpo comprimido em disco + metadados"""
+
+    def __init__(self, caminho_corpo, metadados, origem):
+        self.caminho_corpo = caminho_corpo
+        self.metadados = metadados
+        self.origem = origem  # 'cache', 'revalidado' ou 'rede'
+
+    @property
+    def hash_conteudo(self):
+        return self.metadados['hash_conteudo']
+
+    def iterar_blocos(self, tamanho_bloco=TAMANHO_BLOCO):
+        with gzip.open(self.caminho_corpo, 'rb') as arquivo:
+            while True:
+                bloco = arquivo.read(tamanho_bloco)
+                if not bloco:
+                    return
+                yield bloco
+
+    def ler_corpo(self):
+        with gzip.open(self.caminho_corpo, 'rb') as arquivo:
+            return arquivo.read()
+
+
+class CacheSIDRA:
+    """Cache de respostas com ETag/Last-Modified, TTL e hash de conteudo"""
+
+    def __init__(self, diretorio=DIRETORIO_CACHE, ttl=TTL_PADRAO, offline=MODO_OFFLINE):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self.offline = offline
+        os.makedirs(diretorio, exist_ok=True)
+
+        # acertos: servido do disco; revalidacoes: 304; ausencias: baixado da rede (nao e erro)
+        self.acertos = 0
+        self.revalidacoes = 0
+        self.ausencias = 0
+        self.trava = threading.Lock()
+
+    def _caminhos(self, url):
+        chave = hashlib.sha256(normalizar_url(url).encode('utf-8')).hexdigest()
+        base = os.path.join(self.diretorio, chave)
+        return base + '.json.gz', base + '.meta.json'
+
+    def _ler_metadados(self, url):
+        _, caminho_meta = self._caminhos(url)
+        try:
+            with open(caminho_meta, encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _gravar_metadados(self, url, metadados):
+        _, caminho_meta = self._caminhos(url)
+        temporario = caminho_meta + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(metadados, arquivo)
+        os.replace(temporario, caminho_meta)
+
+    def _contar(self, contador):
+        with self.trava:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def _gravar_corpo(self, url, response):
+        """Grava o corpo comprimido em streaming, calculando o hash no caminho"""
+        caminho_corpo, _ = self._caminhos(url)
+        temporario = caminho_corpo + f'.{threading.get_ident()}.tmp'
+        resumo = hashlib.sha256()
+        tamanho = 0
+
+        with gzip.open(temporario, 'wb', compresslevel=6) as arquivo:
+            for bloco in response.iter_content(TAMANHO_BLOCO):
+                resumo.update(bloco)
+                tamanho += len(bloco)
+                arquivo.write(bloco)
+        os.replace(temporario, caminho_corpo)
+
+        metadados = {
+            'url': normalizar_url(url),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'hash_conteudo': resumo.hexdigest(),
+            'bytes': tamanho,
+            'salvo_em': time.time(),
+            'processados': (self._ler_metadados(url) or {}).get('processados', {})
+        }
+        self._gravar_metadados(url, metadados)
+        return metadados
+
+    def obter(self, url, buscar_http):
+        """Devolve uma EntradaCache, indo a rede apenas quando necessario
+
+        `buscar_http(url, cabecalhos)` deve devolver uma resposta requests com stream=True.
+        """
+        caminho_corpo, _ = self._caminhos(url)
+        metadados = self._ler_metadados(url)
+        if metadados and not os.path.exists(caminho_corpo):
+            metadados = None
+
+        if self.offline:
+            if metadados is None:
+                raise ErroCacheOffline(f"Sem cache para {url} (modo offline)")
+            self._contar('acertos')
+            return EntradaCache(caminho_corpo, metadados, 'cache')
+
+        if metadados and time.time() - metadados['salvo_em'] < self.ttl:
+            self._contar('acertos')
+            return EntradaCache(caminho_corpo, metadados, 'cache')
+
+        cabecalhos = {}
+        if metadados and metadados.get('etag'):
+            cabecalhos['If-None-Match'] = metadados['etag']
+        if metadados and metadados.get('last_modified'):
+            cabecalhos['If-Modified-Since'] = metadados['last_modified']
+
+        response = buscar_http(url, cabecalhos)
+        try:
+            if response.status_code == 304 and metadados:
+                metadados['salvo_em'] = time.time()
+                self._gravar_metadados(url, metadados)
+                self._contar('revalidacoes')
+                return EntradaCache(caminho_corpo, metadados, 'revalidado')
+
+            metadados = self._gravar_corpo(url, response)
+            self._contar('ausencias')
+            return EntradaCache(caminho_corpo, metadados, 'rede')
+        finally:
+            response.close()
+
+    def ja_processado(self, url, hash_conteudo, destino):
+        """True se este mesmo conteudo ja foi carregado neste destino (banco + tabela)"""
+        metadados = self._ler_metadados(url)
+        return bool(metadados) and metadados.get('processados', {}).get(destino) == hash_conteudo
+
+    def marcar_processado(self, url, hash_conteudo, destino):
+        """Registra que o conteudo foi carregado com sucesso no destino"""
+        metadados = self._ler_metadados(url)
+        if metadados:
+            metadados.setdefault('processados', {})[destino] = hash_conteudo
+            self._gravar_metadados(url, metadados)
+
+    def estatisticas(self):
+        total = self.acertos + self.revalidacoes + self.ausencias
+        return {
+            'acertos': self.acertos,
+            'revalidacoes': self.revalidacoes,
+            'ausencias': self.ausencias,
+            'taxa_acerto': (self.acertos + self.revalidacoes) / total if total else 0.0
+        }
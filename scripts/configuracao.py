@@ -0,0 +1,74 @@
+# configuracao.py - CONFIGURACAO COMPARTILHADA (BANCO, TERRITORIOS, TABELAS, PROCESSOS)
+import os
+import tomllib
+
+# Raiz do repositorio: os caminhos nao dependem do diretorio de trabalho
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prioridade: variaveis PNAD_* (a CLI grava as opcoes nelas) > pnad.toml > padroes
+CAMINHO_ARQUIVO = os.environ.get('PNAD_CONFIG', os.path.join(RAIZ, 'pnad.toml'))
+
+# Chave do pnad.toml -> variavel de ambiente
+VARIAVEIS = {
+    'dados': 'PNAD_DADOS',
+    'banco': 'PNAD_BANCO',
+    'territorios': 'PNAD_TERRITORIOS',
+    'tabelas': 'PNAD_TABELAS',
+    'processos': 'PNAD_PROCESSOS'
+}
+
+
+def ler_arquivo(caminho=CAMINHO_ARQUIVO):
+    """Secao [pnad] do pnad.toml ({} sem arquivo)"""
+    try:
+        with open(caminho, 'rb') as arquivo:
+            return tomllib.load(arquivo).get('pnad', {})
+    except FileNotFoundError:
+        return {}
+
+
+def interpretar_territorios(texto):
+    """'n3=35,33;n7=all' -> {'n3': ['35', '33'], 'n7': ['all']}"""
+    niveis = {}
+    for parte in filter(None, texto.split(';')):
+        nivel, _, territorios = parte.partition('=')
+        niveis[nivel.strip()] = [territorio.strip() for territorio in territorios.split(',')]
+    return niveis
+
+
+def interpretar_tabelas(texto):
+    """'4099/4099,6381/4099' -> [('4099', '4099'), ('6381', '4099')]"""
+    return [tuple(par.strip().split('/')) for par in texto.split(',') if par.strip()]
+
+
+def carregar(caminho=CAMINHO_ARQUIVO, ambiente=None):
+    """Configuracao efetiva: dados, banco, territorios, tabelas, processos"""
+    ambiente = os.environ if ambiente is None else ambiente
+    arquivo = ler_arquivo(caminho)
+    valores = {chave: ambiente.get(variavel) or arquivo.get(chave) for chave, variavel in VARIAVEIS.items()}
+
+    dados = os.path.abspath(os.path.join(RAIZ, valores['dados'] or 'data'))
+    territorios, tabelas = valores['territorios'] or {}, valores['tabelas'] or []
+    return {
+        'dados': dados,
+        'banco': os.path.abspath(os.path.join(dados, valores['banco'] or 'ibge_analise.db')),
+        'territorios': interpretar_territorios(territorios) if isinstance(territorios, str) else territorios,
+        'tabelas': interpretar_tabelas(tabelas) if isinstance(tabelas, str) else [tuple(par) for par in tabelas],
+        # None: cada etapa decide (os.cpu_count() nas previsoes, 1 nos microdados)
+        'processos': int(valores['processos']) if valores['processos'] else None
+    }
+
+
+CONFIGURACAO = carregar()
+
+DIRETORIO_DADOS = CONFIGURACAO['dados']
+CAMINHO_BANCO = CONFIGURACAO['banco']
+# Vazios: padroes do pnad_etl (UFs e regioes metropolitanas da tabela 4099)
+TERRITORIOS = CONFIGURACAO['territorios']
+TABELAS = CONFIGURACAO['tabelas']
+PROCESSOS = CONFIGURACAO['processos']
+
+
+def caminho_dados(*partes):
+    """Caminho dentro do diretorio de dados (data/ por padrao)"""
+    return os.path.join(DIRETORIO_DADOS, *partes)
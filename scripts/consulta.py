@@ -0,0 +1,176 @@
+# consulta.py - CONSULTAS PREGUICOSAS AO BANCO PNAD (FILTROS E COLUNAS VIRAM SQL)
+import re
+
+import pandas as pd
+
+import esquema
+import instrumentacao
+import tipos
+
+TAMANHO_LOTE = 50_000
+
+OPERADORES = {'=', '!=', '<', '<=', '>', '>=', 'IN', 'NOT IN'}
+
+FUNCOES_AGREGACAO = {'COUNT', 'SUM', 'AVG', 'MIN', 'MAX'}
+
+_IDENTIFICADOR = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def _identificador(nome):
+    if not _IDENTIFICADOR.match(nome):
+        raise ValueError(f"Nome de coluna/tabela invalido: {nome!r}")
+    return nome
+
+
+class Consulta:
+    """Consulta composta por metodos encadeados; nada e lido ate dataframe()/lotes()
+
+    Cada metodo devolve uma nova Consulta (a original nao muda), entao uma base
+    pode ser reaproveitada:
+
+        base = Consulta('dashboard_pnad').colunas('D3C', 'taxa_desocupacao')
+        sp = base.territorios('35').periodos('202001').dataframe(conn)
+
+    Os filtros vao para o WHERE (usando a chave primaria e os indices de
+    periodo/territorio) e so as colunas pedidas saem do SQLite.
+    """
+
+    def __init__(self, tabela, selecao=None, condicoes=(), parametros=(), ordem=(), limite=None):
+        self.tabela = _identificador(tabela)
+        self.selecao = list(selecao) if selecao else None
+        self.condicoes = tuple(condicoes)
+        self.parametros = tuple(parametros)
+        self.ordem = tuple(ordem)
+        self.limite = limite
+
+    def _copiar(self, **alteracoes):
+        atributos = {
+            'selecao': self.selecao, 'condicoes': self.condicoes, 'parametros': self.parametros,
+            'ordem': self.ordem, 'limite': self.limite
+        }
+        atributos.update(alteracoes)
+        return Consulta(self.tabela, **atributos)
+
+    # ---------- PROJECAO E FILTROS ----------
+
+    def colunas(self, *colunas):
+        return self._copiar(selecao=[_identificador(coluna) for coluna in colunas])
+
+    def onde(self, coluna, operador, valor):
+        """Filtro generico: onde('taxa_desocupacao', '>', 10), onde('trimestre', 'IN', [...])"""
+        operador = operador.upper()
+        if operador not in OPERADORES:
+            raise ValueError(f"Operador nao suportado: {operador}")
+        if operador in ('IN', 'NOT IN'):
+            valores = [str(item) if not isinstance(item, (int, float)) else item for item in valor]
+            if not valores:
+                # IN () vazio: nenhuma linha (NOT IN vazio nao filtra)
+                return self._copiar(condicoes=self.condicoes + ('0' if operador == 'IN' else '1',))
+            condicao = f"{_identificador(coluna)} {operador} ({', '.join('?' * len(valores))})"
+            return self._copiar(condicoes=self.condicoes + (condicao,), parametros=self.parametros + tuple(valores))
+        return self._copiar(condicoes=self.condicoes + (f"{_identificador(coluna)} {operador} ?",),
+                            parametros=self.parametros + (valor,))
+
+    def tabelas(self, *codigos):
+        return self.onde('tabela', 'IN', codigos)
+
+    def indicadores(self, *codigos):
+        return self.onde('D2C', 'IN', codigos)
+
+    def territorios(self, *codigos):
+        return self.onde('D1C', 'IN', codigos)
+
+    def periodos(self, inicio=None, fim=None):
+        """Intervalo fechado de codigos D3C (AAAAMM ou AAAAQQ)"""
+        consulta = self
+        if inicio is not None:
+            consulta = consulta.onde('D3C', '>=', str(inicio))
+        if fim is not None:
+            consulta = consulta.onde('D3C', '<=', str(fim))
+        return consulta
+
+    def anos(self, inicio=None, fim=None):
+        """Intervalo de anos pelo prefixo do D3C (usa o indice, vale tambem para pnad_historico)"""
+        return self.periodos(None if inicio is None else f"{inicio}00", None if fim is None else f"{fim}99")
+
+    def trimestres_padrao(self):
+        return self.onde('trimestre', 'IN', esquema.TRIMESTRES_PADRAO)
+
+    def ordenar(self, *colunas):
+        return self._copiar(ordem=tuple(_identificador(coluna) for coluna in colunas))
+
+    def limitar(self, linhas):
+        return self._copiar(limite=int(linhas))
+
+    # ---------- COMPILACAO ----------
+
+    def _sql_onde(self):
+        return f" WHERE {' AND '.join(self.condicoes)}" if self.condicoes else ''
+
+    def sql(self):
+        """(sql, parametros) da consulta"""
+        selecao = ', '.join(self.selecao) if self.selecao else '*'
+        sql = f"SELECT {selecao} FROM {self.tabela}{self._sql_onde()}"
+        if self.ordem:
+            sql += f" ORDER BY {', '.join(self.ordem)}"
+        if self.limite is not None:
+            sql += f" LIMIT {self.limite}"
+        return sql, list(self.parametros)
+
+    def __repr__(self):
+        sql, parametros = self.sql()
+        return f"Consulta({sql!r}, {parametros!r})"
+
+    def plano(self, conn):
+        """EXPLAIN QUERY PLAN: mostra se os filtros usam a chave/indices"""
+        sql, parametros = self.sql()
+        return [linha[-1] for linha in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+
+    # ---------- EXECUCAO ----------
+
+    def lotes(self, conn, tamanho_lote=TAMANHO_LOTE, tipar=True):
+        """Gerador de DataFrames de ate tamanho_lote linhas (memoria limitada ao lote)"""
+        sql, parametros = self.sql()
+        cursor = conn.execute(sql, parametros)
+        colunas = [descricao[0] for descricao in cursor.description]
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                return
+            lote = pd.DataFrame.from_records(linhas, columns=colunas)
+            yield tipos.aplicar_tipos(lote) if tipar else lote
+
+    def dataframe(self, conn, tipar=True):
+        """Resultado inteiro em um DataFrame (tipos compactos de tipos.POLITICA)"""
+        sql, parametros = self.sql()
+        with instrumentacao.span('sql_read', tabela=self.tabela) as medicao:
+            df = pd.read_sql(sql, conn, params=parametros)
+            medicao.linhas_saida = len(df)
+        return tipos.aplicar_tipos(df) if tipar else df
+
+    def contar(self, conn):
+        return conn.execute(f"SELECT COUNT(*) FROM {self.tabela}{self._sql_onde()}", self.parametros).fetchone()[0]
+
+    def agregar(self, conn, grupos, medidas):
+        """GROUP BY no SQLite; medidas = {'media': ('AVG', 'taxa_desocupacao'), 'linhas': ('COUNT', '*')}"""
+        selecao = [_identificador(coluna) for coluna in grupos]
+        for nome, (funcao, coluna) in medidas.items():
+            if funcao.upper() not in FUNCOES_AGREGACAO:
+                raise ValueError(f"Funcao de agregacao nao suportada: {funcao}")
+            argumento = '*' if coluna == '*' else _identificador(coluna)
+            selecao.append(f"{funcao.upper()}({argumento}) AS {_identificador(nome)}")
+        agrupamento = ', '.join(selecao[:len(grupos)])
+        sql = f"SELECT {', '.join(selecao)} FROM {self.tabela}{self._sql_onde()}"
+        if grupos:
+            sql += f" GROUP BY {agrupamento} ORDER BY {agrupamento}"
+        return pd.read_sql(sql, conn, params=list(self.parametros))
+
+    def contar_por(self, conn, *colunas):
+        """Linhas por grupo (GROUP BY no SQLite): Series indexada pelas colunas"""
+        grupos = ', '.join(_identificador(coluna) for coluna in colunas)
+        df = pd.read_sql(
+            f"SELECT {grupos}, COUNT(*) AS linhas FROM {self.tabela}{self._sql_onde()} "
+            f"GROUP BY {grupos} ORDER BY {grupos}",
+            conn, params=list(self.parametros)
+        )
+        return df.set_index(list(colunas))['linhas']
@@ -1,35 +1,46 @@
 # corrigir_trimestres.py
-import pandas as pd
-import sqlite3
+import configuracao
+import esquema
+import instrumentacao
+from consulta import Consulta
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+TRIMESTRES_VALIDOS = esquema.TRIMESTRES_PADRAO
+
+def filtrar_trimestres_padrao(df):
+    """Mantem apenas os trimestres padrao (descarta trimestres moveis sobrepostos)"""
+    return df[df['trimestre'].isin(TRIMESTRES_VALIDOS)]
 
 def corrigir_dados():
     print(" CORRIGINDO DADOS PARA TRIMESTRES PADRÃO...")
     
-    conn = sqlite3.connect('../data/ibge_analise.db')
+    conn = esquema.conectar(CAMINHO_BANCO)
     
     try:
-        # Ler dados
-        df = pd.read_sql('SELECT * FROM powerbi_otimizado', conn)
-        
-        # Manter apenas trimestres padrão
-        trimestres_validos = ['jan-fev-mar', 'abr-mai-jun', 'jul-ago-set', 'out-nov-dez']
-        df_corrigido = df[df['trimestre'].isin(trimestres_validos)].copy()
-        
-        print(f" Registros antes: {len(df)}")
-        print(f" Registros depois: {len(df_corrigido)}")
+        with instrumentacao.etapa('corrigir') as medicao:
+            # Contagens no SQLite: o filtro de trimestres padrão vai para o WHERE
+            with instrumentacao.span('sql_read', tabela='powerbi_otimizado'):
+                base = Consulta('powerbi_otimizado')
+                medicao.linhas_entrada = base.contar(conn)
+                por_ano = base.trimestres_padrao().contar_por(conn, 'ano')
+            medicao.linhas_saida = int(por_ano.sum())
+            
+            print(f" Registros antes: {medicao.linhas_entrada}")
+            print(f" Registros depois: {medicao.linhas_saida}")
         
-        # Salvar tabela corrigida
-        df_corrigido.to_sql('dashboard_pnad_corrigido', conn, if_exists='replace', index=False)
-        print(" Tabela corrigida salva: dashboard_pnad_corrigido")
+        # dashboard_pnad_corrigido e uma visao com o mesmo filtro: nada a gravar
+        print(" Visao corrigida: dashboard_pnad_corrigido (filtro sobre powerbi_otimizado)")
         
         # Verificar resultado
         print("\n Períodos por ano (CORRIGIDO):")
-        print(df_corrigido.groupby('ano').size())
+        print(por_ano)
         
     except Exception as e:
         print(f" Erro: {e}")
+        raise
     finally:
         conn.close()
+        instrumentacao.exportar()
 
 if __name__ == "__main__":
     corrigir_dados()
\ No newline at end of file
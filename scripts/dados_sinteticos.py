@@ -0,0 +1,194 @@
+# dados_sinteticos.py - GERADOR DE DADOS NO LAYOUT SIDRA
+import json
+
+import numpy as np
+import pandas as pd
+
+from extrator_sidra import UFS
+from periodos import ROTULOS_TRIMESTRE
+from servidor_sidra_local import CABECALHO_SIDRA
+
+NOMES_TRIMESTRES = {1: '1º trimestre', 2: '2º trimestre', 3: '3º trimestre', 4: '4º trimestre'}
+
+
+def gerar_periodos_trimestrais(quantidade, ano_inicial=2012):
+    """Codigos D3C trimestrais (AAAAQQ) e seus nomes D3N"""
+    periodos = []
+    for i in range(quantidade):
+        ano, trimestre = ano_inicial + i // 4, i % 4 + 1
+        periodos.append((f"{ano}{trimestre:02d}", f"{NOMES_TRIMESTRES[trimestre]} {ano}"))
+    return periodos
+
+
+def gerar_periodos_moveis(quantidade, ano_inicial=2012):
+    """Codigos D3C de trimestre movel (AAAAMM, como a tabela 6381) e seus nomes D3N"""
+    periodos = []
+    for i in range(quantidade):
+        ano, mes = ano_inicial + (i + 2) // 12, (i + 2) % 12 + 1
+        periodos.append((f"{ano}{mes:02d}", f"{ROTULOS_TRIMESTRE[mes - 1]} {ano}"))
+    return periodos
+
+
+# periodicidade -> (gerador de periodos, tabela SIDRA de referencia)
+PERIODICIDADES = {
+    'trimestral': (gerar_periodos_trimestrais, '4099'),
+    'movel': (gerar_periodos_moveis, '6381')
+}
+
+
+def gerar_territorios(quantidade):
+    """Codigos de UF reais e, acima de 27, codigos ficticios"""
+    codigos = UFS[:quantidade] + [str(100 + i) for i in range(max(0, quantidade - len(UFS)))]
+    return [(codigo, f"Territorio {codigo}") for codigo in codigos]
+
+
+def iterar_registros_sidra(n_territorios=27, n_variaveis=1, n_periodos=160, nivel='3', semente=42,
+                           periodicidade='trimestral'):
+    """Gera registros (dicts) com as colunas NC/NN/MC/MN/V/D1C/D1N/D2C/D2N/D3C/D3N
+
+    periodicidade 'trimestral' (AAAAQQ, 4099) ou 'movel' (AAAAMM, 6381).
+    """
+    rng = np.random.default_rng(semente)
+    territorios = gerar_territorios(n_territorios)
+    periodos = PERIODICIDADES[periodicidade][0](n_periodos)
+    variaveis = [(str(4099 + i), f"Variavel sintetica {4099 + i}") for i in range(n_variaveis)]
+
+    for cod_territorio, nome_territorio in territorios:
+        for cod_variavel, nome_variavel in variaveis:
+            # passeio aleatorio em torno de 10% com sazonalidade trimestral
+            base = 10 + np.cumsum(rng.normal(0, 0.3, n_periodos))
+            sazonal = np.tile([0.8, 0.2, -0.3, -0.7], n_periodos // 4 + 1)[:n_periodos]
+            valores = np.clip(base + sazonal, 0.5, 40)
+
+            for (cod_periodo, nome_periodo), valor in zip(periodos, valores):
+                yield {
+                    'NC': nivel,
+                    'NN': 'Unidade da Federação',
+                    'MC': '2',
+                    'MN': '%',
+                    'V': f"{valor:.1f}",
+                    'D1C': cod_territorio,
+                    'D1N': nome_territorio,
+                    'D2C': cod_variavel,
+                    'D2N': nome_variavel,
+                    'D3C': cod_periodo,
+                    'D3N': nome_periodo
+                }
+
+
+def gerar_registros_sidra(n_territorios=27, n_variaveis=1, n_periodos=160, nivel='3', semente=42,
+                          periodicidade='trimestral'):
+    """Lista de registros sinteticos no layout SIDRA"""
+    return list(iterar_registros_sidra(n_territorios, n_variaveis, n_periodos, nivel, semente, periodicidade))
+
+
+def escrever_payload_sidra(caminho, n_territorios=27, n_variaveis=1, n_periodos=160, nivel='3',
+                           periodicidade='trimestral'):
+    """Escreve em disco uma resposta SIDRA (array JSON com cabecalho) sem mante-la em memoria"""
+    total = 0
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write('[' + json.dumps(CABECALHO_SIDRA, ensure_ascii=False))
+        for registro in iterar_registros_sidra(n_territorios, n_variaveis, n_periodos, nivel,
+                                               periodicidade=periodicidade):
+            arquivo.write(',\n' + json.dumps(registro, ensure_ascii=False))
+            total += 1
+        arquivo.write(']')
+    return total
+
+
+def gerar_dashboard_sintetico(n_linhas, n_territorios=27, n_periodos=160, semente=42):
+    """DataFrame no formato dashboard_pnad com n_linhas (gerado com operacoes de array)
+
+    O numero de periodos fica limitado a n_periodos; acima de
+    n_territorios x n_periodos linhas, cresce o numero de territorios.
+    """
+    rng = np.random.default_rng(semente)
+    n_periodos = min(n_periodos, max(1, -(-n_linhas // n_territorios)))
+    n_territorios = max(n_territorios, -(-n_linhas // n_periodos))
+    territorios = gerar_territorios(n_territorios)
+    periodos = gerar_periodos_trimestrais(n_periodos)
+
+    i_territorio = np.arange(n_linhas) % n_territorios
+    i_periodo = np.arange(n_linhas) // n_territorios
+    taxa = np.round(np.clip(10 + rng.normal(0, 3, n_linhas), 0.5, 40), 1)
+    media = taxa.mean()
+
+    codigos_periodo = np.array([codigo for codigo, _ in periodos])
+    nomes_periodo = np.array([nome for _, nome in periodos])
+    codigos_territorio = np.array([codigo for codigo, _ in territorios])
+    nomes_territorio = np.array([nome for _, nome in territorios])
+    ano = 2012 + i_periodo // 4
+    trimestre = i_periodo % 4 + 1
+
+    return pd.DataFrame({
+        'tabela': '4099',
+        'D2C': '4099',
+        'D1C': codigos_territorio[i_territorio],
+        'D3C': codigos_periodo[i_periodo],
+        'data_referencia': pd.to_datetime(
+            pd.DataFrame({'year': ano, 'month': trimestre * 3, 'day': 1})
+        ) + pd.offsets.MonthEnd(0),
+        'periodo': nomes_periodo[i_periodo],
+        'ano': ano,
+        'trimestre': np.array(['jan-fev-mar', 'abr-mai-jun', 'jul-ago-set', 'out-nov-dez'])[trimestre - 1],
+        'taxa_desocupacao': taxa,
+        'variacao_periodo': np.round(rng.normal(0, 2, n_linhas), 2),
+        'vs_media_historica': taxa - media,
+        'status': np.where(taxa > media, 'Acima da Media', 'Abaixo da Media'),
+        'nivel_desocupacao': np.select([taxa <= 7, taxa <= 10], ['Baixa', 'Moderada'], 'Alta'),
+        'media_movel_4p': taxa,
+        'localidade': nomes_territorio[i_territorio]
+    })
+
+
+# Variaveis dos microdados sinteticos: (nome, inicio a partir de 1, tamanho, texto)
+LAYOUT_MICRODADOS = [
+    ('Ano', 1, 4, True), ('Trimestre', 5, 1, True), ('UF', 6, 2, True),
+    ('V1028', 50, 15, False), ('V2007', 95, 1, True), ('V2009', 104, 3, True), ('V2010', 107, 1, True),
+    ('VD3004', 380, 1, True), ('VD4001', 385, 1, True), ('VD4002', 386, 1, True)
+]
+LARGURA_MICRODADOS = 420
+
+
+def escrever_dicionario_microdados(caminho):
+    """Dicionario no formato do input SAS do IBGE ("@0001 Ano $4. /* ... */")"""
+    with open(caminho, 'w', encoding='latin-1') as arquivo:
+        arquivo.write("input\n")
+        for nome, inicio, tamanho, texto in LAYOUT_MICRODADOS:
+            arquivo.write(f"@{inicio:04d} {nome} {'$' if texto else ''}{tamanho}. /* {nome} */\n")
+        arquivo.write(";\n")
+
+
+def _campo_bytes(valores, tamanho):
+    return np.frombuffer(np.asarray(valores).astype(f'S{tamanho}').tobytes(), dtype=np.uint8).reshape(-1, tamanho)
+
+
+def escrever_microdados(caminho, n_registros, ano=2023, trimestre=1, semente=42, linhas_por_bloco=100_000):
+    """Arquivo de largura fixa no layout de LAYOUT_MICRODADOS, gerado em blocos
+
+    Pessoas com menos de 14 anos ficam com VD4001/VD4002 em branco; a
+    desocupacao varia por UF e faixa etaria. Devolve o tamanho em bytes.
+    """
+    rng = np.random.default_rng(semente)
+    with open(caminho, 'wb') as arquivo:
+        for inicio in range(0, n_registros, linhas_por_bloco):
+            n = min(linhas_por_bloco, n_registros - inicio)
+            uf = np.array(UFS)[rng.integers(0, len(UFS), n)]
+            idade = rng.integers(0, 90, n)
+            na_forca = (idade >= 14) & (rng.random(n) < 0.62)
+            chance = 0.05 + 0.10 * (idade < 25) + 0.002 * (uf.astype(int) % 10)
+            desocupada = na_forca & (rng.random(n) < chance)
+            campos = {
+                'Ano': np.full(n, str(ano)), 'Trimestre': np.full(n, str(trimestre)), 'UF': uf,
+                'V1028': np.char.zfill(np.char.mod('%.8f', rng.uniform(50, 900, n)), 15),
+                'V2007': rng.integers(1, 3, n).astype(str), 'V2009': np.char.zfill(idade.astype(str), 3),
+                'V2010': rng.choice(['1', '2', '3', '4', '5', '9'], n), 'VD3004': rng.integers(1, 8, n).astype(str),
+                'VD4001': np.where(idade >= 14, np.where(na_forca, '1', '2'), ' '),
+                'VD4002': np.where(na_forca, np.where(desocupada, '2', '1'), ' ')
+            }
+            bloco = np.full((n, LARGURA_MICRODADOS + 1), ord('0'), dtype=np.uint8)
+            bloco[:, -1] = ord('\n')
+            for nome, posicao, tamanho, _ in LAYOUT_MICRODADOS:
+                bloco[:, posicao - 1:posicao - 1 + tamanho] = _campo_bytes(campos[nome], tamanho)
+            arquivo.write(bloco.tobytes())
+    return n_registros * (LARGURA_MICRODADOS + 1)
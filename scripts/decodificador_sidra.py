@@ -0,0 +1,129 @@
+# decodificador_sidra.py - LEITURA EM STREAMING DAS RESPOSTAS SIDRA
+import codecs
+import json
+
+import esquema
+
+COLUNAS_SIDRA = ['NC', 'NN', 'MC', 'MN', 'V', 'D1C', 'D1N', 'D2C', 'D2N', 'D3C', 'D3N']
+
+# Marcadores do SIDRA para valor ausente, sigiloso ou nao aplicavel
+VALORES_AUSENTES = {'', '-', '..', '...', 'X'}
+
+TAMANHO_LEITURA = 64 * 1024
+TAMANHO_LOTE = 10_000
+
+
+def iterar_elementos_json(blocos):
+    """Decodifica um array JSON elemento a elemento a partir de blocos de bytes"""
+    decodificador_utf8 = codecs.getincrementaldecoder('utf-8')()
+    decodificador_json = json.JSONDecoder()
+    buffer = ''
+    posicao = 0
+    inicio_array = False
+    blocos = iter(blocos)
+    fim_dos_dados = False
+
+    while True:
+        # Pula espacos e separadores ate o proximo elemento
+        while posicao < len(buffer) and buffer[posicao] in ' \t\r\n,':
+            posicao += 1
+
+        if posicao < len(buffer):
+            if not inicio_array:
+                if buffer[posicao] != '[':
+                    raise ValueError("Resposta SIDRA nao e um array JSON")
+                inicio_array = True
+                posicao += 1
+                continue
+
+            if buffer[posicao] == ']':
+                return
+
+            try:
+                elemento, fim = decodificador_json.raw_decode(buffer, posicao)
+            except json.JSONDecodeError:
+                if fim_dos_dados:
+                    raise
+            else:
+                posicao = fim
+                yield elemento
+                continue
+
+        if fim_dos_dados:
+            raise ValueError("Resposta SIDRA truncada")
+
+        # Descarta o que ja foi lido e busca mais bytes
+        buffer = buffer[posicao:]
+        posicao = 0
+        bloco = next(blocos, None)
+        if bloco is None:
+            buffer += decodificador_utf8.decode(b'', final=True)
+            fim_dos_dados = True
+        else:
+            buffer += decodificador_utf8.decode(bloco)
+
+
+def iterar_blocos_arquivo(caminho, tamanho_leitura=TAMANHO_LEITURA):
+    """Le um arquivo em blocos de bytes (payload salvo em disco)"""
+    with open(caminho, 'rb') as arquivo:
+        while True:
+            bloco = arquivo.read(tamanho_leitura)
+            if not bloco:
+                return
+            yield bloco
+
+
+def converter_valor(valor):
+    """Converte o campo V para float (None para marcadores de ausencia)"""
+    if valor is None or valor in VALORES_AUSENTES:
+        return None
+    return float(valor)
+
+
+def iterar_linhas_tipadas(elementos, tabela_sidra=None):
+    """Pula o cabecalho e devolve tuplas com V como float"""
+    elementos = iter(elementos)
+    next(elementos, None)  # primeira linha = descricao das colunas
+
+    indice_v = COLUNAS_SIDRA.index('V')
+    for elemento in elementos:
+        linha = [elemento.get(coluna) for coluna in COLUNAS_SIDRA]
+        linha[indice_v] = converter_valor(linha[indice_v])
+        if tabela_sidra is not None:
+            linha.append(tabela_sidra)
+        yield tuple(linha)
+
+
+def garantir_tabela(conn, tabela='pnad_historico'):
+    """Cria a tabela de destino com o esquema tipado declarado em esquema.py"""
+    conn.execute(esquema.sql_criar_tabela(tabela))
+    for sql in esquema.sql_criar_indices(tabela):
+        conn.execute(sql)
+
+
+def gravar_lote(conn, lote, tabela='pnad_historico'):
+    """Upsert do lote pela chave (tabela, D2C, D1C, D3C)"""
+    with conn:
+        conn.executemany(esquema.sql_upsert(tabela, COLUNAS_SIDRA + ['tabela']), lote)
+
+
+def carregar_em_lotes(conn, blocos, tabela_sidra, tabela='pnad_historico', tamanho_lote=TAMANHO_LOTE,
+                      gravar=gravar_lote, criar_tabela=True):
+    """Decodifica o payload em streaming e grava lotes de tamanho fixo no SQLite"""
+    if criar_tabela:
+        garantir_tabela(conn, tabela)
+
+    total = 0
+    lote = []
+    for linha in iterar_linhas_tipadas(iterar_elementos_json(blocos), tabela_sidra):
+        lote.append(linha)
+        if len(lote) >= tamanho_lote:
+            gravar(conn, lote, tabela)
+            total += len(lote)
+            lote = []
+
+    if lote:
+        gravar(conn, lote, tabela)
+        total += len(lote)
+
+    return total
@@ -0,0 +1,420 @@
+# esquema.py - ESQUEMA TIPADO DO BANCO SQLITE, MIGRACOES E UPSERTS
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.request import pathname2url
+
+import numpy as np
+import pandas as pd
+
+import tipos
+
+# Tabela SIDRA assumida para linhas antigas, gravadas antes da coluna 'tabela'
+TABELA_PADRAO = '6381'
+
+# Chave de todas as tabelas de dados: (tabela, variavel, territorio, periodo)
+CHAVE = ['tabela', 'D2C', 'D1C', 'D3C']
+
+_COLUNAS_SIDRA = [
+    ('tabela', 'TEXT NOT NULL'),
+    ('NC', 'TEXT'),
+    ('NN', 'TEXT'),
+    ('MC', 'TEXT'),
+    ('MN', 'TEXT'),
+    ('V', 'REAL'),
+    ('D1C', 'TEXT NOT NULL'),
+    ('D1N', 'TEXT'),
+    ('D2C', 'TEXT NOT NULL'),
+    ('D2N', 'TEXT'),
+    ('D3C', 'TEXT NOT NULL'),
+    ('D3N', 'TEXT')
+]
+
+_COLUNAS_POWERBI = [
+    ('tabela', 'TEXT NOT NULL'),
+    ('NC', 'TEXT'),
+    ('NN', 'TEXT'),
+    ('unidade_medida', 'TEXT'),
+    ('unidade', 'TEXT'),
+    ('taxa_desocupacao', 'REAL'),
+    ('D1C', 'TEXT NOT NULL'),
+    ('localidade', 'TEXT'),
+    ('D2C', 'TEXT NOT NULL'),
+    ('indicador', 'TEXT'),
+    ('D3C', 'TEXT NOT NULL'),
+    ('periodo', 'TEXT'),
+    ('ano', 'INTEGER'),
+    ('trimestre', 'TEXT'),
+    ('data_referencia', 'DATE'),
+    ('variacao_periodo', 'REAL')
+]
+
+_COLUNAS_DASHBOARD = [
+    ('tabela', 'TEXT NOT NULL'),
+    ('D2C', 'TEXT NOT NULL'),
+    ('D1C', 'TEXT NOT NULL'),
+    ('D3C', 'TEXT NOT NULL'),
+    ('data_referencia', 'DATE'),
+    ('periodo', 'TEXT'),
+    ('ano', 'INTEGER'),
+    ('trimestre', 'TEXT'),
+    ('taxa_desocupacao', 'REAL'),
+    ('variacao_periodo', 'REAL'),
+    ('vs_media_historica', 'REAL'),
+    ('status', 'TEXT'),
+    ('nivel_desocupacao', 'TEXT'),
+    ('media_movel_4p', 'REAL'),
+    ('localidade', 'TEXT'),
+    ('variacao_anual', 'REAL'),
+    ('desvio_sazonal', 'REAL')
+]
+
+# Tabelas gerenciadas: colunas tipadas, chave primaria composta e indices
+TABELAS = {
+    'pnad_historico': _COLUNAS_SIDRA,
+    'powerbi_otimizado': _COLUNAS_POWERBI,
+    'dashboard_pnad': _COLUNAS_DASHBOARD
+}
+
+TRIMESTRES_PADRAO = ['jan-fev-mar', 'abr-mai-jun', 'jul-ago-set', 'out-nov-dez']
+
+# Tabelas derivadas que sao so um filtro de outra: visoes, sem copia dos dados.
+# powerbi_otimizado e dashboard_pnad ficam tabelas: o dashboard traz metricas
+# calculadas no pandas, e powerbi_otimizado e destino de carga do preparar
+VISOES = {
+    'dashboard_pnad_corrigido': (
+        "SELECT * FROM powerbi_otimizado WHERE trimestre IN ("
+        + ', '.join(f"'{trimestre}'" for trimestre in TRIMESTRES_PADRAO) + ")"
+    )
+}
+
+# Indices secundarios de todas as tabelas de dados (nome -> colunas)
+INDICES = {
+    'periodo': 'D3C',
+    'territorio': 'D1C, D3C'
+}
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,  # ~64 MB
+    'mmap_size': 268435456,
+    'busy_timeout': 5000
+}
+
+TAMANHO_LOTE = 50_000
+
+# Cargas com pelo menos tantas linhas derrubam os indices secundarios e os
+# recriam no fim (uma ordenacao em vez de milhoes de insercoes na arvore)
+LIMIAR_CARGA_EM_MASSA = 100_000
+
+# Durante a janela de carga: cache maior para as paginas da chave primaria
+PRAGMAS_CARGA = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -512000  # ~512 MB
+}
+
+
+def sql_criar_tabela(tabela, nome=None):
+    colunas = ',\n    '.join(f"{coluna} {tipo}" for coluna, tipo in TABELAS[tabela])
+    return (
+        f"CREATE TABLE IF NOT EXISTS {nome or tabela} (\n    {colunas},\n"
+        f"    PRIMARY KEY ({', '.join(CHAVE)})\n)"
+    )
+
+
+def sql_criar_indices(tabela):
+    return [
+        f"CREATE INDEX IF NOT EXISTS idx_{tabela}_{nome} ON {tabela} ({colunas})"
+        for nome, colunas in INDICES.items()
+    ]
+
+
+def sql_remover_indices(tabela):
+    return [f"DROP INDEX IF EXISTS idx_{tabela}_{nome}" for nome in INDICES]
+
+
+def sql_criar_visao(nome):
+    return f"CREATE VIEW IF NOT EXISTS {nome} AS {VISOES[nome]}"
+
+
+def sql_upsert(tabela, colunas):
+    """INSERT ... ON CONFLICT (chave) DO UPDATE para as colunas informadas"""
+    atualizacoes = ', '.join(f"{coluna} = excluded.{coluna}" for coluna in colunas if coluna not in CHAVE)
+    return (
+        f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))}) "
+        f"ON CONFLICT ({', '.join(CHAVE)}) DO "
+        + (f"UPDATE SET {atualizacoes}" if atualizacoes else "NOTHING")
+    )
+
+
+def _colunas_existentes(conn, tabela):
+    return [linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})")]
+
+
+def _tem_chave_primaria(conn, tabela):
+    return any(linha[5] for linha in conn.execute(f"PRAGMA table_info({tabela})"))
+
+
+# ---------- MIGRACOES ----------
+
+def _invalidar_pipeline(conn):
+    """Apaga as impressoes digitais do pipeline: a proxima execucao recalcula tudo"""
+    existe_controle = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='controle_pipeline'"
+    ).fetchone()
+    if existe_controle:
+        conn.execute("DELETE FROM controle_pipeline")
+
+
+def _migracao_1(conn):
+    """Tabelas tipadas com chave primaria; converte o historico gravado por to_sql"""
+    for tabela in TABELAS:
+        existentes = _colunas_existentes(conn, tabela)
+
+        if existentes and not _tem_chave_primaria(conn, tabela):
+            if tabela == 'pnad_historico':
+                # dado bruto: preserva, convertendo tipos e completando a coluna tabela
+                # (importado aqui: decodificador_sidra importa este modulo)
+                from decodificador_sidra import VALORES_AUSENTES
+                ausentes = ', '.join(f"'{valor}'" for valor in sorted(VALORES_AUSENTES))
+                conn.execute(f"ALTER TABLE {tabela} RENAME TO {tabela}_legado")
+                conn.execute(sql_criar_tabela(tabela))
+                selecao = [
+                    f"COALESCE(tabela, '{TABELA_PADRAO}')" if coluna == 'tabela' and 'tabela' in existentes
+                    else f"'{TABELA_PADRAO}'" if coluna == 'tabela'
+                    # simbolos do SIDRA sem valor viram NULL (CAST daria 0.0)
+                    else f"CASE WHEN V IS NULL OR TRIM(V) IN ({ausentes}) THEN NULL ELSE CAST(V AS REAL) END"
+                    if coluna == 'V'
+                    else coluna if coluna in existentes
+                    else 'NULL'
+                    for coluna, _ in TABELAS[tabela]
+                ]
+                colunas = ', '.join(coluna for coluna, _ in TABELAS[tabela])
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {tabela} ({colunas}) "
+                    f"SELECT {', '.join(selecao)} FROM {tabela}_legado"
+                )
+                conn.execute(f"DROP TABLE {tabela}_legado")
+            else:
+                # tabelas derivadas sao recalculadas pelo pipeline
+                conn.execute(f"DROP TABLE {tabela}")
+
+        conn.execute(sql_criar_tabela(tabela))
+        for sql in sql_criar_indices(tabela):
+            conn.execute(sql)
+
+    # indice criado pela carga em streaming antes do esquema gerenciado
+    conn.execute("DROP INDEX IF EXISTS idx_pnad_historico_chave")
+
+    # forca o pipeline a regravar as tabelas derivadas recriadas
+    _invalidar_pipeline(conn)
+
+
+def _migracao_2(conn):
+    """Metricas variacao_anual e desvio_sazonal em dashboard_pnad"""
+    existentes = _colunas_existentes(conn, 'dashboard_pnad')
+    for coluna in ('variacao_anual', 'desvio_sazonal'):
+        if coluna not in existentes:
+            conn.execute(f"ALTER TABLE dashboard_pnad ADD COLUMN {coluna} REAL")
+
+    # metricas passaram a ser calculadas por serie: recalcula tudo
+    _invalidar_pipeline(conn)
+
+
+def _migracao_3(conn):
+    """dashboard_pnad_corrigido passa a ser visao sobre powerbi_otimizado"""
+    for nome in VISOES:
+        tipo = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (nome,)).fetchone()
+        if tipo and tipo[0] == 'table':
+            conn.execute(f"DROP TABLE {nome}")
+        conn.execute(sql_criar_visao(nome))
+
+
+def _migracao_4(conn):
+    """Remove o catalogo da copia particionada (particoes.py descartado)"""
+    for tabela in ('catalogo_particoes', 'catalogo_territorios'):
+        conn.execute(f"DROP TABLE IF EXISTS {tabela}")
+
+
+MIGRACOES = [_migracao_1, _migracao_2, _migracao_3, _migracao_4]
+
+
+def migrar(conn):
+    """Aplica as migracoes pendentes (versao guardada em PRAGMA user_version)"""
+    versao = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    for numero, migracao in enumerate(MIGRACOES[versao:], start=versao + 1):
+        with conn:
+            migracao(conn)
+            conn.execute(f"PRAGMA user_version = {numero}")
+        print(f" Migracao {numero} aplicada: {migracao.__doc__}")
+
+
+def conectar(caminho_banco, **kwargs):
+    """Abre o banco com os pragmas de desempenho e o esquema atualizado"""
+    conn = sqlite3.connect(caminho_banco, **kwargs)
+    for pragma, valor in PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {valor}")
+    migrar(conn)
+    return conn
+
+
+def conectar_leitura(caminho_banco, **kwargs):
+    """Abre o banco somente leitura (`mode=ro`): sem pragmas nem migracoes"""
+    uri = f"file:{pathname2url(os.path.abspath(caminho_banco))}?mode=ro"
+    return sqlite3.connect(uri, uri=True, **kwargs)
+
+
+def caminho_versao(caminho_banco):
+    return caminho_banco + '.versao'
+
+
+def marcar_versao(caminho_banco):
+    """Grava um marcador novo ao fim de uma execucao do pipeline que alterou dados"""
+    caminho = caminho_versao(caminho_banco)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+        arquivo.write(datetime.now().isoformat(timespec='microseconds'))
+    os.replace(caminho + '.tmp', caminho)
+
+
+def ler_versao(caminho_banco):
+    """Marcador da ultima execucao do pipeline ('' se nunca marcado)"""
+    try:
+        with open(caminho_versao(caminho_banco), encoding='utf-8') as arquivo:
+            return arquivo.read()
+    except FileNotFoundError:
+        return ''
+
+
+# ---------- ESCRITA ----------
+
+def _converter_unicos(unicos, tipo):
+    """Valores unicos (sem ausentes) -> lista de objetos Python aceitos pelo sqlite3"""
+    unicos = pd.Series(unicos)
+    if tipo.startswith('REAL'):
+        valores = tipos.para_float64(unicos)
+        return [None if np.isnan(v) else v for v in valores.tolist()]
+    if tipo.startswith('INTEGER'):
+        valores = pd.to_numeric(unicos, errors='coerce').astype('Int64')
+        return [None if v is pd.NA else int(v) for v in valores.tolist()]
+    if tipo.startswith('DATE'):
+        datas = pd.to_datetime(unicos, errors='coerce')
+        return [None if pd.isna(v) else v for v in datas.dt.strftime('%Y-%m-%d').tolist()]
+    return [str(v) for v in unicos.tolist()]
+
+
+def _converter_coluna(serie, tipo):
+    """Converte uma coluna do DataFrame para valores Python aceitos pelo sqlite3
+
+    Cada valor distinto e convertido uma vez; as linhas recebem o resultado
+    por indexacao (ausentes viram None).
+    """
+    codigos, unicos = pd.factorize(serie)
+    tabela = np.array(_converter_unicos(unicos, tipo) + [None], dtype=object)
+    return tabela[codigos].tolist()
+
+
+def preparar_linhas(tabela, df):
+    """Valida as colunas contra o esquema declarado e devolve (colunas, linhas)"""
+    tipos = dict(TABELAS[tabela])
+    nao_declaradas = [coluna for coluna in df.columns if coluna not in tipos]
+    if nao_declaradas:
+        raise ValueError(f"Colunas nao declaradas em {tabela}: {nao_declaradas}")
+
+    faltando_chave = [coluna for coluna in CHAVE if coluna not in df.columns]
+    if faltando_chave:
+        raise ValueError(f"Colunas da chave ausentes em {tabela}: {faltando_chave}")
+
+    colunas = [coluna for coluna, _ in TABELAS[tabela] if coluna in df.columns]
+    valores = [_converter_coluna(df[coluna], tipos[coluna]) for coluna in colunas]
+    return colunas, list(zip(*valores))
+
+
+def _iterar_lotes(tabela, df, tamanho_lote):
+    """(colunas, gerador de lotes de tuplas): converte um lote por vez"""
+    colunas, _ = preparar_linhas(tabela, df.iloc[:0])
+    tipos_colunas = dict(TABELAS[tabela])
+
+    def lotes():
+        for inicio in range(0, len(df), tamanho_lote):
+            parte = df.iloc[inicio:inicio + tamanho_lote]
+            yield list(zip(*[_converter_coluna(parte[coluna], tipos_colunas[coluna]) for coluna in colunas]))
+    return colunas, lotes()
+
+
+@contextmanager
+def janela_de_carga(conn, pragmas=PRAGMAS_CARGA):
+    """Aplica os pragmas de carga e restaura os valores anteriores no fim"""
+    anteriores = {pragma: conn.execute(f"PRAGMA {pragma}").fetchone()[0] for pragma in pragmas}
+    for pragma, valor in pragmas.items():
+        conn.execute(f"PRAGMA {pragma} = {valor}")
+    try:
+        yield conn
+    finally:
+        for pragma, valor in anteriores.items():
+            conn.execute(f"PRAGMA {pragma} = {valor}")
+
+
+def carregar_em_massa(conn, tabela, df, tamanho_lote=TAMANHO_LOTE, recriar_indices=None):
+    """Substitui todo o conteudo da tabela por df (INSERT simples em lotes, uma transacao)
+
+    Mesmo resultado de upsert(..., remover_ausentes=True), sem o ON CONFLICT
+    nem a comparacao de chaves. Acima de LIMIAR_CARGA_EM_MASSA linhas os
+    indices secundarios sao removidos e recriados depois da carga, e as linhas
+    entram na ordem da chave primaria. Chaves repetidas em df geram
+    sqlite3.IntegrityError (a validacao do pipeline barra antes).
+    """
+    em_massa = len(df) >= LIMIAR_CARGA_EM_MASSA if recriar_indices is None else recriar_indices
+    if em_massa:
+        df = df.sort_values(CHAVE, kind='stable')
+
+    colunas, lotes = _iterar_lotes(tabela, df, tamanho_lote)
+    sql = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})"
+
+    with janela_de_carga(conn), conn:
+        if em_massa:
+            for comando in sql_remover_indices(tabela):
+                conn.execute(comando)
+        conn.execute(f"DELETE FROM {tabela}")
+        # mesma string SQL: o sqlite3 reaproveita o comando preparado entre os lotes
+        for lote in lotes:
+            conn.executemany(sql, lote)
+        if em_massa:
+            for comando in sql_criar_indices(tabela):
+                conn.execute(comando)
+
+    return len(df)
+
+
+def upsert(conn, tabela, df, tamanho_lote=TAMANHO_LOTE, remover_ausentes=False):
+    """Grava o DataFrame com INSERT ... ON CONFLICT DO UPDATE em uma unica transacao
+
+    Com `remover_ausentes`, chaves que nao estao no DataFrame sao apagadas
+    (semantica de substituicao completa, sem recriar a tabela).
+    """
+    colunas, linhas = preparar_linhas(tabela, df)
+    sql = sql_upsert(tabela, colunas)
+
+    with conn:
+        for inicio in range(0, len(linhas), tamanho_lote):
+            conn.executemany(sql, linhas[inicio:inicio + tamanho_lote])
+
+        if remover_ausentes:
+            indices_chave = [colunas.index(coluna) for coluna in CHAVE]
+            conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS chaves_recebidas ({', '.join(CHAVE)})")
+            conn.execute("DELETE FROM chaves_recebidas")
+            conn.executemany(
+                f"INSERT INTO chaves_recebidas VALUES ({', '.join('?' * len(CHAVE))})",
+                (tuple(linha[i] for i in indices_chave) for linha in linhas)
+            )
+            conn.execute(
+                f"DELETE FROM {tabela} WHERE ({', '.join(CHAVE)}) NOT IN "
+                f"(SELECT {', '.join(CHAVE)} FROM chaves_recebidas)"
+            )
+            conn.execute("DELETE FROM chaves_recebidas")
+
+    return len(linhas)
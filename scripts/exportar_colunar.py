@@ -0,0 +1,164 @@
+# exportar_colunar.py - EXPORTACAO PARQUET/ARROW PARA POWER BI E CONSUMIDORES PYTHON
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+
+import configuracao
+import esquema
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # dependencia opcional
+    pa = None
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+DIRETORIO_PARQUET = configuracao.caminho_dados('parquet', 'dashboard_pnad')
+CAMINHO_ARROW = configuracao.caminho_dados('dashboard_pnad.arrow')
+
+# Particionamento por tabela SIDRA e ano; dentro de cada arquivo as linhas ficam
+# ordenadas por territorio, e as estatisticas dos row groups permitem pular D1C
+# nao pedidos (particionar tambem por D1C geraria milhares de arquivos no nivel municipal)
+COLUNAS_PARTICAO = ['tabela', 'ano']
+ORDEM_ARQUIVO = ['D1C', 'D3C']
+TAMANHO_ROW_GROUP = 128_000
+
+# Texto com poucos valores distintos: codificado como dicionario
+COLUNAS_CATEGORICAS = ['tabela', 'D2C', 'trimestre', 'status', 'nivel_desocupacao', 'localidade']
+
+ARQUIVO_MANIFESTO = '_manifesto.json'
+
+
+def pyarrow_disponivel():
+    if pa is None:
+        print("pyarrow nao instalado - exportacao colunar ignorada (pip install pyarrow)")
+        return False
+    return True
+
+
+def _para_tabela_arrow(df):
+    """Converte para Arrow com categoricas como dictionary<int32, string>"""
+    colunas = {
+        coluna: df[coluna].astype('category') if coluna in COLUNAS_CATEGORICAS else df[coluna]
+        for coluna in df.columns
+    }
+    return pa.Table.from_pandas(pd.DataFrame(colunas), preserve_index=False)
+
+
+def _hash_particao(df):
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+
+def _ler_manifesto(diretorio):
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_MANIFESTO), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def exportar_parquet(df, diretorio=DIRETORIO_PARQUET, colunas_particao=COLUNAS_PARTICAO):
+    """Grava Parquet particionado (zstd, dicionario) reescrevendo so particoes alteradas"""
+    if not pyarrow_disponivel():
+        return None
+
+    os.makedirs(diretorio, exist_ok=True)
+    manifesto_anterior = _ler_manifesto(diretorio)
+    manifesto = {}
+    gravadas = 0
+
+    for valores, particao in df.groupby(colunas_particao, sort=False, observed=True):
+        valores = valores if isinstance(valores, tuple) else (valores,)
+        caminho_relativo = os.path.join(*(f"{coluna}={valor}" for coluna, valor in zip(colunas_particao, valores)))
+        dados = particao.drop(columns=colunas_particao)
+        ordem = [coluna for coluna in ORDEM_ARQUIVO if coluna in dados.columns]
+        if ordem:
+            dados = dados.sort_values(ordem, kind='stable', ignore_index=True)
+
+        hash_atual = _hash_particao(dados)
+        manifesto[caminho_relativo] = hash_atual
+        if manifesto_anterior.get(caminho_relativo) == hash_atual:
+            continue
+
+        pasta = os.path.join(diretorio, caminho_relativo)
+        os.makedirs(pasta, exist_ok=True)
+        pq.write_table(
+            _para_tabela_arrow(dados),
+            os.path.join(pasta, 'parte-0.parquet'),
+            compression='zstd',
+            row_group_size=TAMANHO_ROW_GROUP,
+            use_dictionary=[coluna for coluna in COLUNAS_CATEGORICAS if coluna in dados.columns]
+        )
+        gravadas += 1
+
+    # particoes que deixaram de existir
+    for caminho_relativo in set(manifesto_anterior) - set(manifesto):
+        shutil.rmtree(os.path.join(diretorio, caminho_relativo), ignore_errors=True)
+
+    with open(os.path.join(diretorio, ARQUIVO_MANIFESTO), 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo)
+
+    print(f" Parquet: {gravadas} de {len(manifesto)} particoes regravadas em {diretorio}")
+    return gravadas
+
+
+def ler_parquet(diretorio=DIRETORIO_PARQUET, filtro=None, colunas=None):
+    """Le o dataset particionado; filtros em ano descartam particoes inteiras e
+    filtros em D1C descartam row groups
+
+    Ex.: ler_parquet(filtro=(ds.field('ano') >= 2020) & (ds.field('D1C') == '35'))
+    """
+    if not pyarrow_disponivel():
+        return None
+
+    # 'tabela' e codigo (texto): sem o esquema explicito o hive a inferiria como inteiro
+    particionamento = ds.partitioning(pa.schema([('tabela', pa.string()), ('ano', pa.int32())]), flavor='hive')
+    dataset = ds.dataset(diretorio, format='parquet', partitioning=particionamento, exclude_invalid_files=True)
+    return dataset.to_table(filter=filtro, columns=colunas).to_pandas()
+
+
+def exportar_arrow(df, caminho=CAMINHO_ARROW):
+    """Grava arquivo Arrow IPC sem compressao (pode ser lido via memory map)"""
+    if not pyarrow_disponivel():
+        return None
+
+    tabela = _para_tabela_arrow(df)
+    temporario = caminho + '.tmp'
+    with pa.OSFile(temporario, 'wb') as arquivo:
+        with ipc.new_file(arquivo, tabela.schema) as escritor:
+            escritor.write_table(tabela, max_chunksize=256_000)
+    os.replace(temporario, caminho)
+
+    print(f" Arrow IPC: {caminho}")
+    return caminho
+
+
+def ler_arrow(caminho=CAMINHO_ARROW, como_pandas=True):
+    """Le o arquivo Arrow por memory map (sem copiar os buffers para a memoria do processo)"""
+    if not pyarrow_disponivel():
+        return None
+
+    with pa.memory_map(caminho, 'r') as origem:
+        tabela = ipc.open_file(origem).read_all()
+    return tabela.to_pandas() if como_pandas else tabela
+
+
+def exportar_colunar(df):
+    """Etapa de exportacao: Parquet particionado + Arrow IPC"""
+    exportar_parquet(df)
+    exportar_arrow(df)
+    return None
+
+
+if __name__ == "__main__":
+    conn = esquema.conectar(CAMINHO_BANCO)
+    try:
+        dados = pd.read_sql("SELECT * FROM dashboard_pnad", conn, parse_dates=['data_referencia'])
+    finally:
+        conn.close()
+    exportar_colunar(dados)
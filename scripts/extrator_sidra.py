@@ -0,0 +1,324 @@
+# extrator_sidra.py - EXTRACAO CONCORRENTE DA API SIDRA
+import json
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrumentacao
+import revisoes
+
+from decodificador_sidra import (
+    COLUNAS_SIDRA, TAMANHO_LEITURA, TAMANHO_LOTE, carregar_em_lotes, garantir_tabela, gravar_lote
+)
+
+URL_SIDRA = os.environ.get('SIDRA_BASE_URL', 'https://apisidra.ibge.gov.br')
+
+# Primeiro periodo da PNAD Continua (cobre codigos mensais AAAAMM e trimestrais AAAAQQ)
+PERIODO_INICIAL = '201201'
+
+# Codigos das 27 UFs (nivel territorial n3)
+UFS = [
+    '11', '12', '13', '14', '15', '16', '17',
+    '21', '22', '23', '24', '25', '26', '27', '28', '29',
+    '31', '32', '33', '35',
+    '41', '42', '43',
+    '50', '51', '52', '53'
+]
+
+# Status que justificam nova tentativa
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+
+ConsultaSIDRA = namedtuple('ConsultaSIDRA', 'tabela variavel nivel territorio periodos')
+
+
+def montar_url(url_base, consulta):
+    """Monta a URL SIDRA de uma consulta"""
+    return (
+        f"{url_base}/values/t/{consulta.tabela}/{consulta.nivel}/{consulta.territorio}"
+        f"/v/{consulta.variavel}/p/{consulta.periodos}"
+    )
+
+
+def listar_periodos(inicio, fim):
+    """Lista os codigos AAAAMM de inicio a fim (inclusive)"""
+    ano, mes = int(inicio[:4]), int(inicio[4:])
+    periodos = []
+    while f"{ano}{mes:02d}" <= fim:
+        periodos.append(f"{ano}{mes:02d}")
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return periodos
+
+
+def dividir_periodos(inicio, fim, tamanho_bloco=24):
+    """Divide um intervalo de periodos em faixas 'inicio-fim' do SIDRA"""
+    periodos = listar_periodos(inicio, fim)
+    return [
+        f"{bloco[0]}-{bloco[-1]}"
+        for bloco in (periodos[i:i + tamanho_bloco] for i in range(0, len(periodos), tamanho_bloco))
+    ]
+
+
+def gerar_consultas(tabelas_variaveis, niveis, inicio=PERIODO_INICIAL, fim=None, tamanho_bloco=24):
+    """Combina tabelas/variaveis, niveis territoriais e blocos de periodos
+
+    `niveis` mapeia o nivel SIDRA para a lista de territorios, ex.:
+    {'n1': ['all'], 'n3': UFS, 'n7': ['all']}
+    """
+    fim = fim or f"{datetime.now().year}12"
+    blocos = dividir_periodos(inicio, fim, tamanho_bloco)
+
+    return [
+        ConsultaSIDRA(tabela, variavel, nivel, territorio, bloco)
+        for tabela, variavel in tabelas_variaveis
+        for nivel, territorios in niveis.items()
+        for territorio in territorios
+        for bloco in blocos
+    ]
+
+
+class LimitadorTaxa:
+    """Token bucket: no maximo `taxa` requisicoes por segundo, com rajadas de `capacidade`"""
+
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = taxa
+        self.capacidade = capacidade or taxa
+        self.fichas = self.capacidade
+        self.ultima_reposicao = time.monotonic()
+        self.trava = threading.Lock()
+
+    def adquirir(self):
+        while True:
+            with self.trava:
+                agora = time.monotonic()
+                self.fichas = min(self.capacidade, self.fichas + (agora - self.ultima_reposicao) * self.taxa)
+                self.ultima_reposicao = agora
+
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return
+                espera = (1 - self.fichas) / self.taxa
+
+            time.sleep(espera)
+
+
+class ExtratorSIDRA:
+    """Cliente SIDRA com sessao compartilhada, concorrencia limitada e novas tentativas
+
+    Com `cache` (CacheSIDRA) as respostas sao servidas do disco quando possivel e,
+    com `pular_inalterados`, payloads ja carregados com o mesmo hash no mesmo
+    `destino` (ex.: caminho do banco + tabela) sao ignorados.
+    """
+
+    def __init__(self, url_base=URL_SIDRA, max_simultaneas=8, requisicoes_por_segundo=20,
+                 tentativas=4, espera_base=0.5, timeout=60, cache=None, pular_inalterados=True,
+                 destino=''):
+        self.url_base = url_base
+        self.cache = cache
+        self.pular_inalterados = pular_inalterados
+        self.destino = destino
+        self.pendentes = {}
+        self.inalteradas = 0
+        self.max_simultaneas = max_simultaneas
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.timeout = timeout
+        self.limitador = LimitadorTaxa(requisicoes_por_segundo)
+
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=max_simultaneas, pool_maxsize=max_simultaneas)
+        self.sessao.mount('http://', adaptador)
+        self.sessao.mount('https://', adaptador)
+
+        self.latencias = []
+        self.tempo_total = 0.0
+        self.trava = threading.Lock()
+        self.trava_escrita = threading.Lock()
+
+    def buscar(self, url, stream=False, cabecalhos=None):
+        """GET com limite de taxa e backoff exponencial com jitter"""
+        for tentativa in range(1, self.tentativas + 1):
+            self.limitador.adquirir()
+            inicio = time.perf_counter()
+
+            try:
+                response = self.sessao.get(url, timeout=self.timeout, stream=stream, headers=cabecalhos)
+                status = response.status_code
+            except requests.RequestException as e:
+                response, status = None, type(e).__name__
+
+            with self.trava:
+                self.latencias.append((url, time.perf_counter() - inicio, status))
+
+            if response is not None and status not in STATUS_REPETIVEIS:
+                response.raise_for_status()
+                return response
+
+            if tentativa == self.tentativas:
+                break
+
+            espera = self.espera_base * 2 ** (tentativa - 1) * random.uniform(0.5, 1.5)
+            time.sleep(espera)
+
+        raise requests.HTTPError(f"Falha apos {self.tentativas} tentativas ({status}): {url}")
+
+    def obter_do_cache(self, url):
+        """Consulta o cache; devolve None se o conteudo ja foi carregado antes"""
+        entrada = self.cache.obter(
+            url, lambda url, cabecalhos: self.buscar(url, stream=True, cabecalhos=cabecalhos)
+        )
+
+        with self.trava:
+            if self.pular_inalterados and self.cache.ja_processado(url, entrada.hash_conteudo, self.destino):
+                self.inalteradas += 1
+                return None
+            self.pendentes[url] = entrada.hash_conteudo
+        return entrada
+
+    def confirmar_carga(self):
+        """Marca no cache os payloads carregados com sucesso desde a ultima confirmacao"""
+        if self.cache is None:
+            return
+        with self.trava:
+            pendentes, self.pendentes = self.pendentes, {}
+        for url, hash_conteudo in pendentes.items():
+            self.cache.marcar_processado(url, hash_conteudo, self.destino)
+
+    def buscar_consulta(self, consulta):
+        """Busca uma consulta e devolve um DataFrame no layout SIDRA"""
+        url = montar_url(self.url_base, consulta)
+
+        with instrumentacao.span('http', tabela=consulta.tabela) as medicao:
+            if self.cache is None:
+                corpo = self.buscar(url).content
+            else:
+                entrada = self.obter_do_cache(url)
+                if entrada is None:
+                    return pd.DataFrame(columns=COLUNAS_SIDRA + ['tabela'])
+                corpo = entrada.ler_corpo()
+            medicao.bytes = len(corpo)
+
+        with instrumentacao.span('decode', tabela=consulta.tabela) as medicao:
+            dados = json.loads(corpo)
+            df = pd.DataFrame(dados[1:], columns=list(dados[0]))
+            df['tabela'] = consulta.tabela
+            medicao.linhas_saida = len(df)
+        return df
+
+    def extrair(self, consultas):
+        """Executa as consultas em paralelo e concatena os resultados"""
+        inicio = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_simultaneas) as executor:
+            resultados = list(executor.map(instrumentacao.propagar(self.buscar_consulta), consultas))
+
+        self.tempo_total += time.perf_counter() - inicio
+
+        resultados = [df for df in resultados if not df.empty]
+        if not resultados:
+            return pd.DataFrame()
+        return pd.concat(resultados, ignore_index=True)
+
+    def carregar_consulta(self, consulta, conn, tabela='pnad_historico', tamanho_lote=TAMANHO_LOTE, carga=None):
+        """Decodifica a resposta em streaming e grava direto no SQLite, lote a lote
+
+        Com `carga` (revisoes.CargaEmLotes), cada lote passa pelo diff de
+        revisoes antes do upsert.
+        """
+        url = montar_url(self.url_base, consulta)
+
+        def gravar_com_trava(conn, lote, tabela):
+            with self.trava_escrita:
+                if carga is None:
+                    gravar_lote(conn, lote, tabela)
+                else:
+                    carga.gravar(pd.DataFrame(lote, columns=COLUNAS_SIDRA + ['tabela']))
+
+        # http, decodificacao e gravacao se intercalam: um unico span
+        with instrumentacao.span('http_decode_sql_write', tabela=consulta.tabela) as medicao:
+            if self.cache is not None:
+                entrada = self.obter_do_cache(url)
+                if entrada is None:
+                    return 0
+                medicao.linhas_saida = carregar_em_lotes(
+                    conn, entrada.iterar_blocos(TAMANHO_LEITURA), consulta.tabela,
+                    tabela, tamanho_lote, gravar_com_trava, criar_tabela=False
+                )
+                return medicao.linhas_saida
+
+            response = self.buscar(url, stream=True)
+            try:
+                medicao.linhas_saida = carregar_em_lotes(
+                    conn, response.iter_content(TAMANHO_LEITURA), consulta.tabela,
+                    tabela, tamanho_lote, gravar_com_trava, criar_tabela=False
+                )
+                return medicao.linhas_saida
+            finally:
+                response.close()
+
+    def extrair_para_banco(self, conn, consultas, tabela='pnad_historico', tamanho_lote=TAMANHO_LOTE,
+                           origem=None):
+        """Como extrair(), mas sem montar DataFrames: devolve o total de linhas recebidas
+
+        A conexao precisa ser aberta com check_same_thread=False. Em
+        pnad_historico os lotes viram uma safra de revisoes.py (`origem`),
+        como na gravacao em bloco.
+        """
+        inicio = time.perf_counter()
+        with conn:
+            garantir_tabela(conn, tabela)
+        carga = revisoes.CargaEmLotes(conn, origem) if tabela == 'pnad_historico' else None
+
+        with ThreadPoolExecutor(max_workers=self.max_simultaneas) as executor:
+            totais = list(executor.map(instrumentacao.propagar(
+                lambda consulta: self.carregar_consulta(consulta, conn, tabela, tamanho_lote, carga)
+            ), consultas))
+        if carga is not None:
+            carga.concluir()
+
+        self.tempo_total += time.perf_counter() - inicio
+        return sum(totais)
+
+    def relatorio(self):
+        """Resumo de latencia por requisicao e tempo total"""
+        resumo = {'requisicoes': 0, 'tempo_total_s': self.tempo_total, 'inalteradas': self.inalteradas}
+        if self.cache is not None:
+            resumo['cache'] = self.cache.estatisticas()
+        if not self.latencias:
+            return resumo
+
+        tempos = pd.Series([latencia for _, latencia, _ in self.latencias])
+        return {
+            **resumo,
+            'requisicoes': len(tempos),
+            'falhas': sum(1 for _, _, status in self.latencias if status not in (200, 304)),
+            'latencia_media_s': tempos.mean(),
+            'latencia_p50_s': tempos.quantile(0.50),
+            'latencia_p95_s': tempos.quantile(0.95),
+            'latencia_max_s': tempos.max()
+        }
+
+    def imprimir_relatorio(self):
+        resumo = self.relatorio()
+        print(f" Requisicoes: {resumo['requisicoes']}")
+        if resumo['requisicoes']:
+            print(f" Falhas (com nova tentativa): {resumo['falhas']}")
+            print(f" Latencia media: {resumo['latencia_media_s'] * 1000:.1f} ms")
+            print(f" Latencia p50/p95/max: {resumo['latencia_p50_s'] * 1000:.1f} / "
+                  f"{resumo['latencia_p95_s'] * 1000:.1f} / {resumo['latencia_max_s'] * 1000:.1f} ms")
+        if 'cache' in resumo:
+            cache = resumo['cache']
+            print(f" Cache: {cache['acertos']} acertos, {cache['revalidacoes']} revalidacoes (304), "
+                  f"{cache['ausencias']} ausencias ({cache['taxa_acerto']:.0%} de acerto)")
+            print(f" Payloads inalterados ignorados: {resumo['inalteradas']}")
+        print(f" Tempo total: {resumo['tempo_total_s']:.2f} s")
+
+    def fechar(self):
+        self.sessao.close()
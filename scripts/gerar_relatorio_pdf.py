@@ -1,7 +1,30 @@
 # gerar_relatorio_pdf.py
 from fpdf import FPDF
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import hashlib
+import json
 import os
+import time
+
+import pandas as pd
+
+import configuracao
+import esquema
+import graficos
+import resumos
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+DIRETORIO_CACHE = configuracao.caminho_dados('cache_relatorio')
+
+# Mude ao alterar o layout das secoes: invalida o cache
+VERSAO_LAYOUT = '1'
+
+# Serie usada no resumo executivo (Brasil, tabela 6381)
+SERIE_NACIONAL = resumos.SERIE_NACIONAL
+
+# Abaixo disso as secoes sao preparadas no proprio processo
+MINIMO_PARALELO = 8
 
 class RelatorioPNAD(FPDF):
     def header(self):
@@ -35,9 +58,46 @@ class RelatorioPNAD(FPDF):
         self.set_fill_color(240, 240, 240)
         self.multi_cell(0, 5, code, 0, 'L', True)
         self.ln(3)
+    
+    def table(self, cabecalho, linhas, larguras):
+        self.set_font('Arial', 'B', 9)
+        self.set_fill_color(200, 220, 255)
+        # sem o parametro 'ln' (obsoleto): celulas seguem na mesma linha por padrao
+        for texto, largura in zip(cabecalho, larguras):
+            self.cell(largura, 6, texto, border=1, align='C', fill=True)
+        self.ln()
+        self.set_font('Arial', '', 9)
+        for linha in linhas:
+            for texto, largura in zip(linha, larguras):
+                self.cell(largura, 5, texto, border=1, align='C')
+            self.ln()
+        self.ln(3)
+    
+    def chart(self, caminho, largura=180):
+        # fpdf guarda as imagens pelo nome: a mesma imagem em varias
+        # paginas e embutida uma unica vez no arquivo
+        self.image(caminho, x=(self.w - largura) / 2, w=largura)
+        self.ln(3)
+    
+    def render_section(self, conteudo):
+        """Escreve uma secao preparada (lista de blocos serializavel em JSON)"""
+        if conteudo.get('nova_pagina'):
+            self.add_page()
+        for bloco in conteudo['blocos']:
+            tipo = bloco[0]
+            if tipo == 'capitulo':
+                self.chapter_title(bloco[1])
+            elif tipo == 'subtitulo':
+                self.section_title(bloco[1])
+            elif tipo == 'texto':
+                self.body_text(bloco[1])
+            elif tipo == 'tabela':
+                self.table(*bloco[1:])
+            elif tipo == 'imagem':
+                self.chart(bloco[1])
 
-def criar_relatorio_pdf():
-    pdf = RelatorioPNAD()
+def escrever_narrativa(pdf, contexto):
+    """Capa e capitulos 1 a 8 (texto fixo, numeros lidos do banco)"""
     pdf.add_page()
     
     # Capa
@@ -53,13 +113,17 @@ def criar_relatorio_pdf():
     
     # 1. RESUMO EXECUTIVO
     pdf.chapter_title('1. RESUMO EXECUTIVO')
-    pdf.body_text("""Este relatório documenta o processo completo de análise dos dados da PNAD Contínua do IBGE, desde a extração via API até a criação de dashboards interativos no Power BI.
+    pdf.body_text(f"""Este relatório documenta o processo completo de análise dos dados da PNAD Contínua do IBGE, desde a extração via API até a criação de dashboards interativos no Power BI.
 
 Objetivo: Análise da taxa de desocupação brasileira através dos microdados oficiais
-Período: 2012-2024 (162 trimestres)
+Período: {contexto['primeiro_ano']}-{contexto['ultimo_ano']} ({contexto['periodos']} trimestres)
+Territórios: {contexto['territorios']} | Indicadores: {contexto['indicadores']}
 Tecnologias: Python, Pandas, SQLite, Power BI
 Entregáveis: Pipeline de ETL automatizado e dashboard com insights estratégicos""")
     
+    if contexto['nacional'] is not None:
+        pdf.render_section(contexto['nacional'])
+    
     # 2. METODOLOGIA
     pdf.chapter_title('2. METODOLOGIA')
     
@@ -115,25 +179,24 @@ powerbi_final.py - Geração do dataset final
 gerar_relatorio_pdf.py - Este relatório""")
     
     pdf.section_title('3.2. Estrutura do Banco de Dados')
-    pdf.code_block("""-- Tabelas no SQLite
-pnad_historico (dados brutos da API)
-powerbi_otimizado (dados tratados para análise)
-dados_ibge_api (metadados e controles)""")
+    pdf.code_block("-- Tabelas no SQLite\n" + "\n".join(
+        f"{tabela} ({linhas} linhas)" for tabela, linhas in contexto['tabelas']
+    ))
     
     # 4. ANÁLISE E INSIGHTS
     pdf.add_page()
     pdf.chapter_title('4. ANÁLISE E INSIGHTS')
     
     pdf.section_title('4.1. Principais Indicadores Calculados')
-    pdf.body_text("""- Taxa de desocupação trimestral
+    pdf.body_text(f"""- Taxa de desocupação trimestral
 - Variação percentual período a período
-- Média histórica (2012-2024)
+- Média histórica ({contexto['primeiro_ano']}-{contexto['ultimo_ano']})
 - Classificação por nível de desocupação
 - Tendência (Alta/Baixa/Estável)
 - Média móvel (suavização de tendências)""")
     
     pdf.section_title('4.2. Insights Identificados')
-    pdf.body_text("""1. TENDÊNCIA DE LONGO PRAZO: Análise da evolução da taxa de desocupação ao longo de 12 anos
+    pdf.body_text(f"""1. TENDÊNCIA DE LONGO PRAZO: Análise da evolução da taxa de desocupação ao longo de {contexto['ultimo_ano'] - contexto['primeiro_ano']} anos
 2. SAZONALIDADE: Identificação de padrões trimestrais recorrentes
 3. IMPACTO DE EVENTOS: Análise do efeito de crises econômicas e pandêmicas
 4. COMPARATIVO HISTÓRICO: Posicionamento atual em relação à média do período""")
@@ -228,7 +291,7 @@ Tendência =
 - Desenvolvimento de modelos preditivos simples
 - Criação de alertas para tendências significativas""")
     
-    # ANEXOS
+def escrever_anexos(pdf, contexto):
     pdf.add_page()
     pdf.chapter_title('ANEXOS')
     
@@ -244,27 +307,242 @@ Tendência =
 |-- instrucoes_powerbi.txt (guia de uso)""")
     
     pdf.section_title('Anexo B - Metadados dos Dados')
-    pdf.body_text("""Fonte: PNAD Contínua - IBGE
+    pdf.body_text(f"""Fonte: PNAD Contínua - IBGE
 Indicador principal: Taxa de desocupação (%)
-Período coberto: 2012-2024
+Período coberto: {contexto['primeiro_ano']}-{contexto['ultimo_ano']}
 Frequência: Trimestral
-Total de registros: 162 períodos
-Última atualização: Dados mais recentes disponíveis""")
+Total de registros: {contexto['registros']} ({contexto['periodos']} períodos na série nacional)
+Última atualização: período {contexto['ultimo_periodo']}""")
     
     # Assinatura
     pdf.ln(20)
     pdf.set_font('Arial', 'I', 10)
     pdf.cell(0, 10, 'Documento gerado automaticamente via Python - Demonstrando habilidades técnicas em ETL e análise de dados', 0, 1, 'C')
     
+
+
+# ---------- SECOES POR TERRITORIO ----------
+
+def _formatar(valor, sufixo=''):
+    return '-' if valor is None or pd.isna(valor) else f"{valor:.2f}{sufixo}"
+
+
+def montar_entradas(serie, anual, dashboard, diretorio=DIRETORIO_CACHE):
+    """Uma entrada (dados + hash) por serie; so o necessario para a secao"""
+    anual = anual.sort_values('ano')
+    dashboard = dashboard.sort_values('D3C')
+    por_serie_anual = dict(tuple(anual.groupby(resumos.CHAVE_SERIE)))
+    por_serie_dados = dict(tuple(dashboard.groupby(resumos.CHAVE_SERIE)))
+
+    entradas = []
+    for linha in serie.sort_values(resumos.CHAVE_SERIE).itertuples(index=False):
+        chave = (linha.tabela, linha.D2C, linha.D1C)
+        dados = por_serie_dados.get(chave)
+        if dados is None:
+            continue
+        entrada = {
+            'chave': list(chave),
+            'localidade': linha.localidade,
+            'resumo': {
+                'ultimo_periodo': linha.ultimo_periodo,
+                'ultimo_valor': linha.ultimo_valor,
+                'media': linha.soma / linha.n if linha.n else None,
+                'minimo': linha.minimo,
+                'maximo': linha.maximo,
+                'media_movel_4p': linha.media_movel_4p,
+                'variacao_anual': linha.variacao_anual
+            },
+            'anual': por_serie_anual[chave][['ano', 'n', 'soma', 'minimo', 'maximo', 'ultimo_valor']]
+                .values.tolist() if chave in por_serie_anual else [],
+            'datas': dados['data_referencia'].astype(str).tolist(),
+            'taxa': dados['taxa_desocupacao'].tolist(),
+            'media_movel': dados['media_movel_4p'].tolist()
+        }
+        conteudo_json = json.dumps(entrada, sort_keys=True, default=str)
+        entrada['hash'] = hashlib.sha256(f"{VERSAO_LAYOUT}|{conteudo_json}".encode('utf-8')).hexdigest()
+        # JPEG: o fpdf copia o arquivo direto para o PDF (PNG seria decodificado e recomprimido)
+        entrada['imagem'] = os.path.join(diretorio, f"{'_'.join(chave)}.jpg")
+        entradas.append(entrada)
+    return entradas
+
+
+def preparar_secao(entrada):
+    """Renderiza o grafico e monta os blocos da secao (roda em processo separado)"""
+    inicio = time.perf_counter()
+    resumo = entrada['resumo']
+    tabela, variavel, territorio = entrada['chave']
+
+    graficos.renderizar_serie(
+        entrada['datas'], entrada['taxa'],
+        f"Taxa de Desocupacao - {entrada['localidade']}", entrada['imagem'],
+        media=entrada['media_movel']
+    )
+
+    blocos = [
+        ('capitulo', f"{entrada['localidade']} (tabela {tabela}, variável {variavel})"),
+        ('tabela', ['Último período', 'Taxa atual', 'Média', 'Mínima', 'Máxima', 'Média móvel', 'Var. anual'],
+         [[resumo['ultimo_periodo'], _formatar(resumo['ultimo_valor'], '%'), _formatar(resumo['media'], '%'),
+           _formatar(resumo['minimo'], '%'), _formatar(resumo['maximo'], '%'),
+           _formatar(resumo['media_movel_4p'], '%'), _formatar(resumo['variacao_anual'], ' p.p.')]],
+         [27, 25, 25, 25, 25, 30, 30]),
+        ('imagem', entrada['imagem']),
+        ('subtitulo', 'Resumo anual'),
+        ('tabela', ['Ano', 'Períodos', 'Média', 'Mínima', 'Máxima', 'Último valor'],
+         [[str(int(ano)), str(int(n)), _formatar(soma / n if n else None, '%'), _formatar(minimo, '%'),
+           _formatar(maximo, '%'), _formatar(ultimo, '%')]
+          for ano, n, soma, minimo, maximo, ultimo in entrada['anual']],
+         [25, 25, 30, 30, 30, 30])
+    ]
+    conteudo = {'nova_pagina': True, 'blocos': blocos}
+    return conteudo, time.perf_counter() - inicio
+
+
+def _ler_cache(entrada, diretorio):
+    caminho = os.path.join(diretorio, f"{entrada['hash']}.json")
+    if not (os.path.exists(caminho) and os.path.exists(entrada['imagem'])):
+        return None
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _gravar_cache(entrada, conteudo, diretorio):
+    with open(os.path.join(diretorio, f"{entrada['hash']}.json"), 'w', encoding='utf-8') as arquivo:
+        json.dump(conteudo, arquivo)
+
+
+def preparar_secoes(entradas, diretorio=DIRETORIO_CACHE, processos=None):
+    """Secoes do cache quando o hash de entrada nao mudou; as demais em paralelo
+
+    Devolve [(entrada, conteudo, segundos_preparo ou None se veio do cache)].
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    resultado = {}
+    pendentes = []
+    for indice, entrada in enumerate(entradas):
+        conteudo = _ler_cache(entrada, diretorio)
+        if conteudo is None:
+            pendentes.append(indice)
+        else:
+            resultado[indice] = (conteudo, None)
+
+    processos = processos or os.cpu_count() or 1
+    tarefas = [entradas[indice] for indice in pendentes]
+    if processos > 1 and len(tarefas) >= MINIMO_PARALELO:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            preparados = list(executor.map(preparar_secao, tarefas, chunksize=4))
+    else:
+        preparados = [preparar_secao(tarefa) for tarefa in tarefas]
+
+    for indice, (conteudo, segundos) in zip(pendentes, preparados):
+        _gravar_cache(entradas[indice], conteudo, diretorio)
+        resultado[indice] = (conteudo, segundos)
+
+    return [(entrada, *resultado[indice]) for indice, entrada in enumerate(entradas)]
+
+
+# ---------- MONTAGEM ----------
+
+def carregar_dados(caminho_banco=CAMINHO_BANCO):
+    """Resumos materializados + series do dashboard (so as colunas dos graficos)"""
+    conn = esquema.conectar(caminho_banco)
+    try:
+        serie = resumos.ler_resumo(conn, 'resumo_serie')
+        anual = resumos.ler_resumo(conn, 'resumo_anual')
+        dashboard = pd.read_sql(
+            "SELECT tabela, D2C, D1C, D3C, data_referencia, taxa_desocupacao, media_movel_4p FROM dashboard_pnad",
+            conn
+        )
+        tabelas = [
+            (nome, conn.execute(f"SELECT COUNT(*) FROM {nome}").fetchone()[0])
+            for (nome,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )
+        ]
+    finally:
+        conn.close()
+    return serie, anual, dashboard, tabelas
+
+
+def montar_contexto(serie, anual, tabelas, secoes):
+    """Numeros do texto fixo (capa, resumo executivo, anexos)"""
+    chaves = serie[resumos.CHAVE_SERIE].apply(tuple, axis=1)
+    nacional = serie[chaves == SERIE_NACIONAL]
+    referencia = nacional.iloc[0] if len(nacional) else serie.iloc[0]
+
+    conteudo_nacional = None
+    for entrada, conteudo, _ in secoes:
+        if tuple(entrada['chave']) == tuple(referencia[resumos.CHAVE_SERIE]):
+            # mesmos blocos da secao do territorio, sem quebra de pagina (a imagem e reaproveitada)
+            conteudo_nacional = {'nova_pagina': False, 'blocos': conteudo['blocos'][1:3]}
+
+    return {
+        'primeiro_ano': int(anual['ano'].min()),
+        'ultimo_ano': int(anual['ano'].max()),
+        'periodos': int(referencia['linhas']),
+        'registros': int(serie['linhas'].sum()),
+        'territorios': serie['D1C'].nunique(),
+        'indicadores': serie[['tabela', 'D2C']].drop_duplicates().shape[0],
+        'ultimo_periodo': referencia['ultimo_periodo'],
+        'tabelas': tabelas,
+        'nacional': conteudo_nacional
+    }
+
+
+def criar_relatorio_pdf(caminho_banco=CAMINHO_BANCO, diretorio_cache=DIRETORIO_CACHE, processos=None,
+                        nome_arquivo=None):
+    inicio_total = time.perf_counter()
+    serie, anual, dashboard, tabelas = carregar_dados(caminho_banco)
+    if serie.empty:
+        print("Resumos vazios - execute pipeline.py antes de gerar o relatório")
+        return None
+
+    secoes = preparar_secoes(montar_entradas(serie, anual, dashboard, diretorio_cache), diretorio_cache, processos)
+    contexto = montar_contexto(serie, anual, tabelas, secoes)
+
+    pdf = RelatorioPNAD()
+    tempos = []
+
+    inicio = time.perf_counter()
+    escrever_narrativa(pdf, contexto)
+    tempos.append(('narrativa', 0.0, time.perf_counter() - inicio))
+
+    pdf.add_page()
+    pdf.chapter_title('9. RESULTADOS POR TERRITÓRIO')
+    pdf.body_text(f"Uma seção por território e indicador ({len(secoes)} séries), gerada a partir das tabelas de resumo.")
+    for entrada, conteudo, preparo in secoes:
+        inicio = time.perf_counter()
+        pdf.render_section(conteudo)
+        tempos.append((entrada['localidade'], preparo, time.perf_counter() - inicio))
+
+    inicio = time.perf_counter()
+    escrever_anexos(pdf, contexto)
+    tempos.append(('anexos', 0.0, time.perf_counter() - inicio))
+
     # Salvar PDF na pasta docs
-    nome_arquivo = f'../docs/Relatorio_PNAD_IBGE_{datetime.now().strftime("%Y%m%d_%H%M")}.pdf'
+    inicio = time.perf_counter()
+    nome_arquivo = nome_arquivo or os.path.join(configuracao.RAIZ, 'docs', f'Relatorio_PNAD_IBGE_{datetime.now().strftime("%Y%m%d_%H%M")}.pdf')
     pdf.output(nome_arquivo)
-    
-    print(f"PDF gerado com sucesso: {nome_arquivo}")
+    tempo_gravacao = time.perf_counter() - inicio
+
+    imprimir_tempos(tempos, tempo_gravacao, time.perf_counter() - inicio_total)
+    print(f"PDF gerado com sucesso: {nome_arquivo} ({pdf.page_no()} páginas)")
     print(f"Local: {os.path.abspath(nome_arquivo)}")
     
     return nome_arquivo
 
+
+def imprimir_tempos(tempos, tempo_gravacao, tempo_total, mais_lentas=10):
+    """Tempo por secao: preparo (grafico + tabelas, ou cache) e montagem no PDF"""
+    do_cache = sum(1 for _, preparo, _ in tempos if preparo is None)
+    print(f"\n Seções: {len(tempos) - 2} territoriais ({do_cache} do cache) + narrativa + anexos")
+    print(f"  {'secao':<30} {'preparo':>10} {'montagem':>10}")
+    ordenadas = sorted(tempos, key=lambda t: (t[1] or 0) + t[2], reverse=True)
+    for nome, preparo, montagem in ordenadas[:mais_lentas]:
+        texto_preparo = 'cache' if preparo is None else f"{preparo:.3f} s"
+        print(f"  {nome[:30]:<30} {texto_preparo:>10} {montagem:8.3f} s")
+    print(f"  {'gravacao do arquivo':<30} {'':>10} {tempo_gravacao:8.3f} s")
+    print(f"  {'total':<30} {'':>10} {tempo_total:8.3f} s")
+
 if __name__ == "__main__":
     arquivo_pdf = criar_relatorio_pdf()
-    print(f"Relatório pronto! Arquivo: {arquivo_pdf}")
\ No newline at end of file
+    print(f"Relatório pronto! Arquivo: {arquivo_pdf}")
@@ -0,0 +1,163 @@
+# graficos.py - RENDERIZACAO DE GRAFICOS POR SERIE (AGG, SEM PYPLOT)
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.dates import date2num
+from matplotlib.figure import Figure
+
+import configuracao
+import tipos
+
+DIRETORIO_GRAFICOS = configuracao.caminho_dados('graficos')
+ARQUIVO_MANIFESTO = '_manifesto.json'
+
+CHAVE_SERIE = ['tabela', 'D2C', 'D1C']
+
+# Tamanho e resolucao padrao (300 dpi so vale para impressao)
+LARGURA, ALTURA, DPI = 10, 6, 100
+
+# zlib nivel 1: PNG ~13% maior, renderizacao ~20% mais rapida que o nivel padrao (6)
+COMPRESSAO_PNG = 1
+
+# JPEG (relatorio PDF): o fpdf embute o arquivo sem decodificar, PNG e recomprimido
+QUALIDADE_JPEG = 90
+
+# Abaixo disso o custo de subir os processos supera o ganho
+MINIMO_PARALELO = 32
+
+
+class ModeloGrafico:
+    """Figura montada uma vez e reaproveitada: cada grafico so troca os dados
+
+    Eixos, legenda, grade e layout ficam prontos no construtor; renderizar()
+    atualiza as linhas, o titulo e os limites e grava o PNG pelo canvas Agg.
+    """
+
+    def __init__(self, largura=LARGURA, altura=ALTURA, dpi=DPI):
+        self.dpi = dpi
+        self.figura = Figure(figsize=(largura, altura), dpi=dpi)
+        FigureCanvasAgg(self.figura)
+        self.eixo = self.figura.add_subplot()
+        self.eixo.xaxis_date()
+
+        (self.linha_taxa,) = self.eixo.plot([], [], marker='o', markersize=3, linewidth=2,
+                                            label='Taxa de desocupacao')
+        (self.linha_media,) = self.eixo.plot([], [], linestyle='--', linewidth=1.5,
+                                             label='Media movel (4 periodos)')
+        self.eixo.set_xlabel('Periodo')
+        self.eixo.set_ylabel('Taxa de Desocupacao (%)')
+        self.eixo.grid(True, alpha=0.3)
+        self.eixo.legend(loc='upper left')
+        self.figura.subplots_adjust(left=0.08, right=0.97, top=0.9, bottom=0.12)
+
+    def renderizar(self, datas, taxa, media, titulo, caminho):
+        self.linha_taxa.set_data(datas, taxa)
+        self.linha_media.set_data(datas, media)
+        self.eixo.set_title(titulo)
+        self.eixo.relim()
+        self.eixo.autoscale_view()
+        if caminho.lower().endswith(('.jpg', '.jpeg')):
+            opcoes = {'quality': QUALIDADE_JPEG}
+        else:
+            opcoes = {'compress_level': COMPRESSAO_PNG}
+        self.figura.savefig(caminho, pil_kwargs=opcoes)
+
+
+# um modelo por processo (criado na primeira tarefa)
+_MODELO = None
+
+
+def _renderizar_lote(tarefas, dpi=DPI):
+    global _MODELO
+    if _MODELO is None or _MODELO.dpi != dpi:
+        _MODELO = ModeloGrafico(dpi=dpi)
+    for datas, taxa, media, titulo, caminho in tarefas:
+        _MODELO.renderizar(datas, taxa, media, titulo, caminho)
+    return len(tarefas)
+
+
+def _hash_tarefa(datas, taxa, media, titulo, dpi):
+    resumo = hashlib.sha256()
+    for array in (datas, taxa, media):
+        resumo.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    resumo.update(f"{titulo}|{dpi}".encode('utf-8'))
+    return resumo.hexdigest()
+
+
+def montar_tarefas(df, diretorio=DIRETORIO_GRAFICOS):
+    """Uma tarefa por serie (tabela x variavel x territorio): (datas, taxa, media, titulo, caminho)"""
+    dados = pd.DataFrame({
+        'data': date2num(pd.to_datetime(df['data_referencia']).to_numpy()),
+        'taxa': tipos.para_float64(df['taxa_desocupacao']).to_numpy(),
+        'media': tipos.para_float64(df['media_movel_4p']).to_numpy() if 'media_movel_4p' in df.columns else np.nan,
+        'localidade': df['localidade'].astype(str).to_numpy() if 'localidade' in df.columns else '',
+        **{coluna: df[coluna].astype(str).to_numpy() for coluna in CHAVE_SERIE}
+    }).sort_values('data', kind='stable')
+
+    tarefas = []
+    for (tabela, variavel, territorio), serie in dados.groupby(CHAVE_SERIE, sort=True):
+        localidade = serie['localidade'].iloc[-1] or territorio
+        titulo = f"Evolucao da Taxa de Desocupacao - {localidade}\nTabela {tabela}, variavel {variavel}"
+        caminho = os.path.join(diretorio, f"{tabela}_{variavel}_{territorio}.png")
+        tarefas.append((serie['data'].to_numpy(), serie['taxa'].to_numpy(), serie['media'].to_numpy(),
+                        titulo, caminho))
+    return tarefas
+
+
+def _ler_manifesto(diretorio):
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_MANIFESTO), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def renderizar_tarefas(tarefas, diretorio=DIRETORIO_GRAFICOS, processos=None, dpi=DPI, forcar=False):
+    """Renderiza as tarefas cujo hash de entrada mudou; devolve (renderizados, pulados)"""
+    os.makedirs(diretorio, exist_ok=True)
+    manifesto = _ler_manifesto(diretorio)
+
+    pendentes, hashes = [], {}
+    for tarefa in tarefas:
+        datas, taxa, media, titulo, caminho = tarefa
+        nome = os.path.basename(caminho)
+        hashes[nome] = _hash_tarefa(datas, taxa, media, titulo, dpi)
+        if forcar or manifesto.get(nome) != hashes[nome] or not os.path.exists(caminho):
+            pendentes.append(tarefa)
+
+    processos = processos or os.cpu_count() or 1
+    if processos > 1 and len(pendentes) >= MINIMO_PARALELO:
+        # lotes: varios graficos por ida ao processo, reaproveitando o modelo
+        n_lotes = processos * 4
+        lotes = [pendentes[i::n_lotes] for i in range(n_lotes) if pendentes[i::n_lotes]]
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            list(executor.map(_renderizar_lote, lotes, [dpi] * len(lotes)))
+    elif pendentes:
+        _renderizar_lote(pendentes, dpi)
+
+    manifesto.update(hashes)
+    with open(os.path.join(diretorio, ARQUIVO_MANIFESTO), 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo)
+
+    return len(pendentes), len(tarefas) - len(pendentes)
+
+
+def renderizar_dashboard(df, diretorio=DIRETORIO_GRAFICOS, processos=None, dpi=DPI):
+    """Etapa do pipeline: um grafico por UF/indicador do dashboard_pnad"""
+    renderizados, pulados = renderizar_tarefas(montar_tarefas(df, diretorio), diretorio, processos, dpi)
+    print(f" Graficos: {renderizados} renderizados, {pulados} inalterados em {diretorio}")
+    return None
+
+
+def renderizar_serie(datas, taxa, titulo, caminho, media=None, dpi=DPI):
+    """Um unico grafico (sem pool nem manifesto)"""
+    datas = date2num(pd.to_datetime(pd.Series(datas)).to_numpy())
+    taxa = np.asarray(taxa, dtype=np.float64)
+    media = np.full(len(taxa), np.nan) if media is None else np.asarray(media, dtype=np.float64)
+    _renderizar_lote([(datas, taxa, media, titulo, caminho)], dpi)
+    return caminho
@@ -0,0 +1,236 @@
+# instrumentacao.py - SPANS DE TEMPO, LINHAS, BYTES E MEMORIA POR ETAPA
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import configuracao
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage, o pico de RSS fica ausente
+    resource = None
+
+DIRETORIO_METRICAS = configuracao.caminho_dados('metricas')
+ARQUIVO_JSONL = 'metricas.jsonl'
+ARQUIVO_PROMETHEUS = 'pnad.prom'
+DIRETORIO_PERFIS = configuracao.caminho_dados('perfis')
+
+# Formatos de exportacao ('jsonl', 'prometheus', ambos separados por virgula ou 'nenhum')
+FORMATO_METRICAS = os.environ.get('PNAD_METRICAS', 'jsonl')
+
+# Perfis opcionais por etapa: 'cprofile', 'tracemalloc' ou ambos separados por virgula
+PERFIL = {modo for modo in os.environ.get('PNAD_PERFIL', '').split(',') if modo}
+
+LINHAS_MEMORIA = 25
+
+_SPANS = []
+_TRAVA = threading.Lock()
+_LOCAL = threading.local()
+_PERFIL_ATIVO = False
+
+
+def pico_rss_mb():
+    """Pico de memoria residente do processo ate agora (None sem o modulo resource)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB, macOS bytes
+    return round(pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024, 1)
+
+
+class Span:
+    """Trecho medido; linhas/bytes sao preenchidos pelo codigo instrumentado"""
+
+    def __init__(self, nome, caminho, etapa, atributos):
+        self.nome = nome
+        self.caminho = caminho
+        self.etapa = etapa
+        self.atributos = atributos
+        self.linhas_entrada = None
+        self.linhas_saida = None
+        self.bytes = None
+        self.pico_python_mb = None
+        self.inicio = None
+        self.duracao_s = None
+        self.erro = None
+
+    def registro(self):
+        return {
+            'span': self.caminho,
+            'etapa': self.etapa,
+            'inicio': self.inicio,
+            'duracao_s': round(self.duracao_s, 6),
+            'linhas_entrada': self.linhas_entrada,
+            'linhas_saida': self.linhas_saida,
+            'bytes': self.bytes,
+            'pico_rss_mb': pico_rss_mb(),
+            'pico_python_mb': self.pico_python_mb,
+            'status': 'erro' if self.erro else 'ok',
+            'erro': self.erro,
+            **self.atributos
+        }
+
+
+class _Medicao:
+    """Context manager de span(); etapa() acrescenta os perfis opcionais"""
+
+    def __init__(self, nome, atributos, perfil=False):
+        self.nome = nome
+        self.atributos = atributos
+        self.perfil = perfil
+        self.perfilador = None
+        self.iniciou_tracemalloc = False
+
+    def __enter__(self):
+        pilha = getattr(_LOCAL, 'pilha', None)
+        if pilha is None:
+            pilha = _LOCAL.pilha = []
+        caminho = '/'.join([span.nome for span in pilha] + [self.nome])
+        etapa = pilha[0].nome if pilha else self.nome
+        self.span = Span(self.nome, caminho, etapa, self.atributos)
+        pilha.append(self.span)
+
+        if self.perfil:
+            self._iniciar_perfil()
+        self.span.inicio = datetime.now().isoformat(timespec='milliseconds')
+        self._relogio = time.perf_counter()
+        return self.span
+
+    def __exit__(self, tipo, erro, rastreamento):
+        self.span.duracao_s = time.perf_counter() - self._relogio
+        if erro is not None:
+            self.span.erro = f"{tipo.__name__}: {erro}"
+        if self.perfil:
+            self._encerrar_perfil()
+
+        _LOCAL.pilha.pop()
+        with _TRAVA:
+            _SPANS.append(self.span.registro())
+        return False
+
+    def _iniciar_perfil(self):
+        global _PERFIL_ATIVO
+        if 'cprofile' in PERFIL and not _PERFIL_ATIVO:
+            # um perfilador por vez (etapas aninhadas ficam no perfil da externa)
+            _PERFIL_ATIVO = True
+            self.perfilador = cProfile.Profile()
+            self.perfilador.enable()
+        if 'tracemalloc' in PERFIL:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.iniciou_tracemalloc = True
+            tracemalloc.reset_peak()
+
+    def _encerrar_perfil(self):
+        global _PERFIL_ATIVO
+        nome_arquivo = self.span.caminho.replace('/', '.')
+        if self.perfilador is not None:
+            self.perfilador.disable()
+            _PERFIL_ATIVO = False
+            os.makedirs(DIRETORIO_PERFIS, exist_ok=True)
+            self.perfilador.dump_stats(os.path.join(DIRETORIO_PERFIS, f"{nome_arquivo}.prof"))
+        if 'tracemalloc' in PERFIL and tracemalloc.is_tracing():
+            _, pico = tracemalloc.get_traced_memory()
+            self.span.pico_python_mb = round(pico / 1024 ** 2, 2)
+            os.makedirs(DIRETORIO_PERFIS, exist_ok=True)
+            estatisticas = tracemalloc.take_snapshot().statistics('lineno')[:LINHAS_MEMORIA]
+            with open(os.path.join(DIRETORIO_PERFIS, f"{nome_arquivo}_memoria.txt"), 'w',
+                      encoding='utf-8') as arquivo:
+                arquivo.write(f"pico: {self.span.pico_python_mb} MB\n")
+                arquivo.writelines(f"{estatistica}\n" for estatistica in estatisticas)
+            if self.iniciou_tracemalloc:
+                tracemalloc.stop()
+
+
+def span(nome, **atributos):
+    """Mede um trecho: `with span('sql_write') as s: ...; s.linhas_saida = n`
+
+    Spans aninhados ganham o caminho do pai ('final/sql_write'); cada thread
+    tem a propria pilha.
+    """
+    return _Medicao(nome, atributos)
+
+
+def etapa(nome, **atributos):
+    """Span de etapa do ETL; com PNAD_PERFIL grava perfis em DIRETORIO_PERFIS"""
+    return _Medicao(nome, atributos, perfil=bool(PERFIL))
+
+
+def propagar(funcao):
+    """Envolve funcao para que spans abertos em outra thread fiquem sob o span atual"""
+    pilha = list(getattr(_LOCAL, 'pilha', []))
+
+    def executar(*args, **kwargs):
+        _LOCAL.pilha = list(pilha)
+        return funcao(*args, **kwargs)
+    return executar
+
+
+def ativar_perfil(modos):
+    """Liga os perfis ('cprofile', 'tracemalloc') sem depender da variavel de ambiente"""
+    PERFIL.update(modos)
+
+
+def spans():
+    with _TRAVA:
+        return list(_SPANS)
+
+
+def _rotulos(registro):
+    rotulos = {'span': registro['span'], 'etapa': registro['etapa'], 'status': registro['status']}
+    return ','.join(f'{chave}="{valor}"' for chave, valor in rotulos.items())
+
+
+def formatar_prometheus(registros):
+    """Texto no formato de exposicao do Prometheus (coletor textfile do node_exporter)"""
+    metricas = [
+        ('pnad_span_duracao_segundos', 'gauge', 'Duracao do span', 'duracao_s'),
+        ('pnad_span_linhas_entrada', 'gauge', 'Linhas recebidas pelo span', 'linhas_entrada'),
+        ('pnad_span_linhas_saida', 'gauge', 'Linhas produzidas pelo span', 'linhas_saida'),
+        ('pnad_span_bytes', 'gauge', 'Bytes transferidos no span', 'bytes'),
+        ('pnad_span_pico_rss_megabytes', 'gauge', 'Pico de RSS do processo ao fim do span', 'pico_rss_mb')
+    ]
+    linhas = []
+    for nome, tipo, ajuda, campo in metricas:
+        valores = [(registro, registro[campo]) for registro in registros if registro[campo] is not None]
+        if not valores:
+            continue
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        # o mesmo span pode ocorrer varias vezes (uma por consulta HTTP): soma
+        acumulado = {}
+        for registro, valor in valores:
+            rotulos = _rotulos(registro)
+            if campo == 'pico_rss_mb':
+                acumulado[rotulos] = max(acumulado.get(rotulos, 0), valor)
+            else:
+                acumulado[rotulos] = acumulado.get(rotulos, 0) + valor
+        linhas += [f"{nome}{{{rotulos}}} {valor}" for rotulos, valor in acumulado.items()]
+    return '\n'.join(linhas) + '\n'
+
+
+def exportar(formato=None, diretorio=DIRETORIO_METRICAS):
+    """Grava os spans acumulados (JSON lines e/ou Prometheus) e esvazia o registro"""
+    formatos = {parte for parte in (formato or FORMATO_METRICAS).split(',') if parte}
+    with _TRAVA:
+        registros = list(_SPANS)
+        _SPANS.clear()
+    if not registros or 'nenhum' in formatos:
+        return registros
+
+    os.makedirs(diretorio, exist_ok=True)
+    if 'jsonl' in formatos:
+        with open(os.path.join(diretorio, ARQUIVO_JSONL), 'a', encoding='utf-8') as arquivo:
+            arquivo.writelines(json.dumps(registro, ensure_ascii=False) + '\n' for registro in registros)
+    if 'prometheus' in formatos:
+        # escrita atomica: o coletor nunca le um arquivo pela metade
+        caminho = os.path.join(diretorio, ARQUIVO_PROMETHEUS)
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+            arquivo.write(formatar_prometheus(registros))
+        os.replace(caminho + '.tmp', caminho)
+    return registros
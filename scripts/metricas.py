@@ -0,0 +1,173 @@
+# metricas.py - METRICAS DERIVADAS POR SERIE (TERRITORIO x INDICADOR)
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import tipos
+from periodos import interpretar_periodos
+
+# Uma serie = uma tabela SIDRA, uma variavel, um territorio
+CHAVE_SERIE = ['tabela', 'D2C', 'D1C']
+
+JANELA_MEDIA_MOVEL = 4
+
+METRICAS = [
+    'variacao_periodo', 'media_movel_4p', 'vs_media_historica', 'status',
+    'nivel_desocupacao', 'variacao_anual', 'desvio_sazonal'
+]
+
+# Metricas calculadas sobre arrays numericos (as demais derivam delas)
+_METRICAS_NUMERICAS = ['variacao_periodo', 'media_movel_4p', 'vs_media_historica',
+                       'variacao_anual', 'desvio_sazonal']
+
+STATUS = ['Abaixo da Media', 'Acima da Media']
+NIVEIS = ['Baixa', 'Moderada', 'Alta']
+# Taxa (%) ate a qual o nivel e Baixa / acima da qual e Alta
+LIMITES_NIVEL = (7, 10)
+
+# Abaixo disso o custo de serializar os blocos supera o ganho dos processos
+LIMIAR_PARALELO = 2_000_000
+
+
+def _calcular_bloco(grupos, meses, valores, janela=JANELA_MEDIA_MOVEL):
+    """Metricas numericas para arrays ordenados por (grupo, mes)
+
+    grupos: codigos 0..G-1 da serie; meses: ano * 12 + mes final do trimestre.
+    """
+    n = len(valores)
+    posicao = np.arange(n)
+    inicio = np.ones(n, dtype=bool)
+    inicio[1:] = grupos[1:] != grupos[:-1]
+    inicio_grupo = np.maximum.accumulate(np.where(inicio, posicao, 0))
+
+    validos = ~np.isnan(valores)
+    zerados = np.where(validos, valores, 0.0)
+
+    # variacao em relacao ao periodo anterior da mesma serie (%)
+    anterior = np.empty(n)
+    anterior[0] = np.nan
+    anterior[1:] = valores[:-1]
+    anterior[inicio] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variacao_periodo = (valores / anterior - 1) * 100
+
+    # media movel (min_periods=1, ignorando ausentes) por somas acumuladas
+    soma = np.concatenate(([0.0], np.cumsum(zerados)))
+    contagem = np.concatenate(([0], np.cumsum(validos)))
+    inicio_janela = np.maximum(posicao - janela + 1, inicio_grupo)
+    n_janela = contagem[posicao + 1] - contagem[inicio_janela]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media_movel = np.where(n_janela > 0, (soma[posicao + 1] - soma[inicio_janela]) / n_janela, np.nan)
+
+    # desvio da media historica da propria serie
+    n_grupos = int(grupos[-1]) + 1 if n else 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media_grupo = (np.bincount(grupos, weights=zerados, minlength=n_grupos)
+                       / np.bincount(grupos, weights=validos, minlength=n_grupos))
+    vs_media = valores - media_grupo[grupos]
+
+    # mesmo trimestre do ano anterior (p.p.): busca binaria na chave (grupo, mes)
+    chave = grupos.astype(np.int64) * 1_000_000 + meses
+    alvo = chave - 12
+    indice = np.minimum(np.searchsorted(chave, alvo), max(n - 1, 0))
+    encontrado = chave[indice] == alvo
+    variacao_anual = np.where(encontrado, valores - valores[indice], np.nan)
+
+    # desvio da media da serie para o mesmo mes final (perfil sazonal)
+    sazonal = grupos.astype(np.int64) * 12 + (meses - 1) % 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media_sazonal = (np.bincount(sazonal, weights=zerados, minlength=n_grupos * 12)
+                         / np.bincount(sazonal, weights=validos, minlength=n_grupos * 12))
+    desvio_sazonal = valores - media_sazonal[sazonal]
+
+    return {
+        'variacao_periodo': variacao_periodo,
+        'media_movel_4p': media_movel,
+        'vs_media_historica': vs_media,
+        'variacao_anual': variacao_anual,
+        'desvio_sazonal': desvio_sazonal
+    }
+
+
+def _calcular_bloco_empacotado(argumentos):
+    return _calcular_bloco(*argumentos)
+
+
+def _dividir_por_grupo(grupos, n_blocos):
+    """Limites [inicio, fim) de blocos com ~mesmo tamanho sem cortar series"""
+    inicios = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+    alvos = np.linspace(0, len(grupos), n_blocos + 1)[1:-1]
+    proximos = inicios[np.minimum(np.searchsorted(inicios, alvos), len(inicios) - 1)]
+    cortes = np.unique(np.r_[0, proximos, len(grupos)])
+    return list(zip(cortes[:-1], cortes[1:]))
+
+
+def _calcular_em_processos(grupos, meses, valores, processos):
+    blocos = []
+    for inicio, fim in _dividir_por_grupo(grupos, processos):
+        # codigos do bloco rebaseados para 0..G-1 (bincount)
+        blocos.append((grupos[inicio:fim] - grupos[inicio], meses[inicio:fim], valores[inicio:fim]))
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        resultados = list(executor.map(_calcular_bloco_empacotado, blocos))
+
+    return {
+        nome: np.concatenate([resultado[nome] for resultado in resultados])
+        for nome in _METRICAS_NUMERICAS
+    }
+
+
+def calcular_metricas(df, metricas=METRICAS, coluna_valor='taxa_desocupacao', processos=None,
+                      limiar_paralelo=LIMIAR_PARALELO):
+    """Calcula as metricas por serie; devolve {nome: array alinhado as linhas de df}
+
+    Nada vaza entre series: media movel, variacoes e medias sao por
+    territorio x indicador. Entradas com mais de `limiar_paralelo` linhas sao
+    divididas por serie entre `processos` processos (padrao: numero de CPUs).
+    """
+    n = len(df)
+    if n == 0:
+        return {nome: np.empty(0) for nome in metricas}
+
+    grupos = df.groupby(CHAVE_SERIE, observed=True, sort=True).ngroup().to_numpy(np.int64)
+    tabelas = df['tabela'] if 'tabela' in df.columns else None
+    periodos = interpretar_periodos(df['D3C'], tabelas)
+    meses = periodos['ano'].to_numpy(np.int64) * 12 + periodos['mes_final'].to_numpy(np.int64)
+    valores = tipos.para_float64(df[coluna_valor]).to_numpy()
+
+    ordem = np.argsort(grupos * 1_000_000 + meses, kind='stable')
+    grupos_ordenados, meses_ordenados, valores_ordenados = grupos[ordem], meses[ordem], valores[ordem]
+
+    processos = processos or os.cpu_count() or 1
+    if n >= limiar_paralelo and processos > 1:
+        calculadas = _calcular_em_processos(grupos_ordenados, meses_ordenados, valores_ordenados, processos)
+    else:
+        calculadas = _calcular_bloco(grupos_ordenados, meses_ordenados, valores_ordenados)
+
+    resultado = {}
+    for nome in _METRICAS_NUMERICAS:
+        if nome in metricas or (nome == 'vs_media_historica' and 'status' in metricas):
+            alinhado = np.empty(n)
+            alinhado[ordem] = calculadas[nome]
+            resultado[nome] = alinhado
+
+    if 'status' in metricas:
+        resultado['status'] = pd.Categorical.from_codes(
+            (resultado['vs_media_historica'] > 0).astype(np.int8), STATUS
+        )
+    if 'nivel_desocupacao' in metricas:
+        # faixas: <= 7 Baixa, <= 10 Moderada, > 10 Alta (ausente: Moderada)
+        baixa, alta = valores <= LIMITES_NIVEL[0], valores > LIMITES_NIVEL[1]
+        codigos = np.select([baixa, alta], [0, 2], default=1).astype(np.int8)
+        resultado['nivel_desocupacao'] = pd.Categorical.from_codes(codigos, NIVEIS)
+
+    return {nome: resultado[nome] for nome in metricas}
+
+
+def adicionar_metricas(df, metricas=METRICAS, **kwargs):
+    """Grava as metricas como colunas de df (altera e devolve o proprio df)"""
+    for nome, valores in calcular_metricas(df, metricas, **kwargs).items():
+        df[nome] = valores
+    return df
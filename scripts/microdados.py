@@ -0,0 +1,346 @@
+# microdados.py - MICRODADOS DA PNAD CONTINUA: LEITURA EM BLOCOS E TAXAS PONDERADAS (V1028)
+import glob
+import os
+import re
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import configuracao
+import esquema
+import pnad_etl
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+DIRETORIO_MICRODADOS = configuracao.caminho_dados('microdados')
+
+# Codigo de 'tabela' das taxas calculadas dos microdados (D3C trimestral AAAAQQ)
+TABELA_MICRODADOS = 'PNADC'
+VARIAVEL_DESOCUPACAO = '4099'
+
+# Linhas por bloco lido: a memoria fica em ~LINHAS_POR_BLOCO x largura do registro,
+# qualquer que seja o tamanho do arquivo
+LINHAS_POR_BLOCO = 50_000
+
+# Quantas casas decimais guardar da taxa: a soma por blocos muda de ordem com
+# LINHAS_POR_BLOCO, e o ruido de ponto flutuante viraria revisao (revisoes.py)
+CASAS_DECIMAIS = 4
+
+PESO = 'V1028'
+# VD4001 = 1: na forca de trabalho; VD4002 = 2: desocupada
+COLUNAS_BASE = ['Ano', 'Trimestre', 'UF', PESO, 'VD4001', 'VD4002']
+
+# desagregacao -> (variavel do dicionario, rotulo, {codigo: categoria})
+DESAGREGACOES = {
+    'sexo': ('V2007', 'Sexo', {1: 'Homem', 2: 'Mulher'}),
+    'cor_raca': ('V2010', 'Cor ou raça', {1: 'Branca', 2: 'Preta', 3: 'Amarela', 4: 'Parda', 5: 'Indígena'}),
+    'instrucao': ('VD3004', 'Nível de instrução', {
+        1: 'Sem instrução', 2: 'Fundamental incompleto', 3: 'Fundamental completo', 4: 'Médio incompleto',
+        5: 'Médio completo', 6: 'Superior incompleto', 7: 'Superior completo'
+    }),
+    'faixa_etaria': ('V2009', 'Faixa etária', {1: '14 a 17 anos', 2: '18 a 24 anos', 3: '25 a 39 anos',
+                                               4: '40 a 59 anos', 5: '60 anos ou mais'})
+}
+# Limites inferiores das faixas etarias (codigos 1..5 acima)
+LIMITES_IDADE = [14, 18, 25, 40, 60]
+
+NOMES_UF = {
+    '11': 'Rondônia', '12': 'Acre', '13': 'Amazonas', '14': 'Roraima', '15': 'Pará', '16': 'Amapá',
+    '17': 'Tocantins', '21': 'Maranhão', '22': 'Piauí', '23': 'Ceará', '24': 'Rio Grande do Norte',
+    '25': 'Paraíba', '26': 'Pernambuco', '27': 'Alagoas', '28': 'Sergipe', '29': 'Bahia',
+    '31': 'Minas Gerais', '32': 'Espírito Santo', '33': 'Rio de Janeiro', '35': 'São Paulo',
+    '41': 'Paraná', '42': 'Santa Catarina', '43': 'Rio Grande do Sul', '50': 'Mato Grosso do Sul',
+    '51': 'Mato Grosso', '52': 'Goiás', '53': 'Distrito Federal'
+}
+
+# Linha do input SAS do IBGE: "@0050 V1028 15. /* Peso ... */"
+_LINHA_DICIONARIO = re.compile(r'@(\d+)\s+(\w+)\s+\$?(\d+)\.')
+
+
+# ---------- DICIONARIO E ESPECIFICACAO DAS COLUNAS ----------
+
+def ler_dicionario(caminho):
+    """{variavel: (inicio, tamanho)} do arquivo de input do IBGE (inicio a partir de 0)"""
+    with open(caminho, encoding='latin-1') as arquivo:
+        texto = arquivo.read()
+    dicionario = {nome: (int(inicio) - 1, int(tamanho)) for inicio, nome, tamanho in _LINHA_DICIONARIO.findall(texto)}
+    if not dicionario:
+        raise ValueError(f"Nenhuma variavel reconhecida no dicionario {caminho}")
+    return dicionario
+
+
+def especificacao_colunas(dicionario, desagregacoes=DESAGREGACOES):
+    """{variavel: (inicio, tamanho)} so das variaveis usadas nas taxas"""
+    variaveis = COLUNAS_BASE + [variavel for variavel, _, _ in desagregacoes.values()]
+    ausentes = [variavel for variavel in variaveis if variavel not in dicionario]
+    if ausentes:
+        raise ValueError(f"Variaveis ausentes no dicionario: {', '.join(ausentes)}")
+    return {variavel: dicionario[variavel] for variavel in variaveis}
+
+
+def localizar_dicionario(diretorio=DIRETORIO_MICRODADOS):
+    candidatos = sorted(glob.glob(os.path.join(diretorio, 'input_PNADC*.txt')))
+    if not candidatos:
+        raise FileNotFoundError(f"Dicionario input_PNADC*.txt nao encontrado em {diretorio}")
+    return candidatos[-1]
+
+
+def listar_arquivos(diretorio=DIRETORIO_MICRODADOS):
+    """Arquivos trimestrais (PNADC_TTAAAA.txt ou .zip do IBGE), sem o dicionario"""
+    arquivos = glob.glob(os.path.join(diretorio, 'PNADC_*.txt')) + glob.glob(os.path.join(diretorio, 'PNADC_*.zip'))
+    return sorted(arquivos)
+
+
+# ---------- LEITURA EM BLOCOS ----------
+
+def _abrir(caminho):
+    """Arquivo binario; de um .zip, o .txt dentro dele (descompactado em fluxo)"""
+    if caminho.lower().endswith('.zip'):
+        arquivo_zip = zipfile.ZipFile(caminho)
+        membro = next(nome for nome in arquivo_zip.namelist() if nome.lower().endswith('.txt'))
+        return arquivo_zip.open(membro)
+    return open(caminho, 'rb')
+
+
+def iterar_blocos(caminho, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Blocos (linhas, largura) de bytes uint8 de um arquivo de largura fixa
+
+    A largura do registro vem da primeira linha; cada bloco e uma matriz sobre
+    os bytes lidos (sem decodificar texto nem separar linhas em Python).
+    """
+    with _abrir(caminho) as arquivo:
+        primeira = arquivo.readline()
+        if not primeira:
+            return
+        fim_linha = b'\r\n' if primeira.endswith(b'\r\n') else b'\n'
+        largura = len(primeira)
+        pendente = primeira
+        while True:
+            lido = arquivo.read(largura * linhas_por_bloco)
+            dados = pendente + lido
+            if not lido:
+                if dados and not dados.endswith(fim_linha):
+                    dados += fim_linha
+                completas = len(dados)
+            else:
+                completas = len(dados) // largura * largura
+            pendente = dados[completas:]
+            if completas:
+                bloco = np.frombuffer(dados, dtype=np.uint8, count=completas).reshape(-1, largura)
+                if (bloco[:, -1] != ord('\n')).any():
+                    raise ValueError(f"{caminho}: registros de tamanho variavel (esperado {largura} bytes)")
+                yield bloco
+            if not lido:
+                if pendente or len(dados) % largura:
+                    raise ValueError(f"{caminho}: registro final incompleto")
+                return
+
+
+def campo_inteiro(bloco, inicio, tamanho):
+    """Campo numerico inteiro de cada linha; em branco -> -1"""
+    digitos = bloco[:, inicio:inicio + tamanho].astype(np.int64) - ord('0')
+    branco = (digitos == ord(' ') - ord('0')).all(axis=1)
+    digitos[digitos < 0] = 0
+    valores = digitos @ (10 ** np.arange(tamanho - 1, -1, -1, dtype=np.int64))
+    return np.where(branco, -1, valores)
+
+
+def campo_decimal(bloco, inicio, tamanho):
+    """Campo com ponto decimal (ex.: peso V1028); em branco -> 0"""
+    texto = np.ascontiguousarray(bloco[:, inicio:inicio + tamanho]).view(f'S{tamanho}').ravel()
+    texto = np.where(np.char.strip(texto) == b'', b'0', texto)
+    return texto.astype(np.float64)
+
+
+# ---------- AGREGACAO PONDERADA ----------
+
+def categorias(bloco, especificacao, desagregacao):
+    """Codigo da categoria (1..K) de cada pessoa na desagregacao; fora das categorias -> 0"""
+    variavel, _, rotulos = DESAGREGACOES[desagregacao]
+    codigos = campo_inteiro(bloco, *especificacao[variavel])
+    if desagregacao == 'faixa_etaria':
+        return np.where(codigos >= LIMITES_IDADE[0], np.digitize(codigos, LIMITES_IDADE), 0)
+    return np.where(np.isin(codigos, list(rotulos)), codigos, 0)
+
+
+def agregar_bloco(bloco, especificacao, desagregacoes=DESAGREGACOES):
+    """Somas de peso na forca de trabalho e desocupados por (periodo, UF, desagregacao, categoria)"""
+    ano = campo_inteiro(bloco, *especificacao['Ano'])
+    trimestre = campo_inteiro(bloco, *especificacao['Trimestre'])
+    uf = campo_inteiro(bloco, *especificacao['UF'])
+    peso = campo_decimal(bloco, *especificacao[PESO])
+    forca = campo_inteiro(bloco, *especificacao['VD4001']) == 1
+    desocupada = campo_inteiro(bloco, *especificacao['VD4002']) == 2
+
+    # so quem esta na forca de trabalho entra nas somas
+    celula = (ano * 10 + trimestre) * 100 + uf
+    celula, peso, desocupada = celula[forca], peso[forca], desocupada[forca]
+
+    partes = []
+    for desagregacao in ['total'] + list(desagregacoes):
+        if desagregacao == 'total':
+            categoria = np.zeros(len(celula), dtype=np.int64)
+            manter = slice(None)
+        else:
+            categoria = categorias(bloco, especificacao, desagregacao)[forca]
+            manter = categoria > 0
+        chaves, grupo = np.unique((celula * 100 + categoria)[manter], return_inverse=True)
+        partes.append(pd.DataFrame({
+            'desagregacao': desagregacao,
+            'chave': chaves,
+            'peso_forca': np.bincount(grupo, weights=peso[manter]),
+            'peso_desocupados': np.bincount(grupo, weights=np.where(desocupada, peso, 0)[manter]),
+            'amostra': np.bincount(grupo)
+        }))
+    return pd.concat(partes, ignore_index=True)
+
+
+def agregar_arquivo(caminho, especificacao, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Somas ponderadas de um arquivo inteiro, lido em blocos; devolve (somas, linhas lidas)"""
+    somas, linhas = [], 0
+    for bloco in iterar_blocos(caminho, linhas_por_bloco):
+        somas.append(agregar_bloco(bloco, especificacao))
+        linhas += len(bloco)
+    if not somas:
+        return pd.DataFrame(columns=['desagregacao', 'chave', 'peso_forca', 'peso_desocupados', 'amostra']), 0
+    # partes pequenas (uma linha por celula x categoria): a soma final e barata
+    somas = pd.concat(somas, ignore_index=True).groupby(['desagregacao', 'chave'], as_index=False).sum()
+    return somas, linhas
+
+
+def _agregar_arquivo_empacotado(argumentos):
+    return agregar_arquivo(*argumentos)
+
+
+def taxas_sidra(somas):
+    """Taxas de desocupacao (%) por UF e Brasil no layout de pnad_historico"""
+    somas = somas.assign(
+        ano=somas['chave'] // 100_000, trimestre=somas['chave'] // 10_000 % 10,
+        uf=somas['chave'] // 100 % 100, categoria=somas['chave'] % 100
+    )
+    grupos = ['desagregacao', 'ano', 'trimestre', 'categoria']
+    brasil = somas.groupby(grupos, as_index=False)[['peso_forca', 'peso_desocupados', 'amostra']].sum()
+    brasil['uf'] = 1
+    somas = pd.concat([somas, brasil], ignore_index=True)
+    somas = somas[somas['peso_forca'] > 0]
+
+    uf = somas['uf'].astype(str).to_numpy()
+    de_brasil = uf == '1'
+    rotulos = {
+        (desagregacao, codigo): f" - {rotulo}: {categoria}"
+        for desagregacao, (_, rotulo, categorias_) in DESAGREGACOES.items()
+        for codigo, categoria in categorias_.items()
+    }
+    pares = list(zip(somas['desagregacao'], somas['categoria']))
+    total = (somas['desagregacao'] == 'total').to_numpy()
+
+    return pd.DataFrame({
+        'tabela': TABELA_MICRODADOS,
+        'NC': np.where(de_brasil, '1', '3'),
+        'NN': np.where(de_brasil, 'Brasil', 'Unidade da Federação'),
+        'MC': '2',
+        'MN': '%',
+        'V': (somas['peso_desocupados'] / somas['peso_forca'] * 100).round(CASAS_DECIMAIS).to_numpy(),
+        'D1C': uf,
+        'D1N': np.where(de_brasil, 'Brasil', [NOMES_UF.get(codigo, codigo) for codigo in uf]),
+        'D2C': np.where(total, VARIAVEL_DESOCUPACAO,
+                        [f"{VARIAVEL_DESOCUPACAO}-{d}-{c}" for d, c in pares]),
+        'D2N': ['Taxa de desocupação' + ('' if t else rotulos[par]) for t, par in zip(total, pares)],
+        'D3C': (somas['ano'] * 100 + somas['trimestre']).astype(str).to_numpy(),
+        'D3N': (somas['trimestre'].astype(str) + 'º trimestre ' + somas['ano'].astype(str)).to_numpy()
+    })
+
+
+# ---------- INGESTAO ----------
+
+def garantir_catalogo(conn):
+    """Arquivos ja ingeridos (tamanho e data de modificacao): arquivo inalterado nao e relido"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS arquivos_microdados (
+            arquivo TEXT PRIMARY KEY,
+            tamanho INTEGER NOT NULL,
+            modificado_em REAL NOT NULL,
+            registros INTEGER NOT NULL,
+            periodos TEXT NOT NULL,
+            ingerido_em TEXT NOT NULL
+        )
+    """)
+
+
+def _assinatura(caminho):
+    estado = os.stat(caminho)
+    return estado.st_size, estado.st_mtime
+
+
+def arquivos_pendentes(conn, arquivos):
+    registrados = dict(
+        ((arquivo, (tamanho, modificado_em)) for arquivo, tamanho, modificado_em
+         in conn.execute("SELECT arquivo, tamanho, modificado_em FROM arquivos_microdados"))
+    )
+    return [caminho for caminho in arquivos if registrados.get(os.path.basename(caminho)) != _assinatura(caminho)]
+
+
+def ingerir_microdados(caminho_banco=CAMINHO_BANCO, diretorio=DIRETORIO_MICRODADOS, caminho_dicionario=None,
+                       processos=1, forcar=False, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Le os arquivos trimestrais novos ou alterados e grava as taxas em pnad_historico
+
+    Cada arquivo e lido em blocos de linhas_por_bloco registros (so as colunas
+    do dicionario que entram nas taxas); com processos > 1, trimestres
+    diferentes sao lidos em paralelo (memoria ~ processos x bloco). Devolve o
+    numero de linhas gravadas.
+    """
+    arquivos = listar_arquivos(diretorio)
+    if not arquivos:
+        return 0
+    especificacao = especificacao_colunas(ler_dicionario(caminho_dicionario or localizar_dicionario(diretorio)))
+
+    conn = esquema.conectar(caminho_banco)
+    try:
+        garantir_catalogo(conn)
+        pendentes = arquivos if forcar else arquivos_pendentes(conn, arquivos)
+        print(f"Microdados: {len(pendentes)} de {len(arquivos)} arquivos para ler")
+        if not pendentes:
+            return 0
+
+        argumentos = [(caminho, especificacao, linhas_por_bloco) for caminho in pendentes]
+        if processos > 1 and len(pendentes) > 1:
+            executor = ProcessPoolExecutor(max_workers=processos)
+            resultados = executor.map(_agregar_arquivo_empacotado, argumentos)
+        else:
+            executor = None
+            resultados = map(_agregar_arquivo_empacotado, argumentos)
+
+        gravadas = 0
+        try:
+            # um arquivo (trimestre) por vez no banco: o que ja foi gravado fica registrado
+            for caminho, (somas, registros) in zip(pendentes, resultados):
+                df = taxas_sidra(somas)
+                nome = os.path.basename(caminho)
+                if not df.empty:
+                    pnad_etl.gravar_novos_periodos(conn, df, origem=f"microdados {nome}")
+                tamanho, modificado_em = _assinatura(caminho)
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO arquivos_microdados VALUES (?, ?, ?, ?, ?, ?)",
+                        (nome, tamanho, modificado_em, registros, ','.join(sorted(df['D3C'].unique())),
+                         datetime.now().isoformat(timespec='seconds'))
+                    )
+                gravadas += len(df)
+                print(f" {nome}: {registros:,} registros -> {len(df)} taxas")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return gravadas
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    # python microdados.py [diretorio] [--processos=N] [--forcar]
+    opcoes = dict(argumento[2:].partition('=')[::2] for argumento in sys.argv[1:] if argumento.startswith('--'))
+    posicionais = [argumento for argumento in sys.argv[1:] if not argumento.startswith('--')]
+    ingerir_microdados(diretorio=posicionais[0] if posicionais else DIRETORIO_MICRODADOS,
+                       processos=int(opcoes.get('processos') or 1), forcar='forcar' in opcoes)
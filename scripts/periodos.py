@@ -0,0 +1,107 @@
+# periodos.py - INTERPRETACAO VETORIZADA DOS CODIGOS DE PERIODO (D3C)
+import numpy as np
+import pandas as pd
+
+MESES = ['jan', 'fev', 'mar', 'abr', 'mai', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez']
+
+# Rotulo do trimestre (movel) que termina em cada mes: 3 -> 'jan-fev-mar'
+ROTULOS_TRIMESTRE = np.array([
+    f"{MESES[(mes - 3) % 12]}-{MESES[(mes - 2) % 12]}-{MESES[mes - 1]}" for mes in range(1, 13)
+])
+
+# Tabelas cujo D3C e AAAAQQ (trimestre 01-04); nas demais (ex.: 6381) e AAAAMM,
+# o mes final do trimestre movel. 'PNADC': taxas calculadas dos microdados
+TABELAS_TRIMESTRAIS = {'4099', 'PNADC'}
+
+# (codigo + tipo) -> (ano, mes_final, trimestre_num, data_referencia, rotulo)
+_CACHE_PERIODOS = {}
+
+
+def _interpretar_unicos(chaves):
+    """Interpreta codigos unicos ('AAAAXX' + 'M'/'T') com operacoes de array"""
+    chaves = np.asarray(chaves, dtype=str)
+    numeros = chaves.astype('U6').astype(np.int64)
+    trimestral = np.char.endswith(chaves, 'T')
+
+    ano = numeros // 100
+    sufixo = numeros % 100
+    mes_final = np.where(trimestral, sufixo * 3, sufixo)
+    if ((mes_final < 1) | (mes_final > 12)).any():
+        invalidos = chaves[(mes_final < 1) | (mes_final > 12)]
+        raise ValueError(f"Codigos de periodo invalidos: {sorted(set(invalidos.tolist()))[:5]}")
+
+    trimestre = np.where(mes_final % 3 == 0, mes_final // 3, 0)
+
+    # ultimo dia do mes final: inicio do mes seguinte - 1 dia
+    meses_desde_1970 = (ano - 1970) * 12 + mes_final
+    data_referencia = meses_desde_1970.astype('datetime64[M]').astype('datetime64[D]') - np.timedelta64(1, 'D')
+
+    rotulo = ROTULOS_TRIMESTRE[mes_final - 1]
+
+    for i, chave in enumerate(chaves):
+        _CACHE_PERIODOS[chave] = (ano[i], mes_final[i], trimestre[i], data_referencia[i], rotulo[i])
+
+
+def _fatorar(serie):
+    """Codigos inteiros 0..K-1 e valores unicos; categoricas usam os proprios codigos"""
+    if isinstance(serie.dtype, pd.CategoricalDtype) and not serie.hasnans:
+        return serie.cat.codes.to_numpy(np.int64), serie.cat.categories
+    return pd.factorize(serie)
+
+
+def interpretar_periodos(codigos, tabelas=None, colunas=None):
+    """Converte uma Series D3C em ano, mes final, trimestre (1-4; 0 se movel
+    sobreposto), data de fim do trimestre e rotulo 'jan-fev-mar'.
+
+    Cada codigo unico e interpretado uma unica vez (e fica em cache entre chamadas);
+    as linhas recebem os valores por indexacao. `colunas` limita o resultado
+    (o rotulo em texto e a coluna mais cara de expandir).
+    """
+    codigos = pd.Series(codigos)
+    if tabelas is None:
+        trimestral = np.zeros(len(codigos), dtype=np.int64)
+    else:
+        indices_tabela, tabelas_unicas = _fatorar(pd.Series(tabelas, index=codigos.index))
+        trimestral = pd.Index(tabelas_unicas).isin(TABELAS_TRIMESTRAIS).astype(np.int64)[indices_tabela]
+
+    # fatoriza o codigo e indexa o par (codigo, tipo) por contagem densa: nenhuma operacao de texto por linha
+    indices_codigo, codigos_unicos = _fatorar(codigos)
+    pares = indices_codigo * 2 + trimestral
+    presentes = np.bincount(pares, minlength=2 * len(codigos_unicos)) > 0
+    pares_unicos = np.flatnonzero(presentes)
+    indices = (np.cumsum(presentes) - 1)[pares]
+    unicos = [
+        f"{codigos_unicos[par // 2]}{'T' if par % 2 else 'M'}" for par in pares_unicos
+    ]
+
+    faltantes = [chave for chave in unicos if chave not in _CACHE_PERIODOS]
+    if faltantes:
+        _interpretar_unicos(faltantes)
+
+    valores = [_CACHE_PERIODOS[chave] for chave in unicos]
+    tabela = pd.DataFrame({
+        'ano': np.array([v[0] for v in valores], dtype=np.int64),
+        'mes_final': np.array([v[1] for v in valores], dtype=np.int64),
+        'trimestre_num': np.array([v[2] for v in valores], dtype=np.int64),
+        'data_referencia': np.array([v[3] for v in valores], dtype='datetime64[ns]'),
+        'trimestre': np.array([v[4] for v in valores], dtype=object)
+    })
+
+    if colunas is not None:
+        tabela = tabela[list(colunas)]
+    resultado = tabela.take(indices)
+    resultado.index = codigos.index
+    return resultado
+
+
+def adicionar_colunas_periodo(df, coluna='D3C'):
+    """Acrescenta ano, trimestre e data_referencia e ordena cronologicamente"""
+    tabelas = df['tabela'] if 'tabela' in df.columns else None
+    periodos = interpretar_periodos(df[coluna], tabelas)
+
+    df = df.assign(
+        ano=periodos['ano'],
+        trimestre=periodos['trimestre'],
+        data_referencia=periodos['data_referencia']
+    )
+    return df.sort_values('data_referencia', kind='stable')
@@ -0,0 +1,402 @@
+# pipeline.py - EXECUCAO DO PIPELINE COMPLETO EM UM UNICO PROCESSO
+import hashlib
+import inspect
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import alertas
+import configuracao
+import corrigir_trimestres
+import esquema
+import exportar_colunar
+import graficos
+import instrumentacao
+import microdados
+import pnad_etl
+import powerbi_final
+import preparar_dados_powerbi
+import previsoes
+import resumos
+import tipos
+import validacao
+import verificar_dados
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+
+# Modulos deste diretorio entram na versao das etapas que os usam
+DIRETORIO_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+# caminho do .py -> sha256 do fonte (lido uma vez por processo)
+_HASH_FONTES = {}
+
+
+def _modulo_do_projeto(objeto):
+    """Modulo do projeto de onde vem o objeto (modulo, funcao ou classe); None fora dele
+
+    pipeline.py fica de fora: o bytecode das etapas definidas aqui ja entra na versao.
+    """
+    if inspect.ismodule(objeto):
+        modulo = objeto
+    elif inspect.isfunction(objeto) or inspect.isclass(objeto):
+        modulo = sys.modules.get(objeto.__module__)
+    else:
+        return None
+    caminho = getattr(modulo, '__file__', None)
+    if not caminho or os.path.dirname(os.path.abspath(caminho)) != DIRETORIO_SCRIPTS:
+        return None
+    return None if os.path.abspath(caminho) == os.path.abspath(__file__) else modulo
+
+
+def dependencias(funcao):
+    """Modulos do projeto usados pela funcao: os que ela referencia e, transitivamente, os que eles importam"""
+    nomes = set()
+
+    def coletar(codigo):
+        nomes.update(codigo.co_names)
+        for constante in codigo.co_consts:
+            if hasattr(constante, 'co_code'):
+                coletar(constante)
+
+    coletar(funcao.__code__)
+    pendentes = [funcao] + [funcao.__globals__.get(nome) for nome in nomes]
+    pendentes += [celula.cell_contents for celula in funcao.__closure__ or ()]
+    modulos = {}
+    while pendentes:
+        modulo = _modulo_do_projeto(pendentes.pop())
+        if modulo is not None and modulo.__name__ not in modulos:
+            modulos[modulo.__name__] = modulo
+            pendentes.extend(vars(modulo).values())
+    return modulos
+
+
+def hash_fonte(caminho):
+    if caminho not in _HASH_FONTES:
+        with open(caminho, 'rb') as arquivo:
+            _HASH_FONTES[caminho] = hashlib.sha256(arquivo.read()).hexdigest()
+    return _HASH_FONTES[caminho]
+
+
+class Etapa:
+    """Etapa do DAG: funcao(*DataFrames das entradas) -> DataFrame
+
+    `tabela`/`csv` indicam onde a saida deve ser materializada; sem eles a
+    saida existe apenas em memoria durante a execucao. `validacao` e o conjunto
+    de regras (validacao.CONJUNTOS) que a saida precisa passar antes de ser gravada.
+    """
+
+    def __init__(self, nome, funcao, entradas=(), tabela=None, csv=None, csv_encoding='utf-8',
+                 sempre_executar=False, validacao=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = list(entradas)
+        self.tabela = tabela
+        self.csv = csv
+        self.csv_encoding = csv_encoding
+        self.sempre_executar = sempre_executar
+        self.validacao = validacao
+
+    def versao(self):
+        """Muda quando o codigo da funcao ou de um modulo do projeto de que ela depende muda
+
+        Invalida a impressao digital: editar, por exemplo, validacao.py ou
+        tipos.py reexecuta as etapas que os usam sem precisar de --forcar.
+        """
+        resumo = hashlib.sha256()
+
+        def atualizar(codigo):
+            resumo.update(codigo.co_code)
+            for constante in codigo.co_consts:
+                # lambdas e funcoes internas: o repr traz endereco de memoria
+                if hasattr(constante, 'co_code'):
+                    atualizar(constante)
+                else:
+                    resumo.update(repr(constante).encode('utf-8'))
+
+        atualizar(self.funcao.__code__)
+        modulos = dependencias(self.funcao)
+        if self.validacao:
+            # a saida so e gravada depois de passar pelas regras
+            modulos.update(dependencias(validacao.validar))
+        for nome, modulo in sorted(modulos.items()):
+            resumo.update(f"{nome}:{hash_fonte(os.path.abspath(modulo.__file__))}".encode('utf-8'))
+        return resumo.hexdigest()
+
+
+def impressao_digital(df):
+    """Hash do conteudo de um DataFrame (colunas + valores)"""
+    resumo = hashlib.sha256()
+    resumo.update(','.join(map(str, df.columns)).encode('utf-8'))
+    resumo.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return resumo.hexdigest()
+
+
+def ordenar_etapas(etapas):
+    """Ordenacao topologica; falha em caso de dependencia ausente ou ciclo"""
+    por_nome = {etapa.nome: etapa for etapa in etapas}
+    ordem, visitando, visitadas = [], set(), set()
+
+    def visitar(nome):
+        if nome in visitadas:
+            return
+        if nome in visitando:
+            raise ValueError(f"Ciclo no pipeline envolvendo a etapa '{nome}'")
+        if nome not in por_nome:
+            raise ValueError(f"Etapa '{nome}' nao declarada")
+
+        visitando.add(nome)
+        for entrada in por_nome[nome].entradas:
+            visitar(entrada)
+        visitando.discard(nome)
+        visitadas.add(nome)
+        ordem.append(por_nome[nome])
+
+    for etapa in etapas:
+        visitar(etapa.nome)
+    return ordem
+
+
+class Pipeline:
+    """Executa as etapas em ordem topologica passando DataFrames em memoria"""
+
+    def __init__(self, etapas, caminho_banco=CAMINHO_BANCO):
+        self.etapas = ordenar_etapas(etapas)
+        self.por_nome = {etapa.nome: etapa for etapa in self.etapas}
+        self.caminho_banco = caminho_banco
+        self.conn = None
+        self.saidas = {}
+        self.impressoes = {}
+        self.tempos = {}
+        self.memoria = {}
+
+    def _garantir_controle(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS controle_pipeline (
+                etapa TEXT PRIMARY KEY,
+                impressao_entrada TEXT NOT NULL,
+                impressao_saida TEXT NOT NULL,
+                executado_em TEXT NOT NULL,
+                duracao_s REAL NOT NULL
+            )
+        """)
+
+    def _ultima_execucao(self, etapa):
+        return self.conn.execute(
+            "SELECT impressao_entrada, impressao_saida FROM controle_pipeline WHERE etapa = ?",
+            (etapa.nome,)
+        ).fetchone()
+
+    def _registrar(self, etapa, impressao_entrada, impressao_saida, duracao):
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO controle_pipeline (etapa, impressao_entrada, impressao_saida, executado_em, duracao_s)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (etapa) DO UPDATE SET
+                    impressao_entrada = excluded.impressao_entrada,
+                    impressao_saida = excluded.impressao_saida,
+                    executado_em = excluded.executado_em,
+                    duracao_s = excluded.duracao_s
+            """, (etapa.nome, impressao_entrada, impressao_saida,
+                  datetime.now().isoformat(timespec='seconds'), duracao))
+
+    def _impressao_entrada(self, etapa):
+        partes = [etapa.versao()] + [self.impressoes[entrada] for entrada in etapa.entradas]
+        return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()
+
+    def _materializar(self, etapa, df):
+        # visoes (esquema.VISOES) ja refletem a tabela gravada pela etapa de origem
+        if etapa.tabela and etapa.tabela not in esquema.VISOES:
+            with instrumentacao.span('sql_write', tabela=etapa.tabela) as medicao:
+                medicao.linhas_entrada = len(df)
+                if etapa.tabela in esquema.TABELAS:
+                    esquema.carregar_em_massa(self.conn, etapa.tabela, df)
+                else:
+                    df.to_sql(etapa.tabela, self.conn, if_exists='replace', index=False)
+        if etapa.csv:
+            with instrumentacao.span('csv_write') as medicao:
+                medicao.linhas_entrada = len(df)
+                df.to_csv(etapa.csv, index=False, encoding=etapa.csv_encoding)
+                medicao.bytes = os.path.getsize(etapa.csv)
+
+    def _obter_saida(self, nome):
+        """Saida de uma etapa; etapas puladas sao lidas do banco so se alguem precisar"""
+        if nome not in self.saidas:
+            etapa = self.por_nome[nome]
+            if etapa.tabela:
+                with instrumentacao.span('sql_read', tabela=etapa.tabela) as medicao:
+                    self.saidas[nome] = pd.read_sql(f"SELECT * FROM {etapa.tabela}", self.conn)
+                    medicao.linhas_saida = len(self.saidas[nome])
+            else:
+                self.saidas[nome] = self._executar_etapa(etapa)
+        return self.saidas[nome]
+
+    def _executar_etapa(self, etapa):
+        inicio = time.perf_counter()
+        entradas = [self._obter_saida(entrada) for entrada in etapa.entradas]
+        with instrumentacao.etapa(etapa.nome) as medicao:
+            medicao.linhas_entrada = sum(len(entrada) for entrada in entradas if entrada is not None)
+            with instrumentacao.span('transform'):
+                df = etapa.funcao(*entradas)
+            if df is not None:
+                medicao.linhas_saida = len(df)
+                if etapa.validacao:
+                    # ErroValidacao interrompe o pipeline antes de gravar a saida
+                    with instrumentacao.span('validate'):
+                        validacao.exigir_valido(df, etapa.validacao)
+                self._materializar(etapa, df)
+        self.tempos[etapa.nome] = time.perf_counter() - inicio
+        self.memoria[etapa.nome] = (sum(tipos.uso_memoria(entrada) for entrada in entradas), tipos.uso_memoria(df))
+        return df
+
+    def executar(self, forcar=False):
+        """Roda o pipeline; etapas com entradas inalteradas sao puladas"""
+        inicio_total = time.perf_counter()
+        self.conn = esquema.conectar(self.caminho_banco)
+        self._garantir_controle()
+        alterou = False
+        interrompida = None  # etapa em execucao: se falhar, pode ter gravado parte da saida
+
+        try:
+            for etapa in self.etapas:
+                impressao_entrada = self._impressao_entrada(etapa)
+                anterior = self._ultima_execucao(etapa)
+
+                pode_pular = (
+                    not forcar and not etapa.sempre_executar
+                    and anterior is not None and anterior[0] == impressao_entrada
+                )
+                if pode_pular:
+                    self.impressoes[etapa.nome] = anterior[1]
+                    print(f" [{etapa.nome}] entradas inalteradas - etapa pulada")
+                    continue
+
+                print(f" [{etapa.nome}] executando...")
+                interrompida = etapa.nome
+                df = self._executar_etapa(etapa)
+                interrompida = None
+                self.saidas[etapa.nome] = df
+
+                impressao_saida = impressao_digital(df) if df is not None else impressao_entrada
+                self.impressoes[etapa.nome] = impressao_saida
+                self._registrar(etapa, impressao_entrada, impressao_saida, self.tempos[etapa.nome])
+                alterou = alterou or anterior is None or anterior[1] != impressao_saida
+                print(f" [{etapa.nome}] concluida em {self.tempos[etapa.nome]:.2f} s")
+        finally:
+            # tambem quando uma etapa posterior falha: o que ja foi gravado (dashboard_pnad,
+            # resumos) fica no banco, e os consumidores (servico_pnad) descartam o cache
+            if alterou or interrompida:
+                esquema.marcar_versao(self.caminho_banco)
+            self.conn.close()
+            self.conn = None
+            instrumentacao.exportar()
+
+        print(f"\n Tempo total do pipeline: {time.perf_counter() - inicio_total:.2f} s")
+        print(f"  {'etapa':<12} {'tempo':>10} {'entrada':>12} {'saida':>12}")
+        for nome, tempo in self.tempos.items():
+            entrada, saida = self.memoria[nome]
+            print(f"  {nome:<12} {tempo:8.3f} s {tipos.formatar_bytes(entrada):>12} {tipos.formatar_bytes(saida):>12}")
+        if instrumentacao.pico_rss_mb() is not None:
+            print(f"  Pico de RSS do processo: {instrumentacao.pico_rss_mb():.0f} MB")
+        return self.saidas
+
+
+def definir_etapas(caminho_banco=CAMINHO_BANCO, incremental=True, buscar=True, processos=configuracao.PROCESSOS):
+    """DAG equivalente a pnad_etl -> preparar -> corrigir/final -> resumir/verificar/prever/alertar/exportar/graficos
+
+    Com buscar=False, `extrair` nao consulta o SIDRA (reprocessa o que ja esta no banco).
+    """
+
+    def extrair():
+        if buscar:
+            pnad_etl.buscar_mais_dados_pnad(incremental=incremental, caminho_banco=caminho_banco)
+            # UFs/regioes metropolitanas so quando configuradas (pnad.toml ou PNAD_TERRITORIOS)
+            if configuracao.TERRITORIOS:
+                pnad_etl.buscar_dados_territoriais(incremental=incremental, caminho_banco=caminho_banco)
+        # trimestres de microdados colocados em data/microdados (so arquivos novos ou alterados)
+        microdados.ingerir_microdados(caminho_banco, processos=processos or 1)
+        conn = esquema.conectar(caminho_banco)
+        try:
+            return pd.read_sql("SELECT * FROM pnad_historico", conn)
+        finally:
+            conn.close()
+
+    def resumir(df):
+        conn = esquema.conectar(caminho_banco)
+        try:
+            resumos.atualizar_resumos(conn, df)
+        finally:
+            conn.close()
+        return None
+
+    def prever(df):
+        conn = esquema.conectar(caminho_banco)
+        try:
+            previsoes.atualizar_previsoes(conn, df, processos=processos)
+        finally:
+            conn.close()
+        return None
+
+    def alertar(df):
+        conn = esquema.conectar(caminho_banco)
+        try:
+            alertas.atualizar_alertas(conn, df)
+        finally:
+            conn.close()
+        return None
+
+    def verificar(_):
+        # depende de 'resumir' so pela ordem: le os resumos ja materializados
+        conn = esquema.conectar(caminho_banco)
+        try:
+            verificar_dados.resumir_dashboard(conn)
+        finally:
+            conn.close()
+        return None
+
+    return [
+        Etapa('extrair', extrair, sempre_executar=True, validacao='historico'),
+        Etapa('preparar', preparar_dados_powerbi.transformar_para_powerbi, ['extrair'],
+              tabela='powerbi_otimizado', csv=preparar_dados_powerbi.CAMINHO_CSV, validacao='dashboard'),
+        Etapa('corrigir', corrigir_trimestres.filtrar_trimestres_padrao, ['preparar'],
+              tabela='dashboard_pnad_corrigido', validacao='corrigido'),
+        Etapa('final', powerbi_final.transformar_dataset_final, ['preparar'],
+              tabela=powerbi_final.TABELA_DASHBOARD, csv=powerbi_final.CAMINHO_CSV,
+              csv_encoding='utf-8-sig', validacao='dashboard'),
+        Etapa('resumir', resumir, ['final']),
+        Etapa('verificar', verificar, ['resumir']),
+        Etapa('prever', prever, ['final']),
+        Etapa('alertar', alertar, ['final']),
+        Etapa('exportar', exportar_colunar.exportar_colunar, ['final']),
+        Etapa('graficos', graficos.renderizar_dashboard, ['final'])
+    ]
+
+
+def rodar(forcar=False, completo=False, buscar=True, perfil=False, caminho_banco=CAMINHO_BANCO):
+    """Executa o pipeline; devolve o codigo de saida (1 se uma validacao falhou)"""
+    print("=" * 50)
+    print("PIPELINE PNAD")
+    print("=" * 50)
+
+    if perfil:
+        instrumentacao.ativar_perfil(['cprofile', 'tracemalloc'])
+
+    try:
+        etapas = definir_etapas(caminho_banco, incremental=not completo, buscar=buscar)
+        Pipeline(etapas, caminho_banco).executar(forcar=forcar)
+    except validacao.ErroValidacao as erro:
+        print(f"\n {erro}")
+        print(f" Relatorio completo em {validacao.DIRETORIO_RELATORIOS}/{erro.relatorio['conjunto']}.json")
+        return 1
+    return 0
+
+
+def main():
+    sys.exit(rodar(forcar='--forcar' in sys.argv, completo='--completo' in sys.argv,
+                   perfil='--perfil' in sys.argv))
+
+
+if __name__ == "__main__":
+    main()
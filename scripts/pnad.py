@@ -0,0 +1,181 @@
+# pnad.py - PONTO DE ENTRADA UNICO (run, fetch, build, report, check)
+"""Uso: python pnad.py <comando> [opcoes]
+
+  run     busca o SIDRA e executa o pipeline      [--forcar] [--completo] [--perfil]
+  fetch   so busca o SIDRA e grava pnad_historico [--completo] [--territorial] [--streaming]
+  build   executa o pipeline sem buscar o SIDRA   [--forcar] [--perfil]
+  report  gera o relatorio PDF
+  check   verifica o banco sem alterar nada       [--validar]
+
+Opcoes comuns (sobrepoem pnad.toml e as variaveis PNAD_*):
+  --banco=CAMINHO --dados=DIRETORIO --config=pnad.toml
+  --territorios='n3=35,33;n7=all' --tabelas=4099/4099,6381/4099 --processos=N
+  --tempo  mostra o tempo de importacao e de execucao do comando
+"""
+import importlib
+import os
+import sqlite3
+import sys
+import time
+from urllib.parse import quote
+
+# Cada comando importa so os modulos que usa (pandas, matplotlib, fpdf...)
+INICIO = time.perf_counter()
+
+OPCOES_CONFIGURACAO = ['banco', 'dados', 'config', 'territorios', 'tabelas', 'processos']
+OPCOES_CAMINHO = {'banco', 'dados', 'config'}
+
+# Tabelas cujo ultimo periodo o `check` compara
+TABELAS_VERIFICADAS = ['pnad_historico', 'dashboard_pnad']
+
+tempo_importacao = 0.0
+
+
+def importar(nome):
+    """importlib.import_module contabilizando o tempo (--tempo)"""
+    global tempo_importacao
+    inicio = time.perf_counter()
+    modulo = importlib.import_module(nome)
+    tempo_importacao += time.perf_counter() - inicio
+    return modulo
+
+
+def aplicar_opcoes(opcoes):
+    """Opcoes de configuracao da linha de comando -> variaveis PNAD_* (lidas por configuracao.py)"""
+    for nome in OPCOES_CONFIGURACAO:
+        if opcoes.get(nome):
+            valor = os.path.abspath(opcoes[nome]) if nome in OPCOES_CAMINHO else opcoes[nome]
+            os.environ[f"PNAD_{nome.upper()}"] = valor
+
+
+def comando_run(opcoes):
+    pipeline = importar('pipeline')
+    return pipeline.rodar(forcar='forcar' in opcoes, completo='completo' in opcoes, perfil='perfil' in opcoes)
+
+
+def comando_build(opcoes):
+    pipeline = importar('pipeline')
+    return pipeline.rodar(forcar='forcar' in opcoes, buscar=False, perfil='perfil' in opcoes)
+
+
+def comando_fetch(opcoes):
+    configuracao = importar('configuracao')
+    pnad_etl = importar('pnad_etl')
+    instrumentacao = importar('instrumentacao')
+    incremental = 'completo' not in opcoes
+    try:
+        with instrumentacao.etapa('extrair'):
+            pnad_etl.buscar_mais_dados_pnad(incremental=incremental)
+            if 'territorial' in opcoes or configuracao.TERRITORIOS:
+                pnad_etl.buscar_dados_territoriais(incremental=incremental, streaming='streaming' in opcoes)
+    finally:
+        instrumentacao.exportar()
+    return 0
+
+
+def comando_report(opcoes):
+    configuracao = importar('configuracao')
+    gerar_relatorio_pdf = importar('gerar_relatorio_pdf')
+    arquivo_pdf = gerar_relatorio_pdf.criar_relatorio_pdf(processos=configuracao.PROCESSOS)
+    print(f"Relatório pronto! Arquivo: {arquivo_pdf}")
+    return 0
+
+
+def verificar_banco(caminho_banco):
+    """Verificacoes baratas so com sqlite3 (somente leitura); devolve a lista de problemas"""
+    if not os.path.exists(caminho_banco):
+        return [f"banco inexistente: {caminho_banco}"]
+
+    problemas = []
+    conn = sqlite3.connect(f"file:{quote(caminho_banco)}?mode=ro", uri=True)
+    try:
+        integridade = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if integridade != 'ok':
+            problemas.append(f"quick_check: {integridade}")
+        versao = conn.execute('PRAGMA user_version').fetchone()[0]
+        print(f" Esquema: versao {versao}, integridade {integridade}")
+
+        existentes = {nome for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        ultimos = {}
+        for tabela in TABELAS_VERIFICADAS:
+            if tabela not in existentes:
+                problemas.append(f"tabela ausente: {tabela}")
+                continue
+            try:
+                linhas = conn.execute(f"SELECT tabela, COUNT(*), MAX(D3C) FROM {tabela} GROUP BY tabela").fetchall()
+            except sqlite3.OperationalError as erro:
+                # banco anterior as migracoes do esquema.py: qualquer comando que grave o migra
+                problemas.append(f"{tabela}: {erro} (esquema versao {versao}; rode build para migrar)")
+                continue
+            if not linhas:
+                problemas.append(f"tabela vazia: {tabela}")
+            for tabela_sidra, total, ultimo in linhas:
+                ultimos[tabela, tabela_sidra] = ultimo
+                print(f" {tabela:<16} {tabela_sidra:>6} {total:>10,} linhas, ultimo periodo {ultimo}")
+
+        # dashboard atras do historico: o pipeline ainda nao processou a ultima carga
+        for (tabela, tabela_sidra), ultimo in ultimos.items():
+            processado = ultimos.get(('dashboard_pnad', tabela_sidra))
+            if tabela == 'pnad_historico' and processado and processado < ultimo:
+                print(f" Aviso: dashboard_pnad {tabela_sidra} em {processado}, historico em {ultimo} (rode build)")
+
+        if 'controle_extracao' in existentes:
+            for tabela_sidra, variavel, ultimo, atualizado_em in conn.execute(
+                    "SELECT tabela, variavel, ultimo_periodo, atualizado_em FROM controle_extracao ORDER BY 1, 2"):
+                print(f" Extracao {tabela_sidra}/{variavel}: ate {ultimo} (em {atualizado_em})")
+        if 'alertas' in existentes:
+            # ultimo periodo de cada tabela SIDRA (D3C e AAAAMM ou AAAAQQ conforme a tabela)
+            altos = conn.execute(
+                "SELECT COUNT(*) FROM alertas a WHERE severidade = 'alta' "
+                "AND D3C = (SELECT MAX(D3C) FROM alertas WHERE tabela = a.tabela)"
+            ).fetchone()[0]
+            print(f" Alertas de severidade alta no ultimo periodo: {altos}")
+    except sqlite3.DatabaseError as erro:
+        problemas.append(f"erro ao ler o banco: {erro}")
+    finally:
+        conn.close()
+    return problemas
+
+
+def comando_check(opcoes):
+    configuracao = importar('configuracao')
+    print(f" Banco: {configuracao.CAMINHO_BANCO}")
+    print(f" Territorios: {configuracao.TERRITORIOS or 'padrao'}; tabelas: {configuracao.TABELAS or 'padrao'}; "
+          f"processos: {configuracao.PROCESSOS or 'automatico'}")
+    problemas = verificar_banco(configuracao.CAMINHO_BANCO)
+    for problema in problemas:
+        print(f" ERRO: {problema}")
+    valido = not problemas
+    if valido and 'validar' in opcoes:
+        # regras de validacao.py sobre o dashboard gravado (carrega pandas), tambem somente leitura
+        valido = importar('verificar_dados').verificar_dashboard(somente_leitura=True)
+    return 0 if valido else 1
+
+
+COMANDOS = {
+    'run': comando_run,
+    'fetch': comando_fetch,
+    'build': comando_build,
+    'report': comando_report,
+    'check': comando_check
+}
+
+
+def main(argumentos):
+    opcoes = dict(argumento[2:].partition('=')[::2] for argumento in argumentos if argumento.startswith('--'))
+    posicionais = [argumento for argumento in argumentos if not argumento.startswith('--')]
+    if not posicionais or posicionais[0] not in COMANDOS or 'help' in opcoes:
+        print(__doc__)
+        return 0 if 'help' in opcoes else 2
+
+    aplicar_opcoes(opcoes)
+    inicio = time.perf_counter()
+    codigo = COMANDOS[posicionais[0]](opcoes)
+    if 'tempo' in opcoes:
+        print(f"\n Partida: {inicio - INICIO + tempo_importacao:.3f} s (importacoes {tempo_importacao:.3f} s); "
+              f"comando {time.perf_counter() - inicio - tempo_importacao:.3f} s")
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
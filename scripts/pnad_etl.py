@@ -1,67 +1,236 @@
 # analise_pnad.py
+import os
 import pandas as pd
-import sqlite3
-import matplotlib.pyplot as plt
-import requests
+from datetime import datetime
+from extrator_sidra import URL_SIDRA, PERIODO_INICIAL, UFS, ConsultaSIDRA, ExtratorSIDRA, gerar_consultas
+from cache_sidra import CacheSIDRA
+import configuracao
+import esquema
+import instrumentacao
+import resumos
+import revisoes
+from periodos import TABELAS_TRIMESTRAIS, interpretar_periodos
 
-def buscar_mais_dados_pnad():
-    """Busca dados da PNAD para todos os períodos"""
+TABELA_PNAD = '6381'
+VARIAVEL_DESOCUPACAO = '4099'
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+
+# Tabela trimestral com recorte por UF (n3) e regiao metropolitana (n7)
+TABELA_PNAD_TRIMESTRAL = '4099'
+
+# Periodos ja gravados que o modo incremental pede de novo: o IBGE revisa
+# trimestres passados (reponderacao, correcoes) e revisoes.py guarda os deltas
+JANELA_REVISAO = 8
+
+def inicio_incremental(ultimo_periodo, tabela=TABELA_PNAD, janela=JANELA_REVISAO):
+    """Primeiro D3C a pedir: os `janela` ultimos periodos gravados entram de novo
+
+    D3C e AAAAQQ nas TABELAS_TRIMESTRAIS e AAAAMM nas demais.
+    """
+    por_ano = 4 if tabela in TABELAS_TRIMESTRAIS else 12
+    indice = int(ultimo_periodo[:4]) * por_ano + int(ultimo_periodo[4:]) - janela
+    return f"{indice // por_ano}{indice % por_ano + 1:02d}"
+
+def destino_carga(caminho_banco, tabela='pnad_historico'):
+    """Chave do destino no cache: o mesmo payload carregado em outro banco nao conta como carregado"""
+    return f"{os.path.abspath(caminho_banco)}:{tabela}"
+
+def ler_ultimo_periodo(conn, tabela, variavel, nivel):
+    """Le o D3C mais recente ja gravado em pnad_historico (consulta indexada)"""
+    resultado = conn.execute(
+        "SELECT MAX(D3C) FROM pnad_historico WHERE tabela = ? AND D2C = ? AND NC = ?",
+        (tabela, variavel, nivel.lstrip('n'))
+    ).fetchone()
+    return resultado[0]
+
+def registrar_marca_d_agua(conn, tabela, variavel, periodo):
+    """Registra o ultimo periodo extraido com sucesso para a tabela/variavel"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS controle_extracao (
+            tabela TEXT NOT NULL,
+            variavel TEXT NOT NULL,
+            ultimo_periodo TEXT NOT NULL,
+            atualizado_em TEXT NOT NULL,
+            PRIMARY KEY (tabela, variavel)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO controle_extracao (tabela, variavel, ultimo_periodo, atualizado_em)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (tabela, variavel) DO UPDATE SET
+            ultimo_periodo = excluded.ultimo_periodo,
+            atualizado_em = excluded.atualizado_em
+    """, (tabela, variavel, periodo, datetime.now().isoformat(timespec='seconds')))
+
+def gravar_novos_periodos(conn, df, origem=None):
+    """Upsert apenas das linhas recebidas (chave: tabela, D2C, D1C, D3C)
+
+    Valores que mudaram em relacao ao gravado (revisoes do IBGE) ficam
+    registrados como deltas de uma nova safra (revisoes.py).
+    """
+    with instrumentacao.span('sql_write', tabela='pnad_historico') as medicao:
+        medicao.linhas_entrada = len(df)
+        medicao.linhas_saida = revisoes.gravar_com_revisoes(conn, df, origem)
+
+def buscar_mais_dados_pnad(incremental=True, caminho_banco=CAMINHO_BANCO, url_base=URL_SIDRA,
+                           usar_cache=True):
+    """Busca dados da PNAD (periodos novos e a janela de revisao no modo incremental)
+
+    Com cache, um payload identico ao ultimo carregado devolve DataFrame vazio.
+    """
     print("Buscando dados historicos da PNAD...")
     
-    # URL para varios periodos
-    url = "https://apisidra.ibge.gov.br/values/t/6381/n1/all/v/4099/p/all"
+    conn = esquema.conectar(caminho_banco)
     
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            dados = response.json()
-            print(f"Dados recebidos: {len(dados)} registros")
-            
-            df = pd.DataFrame(dados[1:], columns=dados[0])
-            
-            # Salvar no banco
-            conn = sqlite3.connect('ibge_analise.db')
-            df.to_sql('pnad_historico', conn, if_exists='replace', index=False)
-            conn.close()
-            
-            print(f"Salvo: {df.shape[0]} registros historicos")
-            return df
+        ultimo_periodo = ler_ultimo_periodo(conn, TABELA_PNAD, VARIAVEL_DESOCUPACAO, 'n1') if incremental else None
+        
+        # Sem historico gravado: carga completa
+        if ultimo_periodo:
+            inicio = inicio_incremental(ultimo_periodo)
+            periodos = f"{inicio}-{datetime.now().year}12"
+            print(f"Modo incremental: periodos a partir de {inicio} (ultimos {JANELA_REVISAO} reconsultados)")
         else:
-            print(f"Erro na API: {response.status_code}")
-            return None
+            periodos = 'all'
+        
+        # carga completa ou tabela vazia: nunca pular payload "ja carregado"
+        extrator = ExtratorSIDRA(url_base, cache=CacheSIDRA() if usar_cache else None,
+                                 pular_inalterados=bool(ultimo_periodo), destino=destino_carga(caminho_banco))
+        consulta = ConsultaSIDRA(TABELA_PNAD, VARIAVEL_DESOCUPACAO, 'n1', 'all', periodos)
+        df = extrator.buscar_consulta(consulta)
+        extrator.fechar()
+        
+        if extrator.inalteradas:
+            print("Conteudo inalterado desde a ultima carga")
+            return df
+        print(f"Dados recebidos: {len(df)} registros")
+        
+        # Salvar no banco
+        if not df.empty:
+            gravar_novos_periodos(conn, df, origem=f"{TABELA_PNAD}/{VARIAVEL_DESOCUPACAO} {periodos}")
+        
+        if not df.empty:
+            with conn:
+                registrar_marca_d_agua(conn, TABELA_PNAD, VARIAVEL_DESOCUPACAO, df['D3C'].max())
+        extrator.confirmar_carga()
+        
+        print(f"Salvo: {df.shape[0]} registros historicos")
+        return df
             
     except Exception as e:
+        # a falha segue para quem chamou (pipeline/metricas); nao continuar com dados velhos
         print(f"Erro: {e}")
-        return None
+        raise
+    finally:
+        conn.close()
 
-def analisar_desemprego():
-    """Analisa os dados de desemprego"""
-    print("\nAnalisando dados de desemprego...")
+def buscar_dados_territoriais(niveis=None, tabelas_variaveis=None, incremental=True,
+                              caminho_banco=CAMINHO_BANCO, url_base=URL_SIDRA, max_simultaneas=8,
+                              streaming=False, usar_cache=True):
+    """Busca varias tabelas/variaveis por UF e regiao metropolitana em paralelo
+
+    Com streaming=True as respostas vao direto para o SQLite em lotes e a funcao
+    devolve apenas o numero de linhas recebidas (revisoes gravadas como na carga em bloco).
+    """
+    print("Buscando dados territoriais da PNAD...")
+    
+    niveis = niveis or configuracao.TERRITORIOS or {'n3': UFS, 'n7': ['all']}
+    tabelas_variaveis = tabelas_variaveis or configuracao.TABELAS or [(TABELA_PNAD_TRIMESTRAL, VARIAVEL_DESOCUPACAO)]
     
-    conn = sqlite3.connect('ibge_analise.db')
+    conn = esquema.conectar(caminho_banco, check_same_thread=not streaming)
+    extrator = ExtratorSIDRA(url_base, max_simultaneas=max_simultaneas,
+                             cache=CacheSIDRA() if usar_cache else None, destino=destino_carga(caminho_banco))
     
     try:
-        # Ler dados
-        df = pd.read_sql("SELECT * FROM pnad_historico", conn)
+        # Cada nivel recomeca JANELA_REVISAO periodos antes do ultimo ja gravado
+        consultas = []
+        sem_historico = False
+        for tabela, variavel in tabelas_variaveis:
+            for nivel, territorios in niveis.items():
+                ultimo_periodo = ler_ultimo_periodo(conn, tabela, variavel, nivel) if incremental else None
+                sem_historico |= ultimo_periodo is None
+                inicio = inicio_incremental(ultimo_periodo, tabela) if ultimo_periodo else PERIODO_INICIAL
+                consultas += gerar_consultas([(tabela, variavel)], {nivel: territorios}, inicio)
+        # carga completa ou algum nivel ainda vazio: nunca pular payload "ja carregado"
+        extrator.pular_inalterados = not sem_historico
+        
+        print(f"Consultas a executar: {len(consultas)}")
+        
+        if streaming:
+            total = extrator.extrair_para_banco(conn, consultas, origem='territorial')
+            extrator.imprimir_relatorio()
+            with conn:
+                for tabela, variavel in tabelas_variaveis:
+                    ultimo = conn.execute(
+                        "SELECT MAX(D3C) FROM pnad_historico WHERE tabela = ? AND D2C = ?",
+                        (tabela, variavel)
+                    ).fetchone()[0]
+                    if ultimo:
+                        registrar_marca_d_agua(conn, tabela, variavel, ultimo)
+            extrator.confirmar_carga()
+            print(f"Salvo: {total} registros territoriais (streaming)")
+            return total
+        
+        df = extrator.extrair(consultas)
+        extrator.imprimir_relatorio()
         
         if df.empty:
+            extrator.confirmar_carga()
+            print("Nenhum periodo novo")
+            return df
+        
+        gravar_novos_periodos(conn, df, origem='territorial')
+        with conn:
+            for (tabela, variavel), grupo in df.groupby(['tabela', 'D2C']):
+                registrar_marca_d_agua(conn, tabela, variavel, grupo['D3C'].max())
+        extrator.confirmar_carga()
+        
+        print(f"Salvo: {df.shape[0]} registros territoriais")
+        return df
+    
+    except Exception as e:
+        print(f"Erro: {e}")
+        raise
+    finally:
+        extrator.fechar()
+        conn.close()
+
+def analisar_desemprego(caminho_banco=CAMINHO_BANCO):
+    """Analisa os dados de desemprego (serie Brasil) a partir dos resumos materializados"""
+    print("\nAnalisando dados de desemprego...")
+    
+    conn = esquema.conectar(caminho_banco)
+    serie = (TABELA_PNAD, VARIAVEL_DESOCUPACAO, '1')
+    
+    try:
+        resumo = resumos.ler_resumo(conn, 'resumo_serie', "WHERE tabela = ? AND D2C = ? AND D1C = ?", serie)
+        if resumo.empty:
+            # resumos ainda nao materializados: agrega no SQLite pela chave primaria
+            resumo = pd.read_sql("""
+                SELECT COUNT(*) AS linhas, SUM(V) AS soma, COUNT(V) AS n, MIN(V) AS minimo, MAX(V) AS maximo
+                FROM pnad_historico WHERE tabela = ? AND D2C = ? AND D1C = ?
+            """, conn, params=serie)
+        
+        resumo = resumo.iloc[0]
+        if not resumo['linhas']:
             print("Nenhum dado para analisar")
             return
         
-        # Preparar dados para analise
-        df['V'] = pd.to_numeric(df['V'], errors='coerce')  # Converte valor para numero
-        df['periodo'] = df['D3N']  # Periodo
-        
         # Analise basica
-        print(f"Periodos analisados: {df['periodo'].nunique()}")
-        print(f"Taxa media de desocupacao: {df['V'].mean():.2f}%")
-        print(f"Maior taxa: {df['V'].max():.2f}%")
-        print(f"Menor taxa: {df['V'].min():.2f}%")
+        print(f"Periodos analisados: {resumo['linhas']}")
+        print(f"Taxa media de desocupacao: {resumo['soma'] / resumo['n']:.2f}%")
+        print(f"Maior taxa: {resumo['maximo']:.2f}%")
+        print(f"Menor taxa: {resumo['minimo']:.2f}%")
+        
+        # Serie Brasil (pela chave primaria, sem ler o historico das UFs)
+        df = pd.read_sql("""
+            SELECT D3C, D3N AS periodo, V FROM pnad_historico
+            WHERE tabela = ? AND D2C = ? AND D1C = ?
+            ORDER BY D3C
+        """, conn, params=serie)
         
-        # Ultimos 5 periodos
         print("\nUltimos 5 periodos:")
-        ultimos = df[['periodo', 'V']].tail(5)
-        print(ultimos)
+        print(df[['periodo', 'V']].tail(5))
         
         return df
         
@@ -71,51 +240,49 @@ def analisar_desemprego():
     finally:
         conn.close()
 
-def criar_visualizacao(df):
-    """Cria grafico simples"""
+def criar_visualizacao(df, caminho='evolucao_desemprego.png'):
+    """Grafico da serie completa (backend Agg: nao abre janela nem bloqueia)"""
     if df is None or df.empty:
         print("Nao ha dados para visualizacao")
         return
     
+    # matplotlib so e carregado aqui: extrair dados nao paga a importacao
+    import graficos
+
     try:
-        # Preparar dados para grafico
-        df_plot = df.tail(8).copy()  # Ultimos 8 periodos
-        df_plot = df_plot.sort_values('periodo')
-        
-        # Criar grafico
-        plt.figure(figsize=(10, 6))
-        plt.plot(df_plot['periodo'], df_plot['V'], marker='o', linewidth=2)
-        plt.title('Evolucao da Taxa de Desocupacao - Brasil')
-        plt.xlabel('Periodo')
-        plt.ylabel('Taxa de Desocupacao (%)')
-        plt.xticks(rotation=45)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        
-        # Salvar grafico
-        plt.savefig('evolucao_desemprego.png', dpi=300)
-        print("Grafico salvo como 'evolucao_desemprego.png'")
-        
-        # Mostrar grafico
-        plt.show()
+        periodos = interpretar_periodos(df['D3C'], [TABELA_PNAD] * len(df))
+        graficos.renderizar_serie(
+            periodos['data_referencia'], df['V'],
+            'Evolucao da Taxa de Desocupacao - Brasil', caminho
+        )
+        print(f"Grafico salvo como '{caminho}'")
         
     except Exception as e:
         print(f"Erro ao criar visualizacao: {e}")
+        raise
 
 def main():
     print("=" * 50)
     print("ANALISE PNAD - TAXA DE DESOCUPACAO")
     print("=" * 50)
     
-    # 1. Buscar mais dados
-    df = buscar_mais_dados_pnad()
-    
-    if df is not None:
-        # 2. Analisar dados
-        df_analise = analisar_desemprego()
+    try:
+        # 1. Buscar mais dados
+        with instrumentacao.etapa('extrair') as medicao:
+            df = buscar_mais_dados_pnad()
+            medicao.linhas_saida = len(df)
         
-        # 3. Criar visualizacao
-        criar_visualizacao(df_analise)
+        # Sem dados novos (ou payload identico ao ja carregado) nao ha o que reprocessar
+        if not df.empty:
+            # 2. Analisar dados
+            with instrumentacao.etapa('analisar'):
+                df_analise = analisar_desemprego()
+            
+            # 3. Criar visualizacao
+            with instrumentacao.etapa('visualizar'):
+                criar_visualizacao(df_analise)
+    finally:
+        instrumentacao.exportar()
     
     print("\n" + "=" * 50)
     print("ANALISE CONCLUIDA")
@@ -1,82 +1,85 @@
 # powerbi_final.py - VERSÃO ATUALIZADA COM SQLITE
 import pandas as pd
-import sqlite3
-import numpy as np
+import configuracao
+import esquema
+import instrumentacao
+import metricas
+import tipos
 import os
+from periodos import adicionar_colunas_periodo
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+CAMINHO_CSV = configuracao.caminho_dados('pnad_powerbi_pronto.csv')
+TABELA_DASHBOARD = "dashboard_pnad"
+
+def transformar_dataset_final(df):
+    """Calcula data de referencia, metricas e classificacoes (sem acesso ao banco)"""
+    # 1. Criar data completa para eixo temporal (fim do trimestre, pelo codigo D3C)
+    #    adicionar_colunas_periodo devolve um novo DataFrame: sem copia defensiva
+    df_final = adicionar_colunas_periodo(tipos.aplicar_tipos(df))
+    
+    # 2. Metricas por serie (territorio x indicador): desvio da media historica,
+    #    status, nivel, media movel, variacao anual e desvio sazonal
+    df_final = metricas.adicionar_metricas(
+        df_final, [nome for nome in metricas.METRICAS if nome != 'variacao_periodo']
+    )
+    
+    # 3. Selecionar colunas finais
+    colunas_finais = [
+        'tabela', 'D2C', 'D1C', 'D3C', 'data_referencia', 'periodo', 'ano', 'trimestre',
+        'taxa_desocupacao', 'variacao_periodo', 'vs_media_historica',
+        'status', 'nivel_desocupacao', 'media_movel_4p', 'localidade',
+        'variacao_anual', 'desvio_sazonal'
+    ]
+    
+    return tipos.aplicar_tipos(df_final[colunas_finais])
 
 def criar_dataset_powerbi():
     print("Criando dataset otimizado para Power BI...")
     
     # Caminho correto para o banco (na pasta data)
-    caminho_banco = "../data/ibge_analise.db"
+    caminho_banco = CAMINHO_BANCO
     
     # Verifica se o banco existe
     if not os.path.exists(caminho_banco):
         print("Erro: Banco de dados nao encontrado em:", caminho_banco)
         return None
     
-    conn = sqlite3.connect(caminho_banco)
+    conn = esquema.conectar(caminho_banco)
     
     try:
-        # Tenta ler da tabela powerbi_otimizado
-        df = pd.read_sql("SELECT * FROM powerbi_otimizado", conn)
-        print("Lendo dados da tabela powerbi_otimizado...")
-        
-        if df.empty:
-            print("Nenhum dado encontrado")
-            return None
-        
-        # TRATAMENTO AVANCADO PARA POWER BI
-        df_final = df.copy()
-        
-        # 1. Criar data completa para eixo temporal
-        df_final['data_referencia'] = pd.to_datetime(
-            df_final['periodo'].str[-4:] + '-04-01',
-            errors='coerce'
-        )
-        
-        # 2. Calcular metricas avançadas
-        media_historica = df_final['taxa_desocupacao'].mean()
-        df_final['vs_media_historica'] = df_final['taxa_desocupacao'] - media_historica
-        df_final['status'] = df_final['vs_media_historica'].apply(
-            lambda x: 'Acima da Media' if x > 0 else 'Abaixo da Media'
-        )
-        
-        # 3. Classificar por nivel de desocupacao
-        condicoes = [
-            df_final['taxa_desocupacao'] <= 7,
-            (df_final['taxa_desocupacao'] > 7) & (df_final['taxa_desocupacao'] <= 10),
-            df_final['taxa_desocupacao'] > 10
-        ]
-        categorias = ['Baixa', 'Moderada', 'Alta']
-        df_final['nivel_desocupacao'] = np.select(condicoes, categorias, default='Moderada')
-        
-        # 4. Ordenar por data
-        df_final = df_final.sort_values('data_referencia')
-        
-        # 5. Calcular media movel (suaviza a linha)
-        df_final['media_movel_4p'] = df_final['taxa_desocupacao'].rolling(window=4, min_periods=1).mean()
-        
-        # 6. Selecionar colunas finais
-        colunas_finais = [
-            'data_referencia', 'periodo', 'ano', 'trimestre',
-            'taxa_desocupacao', 'variacao_periodo', 'vs_media_historica',
-            'status', 'nivel_desocupacao', 'media_movel_4p', 'localidade'
-        ]
-        
-        df_final = df_final[colunas_finais]
-        
-        # ========== SALVAMENTO DUPLO ==========
-        
-        # 1. SALVAR COMO CSV (para Power BI)
-        caminho_csv = "../data/pnad_powerbi_pronto.csv"
-        df_final.to_csv(caminho_csv, index=False, encoding='utf-8-sig')
-        print(" CSV criado: pnad_powerbi_pronto.csv")
-        
-        # 2. SALVAR NO SQLITE (tabela específica)
-        nome_tabela_sql = "dashboard_pnad"
-        df_final.to_sql(nome_tabela_sql, conn, if_exists='replace', index=False)
-        print(f" Tabela SQLite criada: {nome_tabela_sql}")
+        with instrumentacao.etapa('final') as medicao:
+            # Tenta ler da tabela powerbi_otimizado
+            with instrumentacao.span('sql_read', tabela='powerbi_otimizado') as leitura:
+                df = pd.read_sql("SELECT * FROM powerbi_otimizado", conn)
+                leitura.linhas_saida = medicao.linhas_entrada = len(df)
+            print("Lendo dados da tabela powerbi_otimizado...")
+            
+            if df.empty:
+                print("Nenhum dado encontrado")
+                return None
+            
+            # TRATAMENTO AVANCADO PARA POWER BI
+            with instrumentacao.span('transform'):
+                df_final = transformar_dataset_final(df)
+            medicao.linhas_saida = len(df_final)
+            tipos.imprimir_memoria('final', tipos.uso_memoria(df), tipos.uso_memoria(df_final))
+            
+            # ========== SALVAMENTO DUPLO ==========
+            
+            # 1. SALVAR COMO CSV (para Power BI)
+            caminho_csv = CAMINHO_CSV
+            with instrumentacao.span('csv_write') as gravacao:
+                df_final.to_csv(caminho_csv, index=False, encoding='utf-8-sig')
+                gravacao.linhas_entrada = len(df_final)
+                gravacao.bytes = os.path.getsize(caminho_csv)
+            print(" CSV criado: pnad_powerbi_pronto.csv")
+            
+            # 2. SALVAR NO SQLITE (tabela específica)
+            nome_tabela_sql = TABELA_DASHBOARD
+            with instrumentacao.span('sql_write', tabela=nome_tabela_sql) as gravacao:
+                gravacao.linhas_entrada = esquema.carregar_em_massa(conn, nome_tabela_sql, df_final)
+            print(f" Tabela SQLite criada: {nome_tabela_sql}")
         
         # 3. VERIFICAR TABELAS EXISTENTES
         cursor = conn.cursor()
@@ -101,9 +104,10 @@ def criar_dataset_powerbi():
         
     except Exception as e:
         print(f" Erro: {e}")
-        return None
+        raise
     finally:
         conn.close()
+        instrumentacao.exportar()
 
 if __name__ == "__main__":
     criar_dataset_powerbi()
\ No newline at end of file
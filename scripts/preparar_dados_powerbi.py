@@ -1,53 +1,72 @@
 # preparar_dados_powerbi.py - SEM EMOJIS
 import pandas as pd
-import sqlite3
+import configuracao
+import esquema
+import instrumentacao
+import metricas
+import tipos
+from periodos import adicionar_colunas_periodo
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+CAMINHO_CSV = configuracao.caminho_dados('dados_powerbi_otimizado.csv')
+
+def transformar_para_powerbi(df):
+    """Renomeia, tipa e calcula a variacao periodica (sem acesso ao banco)"""
+    # 1. Tipos compactos ja na entrada (categorias, float32); sem copia defensiva
+    df_powerbi = tipos.aplicar_tipos(df)
+    
+    # 2. Renomear colunas para PT-BR
+    mapeamento_colunas = {
+        'V': 'taxa_desocupacao',
+        'D1N': 'localidade', 
+        'D2N': 'indicador',
+        'D3N': 'periodo',
+        'MC': 'unidade_medida',
+        'MN': 'unidade'
+    }
+    df_powerbi = df_powerbi.rename(columns=mapeamento_colunas)
+    
+    # 3. Ano, trimestre e data de fim do trimestre a partir do codigo D3C
+    # 4. Ordenar cronologicamente (e nao pelo texto do periodo)
+    df_powerbi = adicionar_colunas_periodo(df_powerbi)
+    
+    # 5. Calcular variacao periodica (dentro de cada serie territorio x indicador)
+    df_powerbi = metricas.adicionar_metricas(df_powerbi, ['variacao_periodo'])
+    
+    # 6. Colunas derivadas (ano, trimestre) nos tipos da politica
+    return tipos.aplicar_tipos(df_powerbi)
 
 def criar_tabela_powerbi():
     """Cria tabela otimizada para Power BI"""
     
     # Caminho correto para o banco
-    conn = sqlite3.connect('../data/ibge_analise.db')
+    conn = esquema.conectar(CAMINHO_BANCO)
     
     try:
-        # Ler dados historicos
-        df = pd.read_sql("SELECT * FROM pnad_historico", conn)
-        
-        if df.empty:
-            print("Nenhum dado encontrado")
-            return
-        
-        # TRATAMENTO PARA POWER BI
-        df_powerbi = df.copy()
-        
-        # 1. Renomear colunas para PT-BR
-        mapeamento_colunas = {
-            'V': 'taxa_desocupacao',
-            'D1N': 'localidade', 
-            'D2N': 'indicador',
-            'D3N': 'periodo',
-            'MC': 'unidade_medida',
-            'MN': 'unidade'
-        }
-        df_powerbi = df_powerbi.rename(columns=mapeamento_colunas)
-        
-        # 2. Converter tipos
-        df_powerbi['taxa_desocupacao'] = pd.to_numeric(df_powerbi['taxa_desocupacao'], errors='coerce')
-        
-        # 3. Extrair ano e trimestre do periodo
-        df_powerbi['ano'] = df_powerbi['periodo'].str.extract(r'(\d{4})')
-        df_powerbi['trimestre'] = df_powerbi['periodo'].str.extract(r'(\w{3}-\w{3}-\w{3})')
-        
-        # 4. Ordenar por periodo
-        df_powerbi = df_powerbi.sort_values('periodo')
-        
-        # 5. Calcular variacao periodica
-        df_powerbi['variacao_periodo'] = df_powerbi['taxa_desocupacao'].pct_change() * 100
-        
-        # Salvar tabela otimizada
-        df_powerbi.to_sql('powerbi_otimizado', conn, if_exists='replace', index=False)
-        
-        # Tambem salvar como CSV
-        df_powerbi.to_csv('../data/dados_powerbi_otimizado.csv', index=False, encoding='utf-8')
+        with instrumentacao.etapa('preparar') as medicao:
+            # Ler dados historicos
+            with instrumentacao.span('sql_read', tabela='pnad_historico') as leitura:
+                df = pd.read_sql("SELECT * FROM pnad_historico", conn)
+                leitura.linhas_saida = medicao.linhas_entrada = len(df)
+            
+            if df.empty:
+                print("Nenhum dado encontrado")
+                return
+            
+            # TRATAMENTO PARA POWER BI
+            with instrumentacao.span('transform'):
+                df_powerbi = transformar_para_powerbi(df)
+            medicao.linhas_saida = len(df_powerbi)
+            tipos.imprimir_memoria('preparar', tipos.uso_memoria(df), tipos.uso_memoria(df_powerbi))
+            
+            # Salvar tabela otimizada
+            with instrumentacao.span('sql_write', tabela='powerbi_otimizado') as gravacao:
+                gravacao.linhas_entrada = esquema.carregar_em_massa(conn, 'powerbi_otimizado', df_powerbi)
+            
+            # Tambem salvar como CSV
+            with instrumentacao.span('csv_write') as gravacao:
+                df_powerbi.to_csv(CAMINHO_CSV, index=False, encoding='utf-8')
+                gravacao.linhas_entrada = len(df_powerbi)
         
         print("Tabela Power BI criada com sucesso!")
         print(f"Colunas: {list(df_powerbi.columns)}")
@@ -60,8 +79,10 @@ def criar_tabela_powerbi():
         
     except Exception as e:
         print(f"Erro: {e}")
+        raise
     finally:
         conn.close()
+        instrumentacao.exportar()
 
 if __name__ == "__main__":
     criar_tabela_powerbi()
\ No newline at end of file
@@ -0,0 +1,494 @@
+# previsoes.py - DECOMPOSICAO SAZONAL E PREVISOES (HOLT-WINTERS, SAZONAL INGENUO) POR SERIE
+import json
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+import configuracao
+import esquema
+import tipos
+from periodos import TABELAS_TRIMESTRAIS, interpretar_periodos
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+
+# Uma serie = uma tabela SIDRA, uma variavel, um territorio
+CHAVE_SERIE = ['tabela', 'D2C', 'D1C']
+
+# Grade do Holt-Winters aditivo: todas as combinacoes sao ajustadas de uma vez
+# (linhas = series x combinacoes) e cada serie fica com a de menor erro
+ALFAS = (0.1, 0.3, 0.5, 0.7, 0.9)
+BETAS = (0.0, 0.05, 0.15)
+GAMAS = (0.05, 0.15, 0.3, 0.5)
+GRADE = np.array(list(product(ALFAS, BETAS, GAMAS)))
+
+MODELOS = ['holt_winters', 'sazonal_ingenuo']
+
+# Intervalo de ~95% (aproximacao normal, erro crescendo com o horizonte)
+Z_INTERVALO = 1.96
+
+# Series por bloco da grade: memoria ~ LOTE_SERIES x combinacoes x periodo sazonal
+LOTE_SERIES = 2_000
+# Abaixo disso o custo de serializar os blocos supera o ganho dos processos
+LIMIAR_PARALELO = 20_000
+
+_COLUNAS_PARAMETROS = [
+    ('periodo_sazonal', 'INTEGER NOT NULL'),     # 4 (AAAAQQ) ou 12 (trimestre movel AAAAMM)
+    ('ultimo_periodo', 'TEXT NOT NULL'),
+    ('linhas', 'INTEGER NOT NULL'),              # valores ajustados ate ultimo_periodo
+    ('soma', 'REAL NOT NULL'),                   # (detectam revisoes do historico)
+    ('alfa', 'REAL'),
+    ('beta', 'REAL'),
+    ('gama', 'REAL'),
+    ('nivel', 'REAL'),                           # estados apos ultimo_periodo
+    ('tendencia', 'REAL'),
+    ('sazonais', 'TEXT'),                        # JSON; [0] = fator do proximo periodo
+    ('sigma', 'REAL'),
+    ('periodos_desde_grade', 'INTEGER NOT NULL'),
+    ('forca_sazonal', 'REAL'),                   # 0..1, da decomposicao classica
+    ('fatores_sazonais', 'TEXT'),                # JSON; [0] = jan (AAAAMM) ou 1o trimestre
+    ('ajustado_em', 'TEXT NOT NULL')
+]
+
+
+def garantir_tabelas(conn):
+    """parametros_previsao: estado por serie (cache do ajuste); previsoes: horizonte de um ano"""
+    definicoes = [f"{coluna} TEXT NOT NULL" for coluna in CHAVE_SERIE]
+    definicoes += [f"{coluna} {tipo}" for coluna, tipo in _COLUNAS_PARAMETROS]
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS parametros_previsao (\n    " + ',\n    '.join(definicoes)
+        + f",\n    PRIMARY KEY ({', '.join(CHAVE_SERIE)})\n)"
+    )
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS previsoes (
+            tabela TEXT NOT NULL,
+            D2C TEXT NOT NULL,
+            D1C TEXT NOT NULL,
+            modelo TEXT NOT NULL,
+            D3C TEXT NOT NULL,
+            horizonte INTEGER NOT NULL,
+            origem TEXT NOT NULL,
+            previsao REAL,
+            inferior REAL,
+            superior REAL,
+            PRIMARY KEY (tabela, D2C, D1C, modelo, D3C)
+        )
+    """)
+
+
+# ---------- PERIODOS ----------
+
+def indices_periodo(codigos, tabelas):
+    """(indice sequencial, passo em meses): AAAAQQ -> ano*4 + trimestre-1; AAAAMM -> ano*12 + mes-1"""
+    periodos = interpretar_periodos(codigos, tabelas, colunas=['ano', 'mes_final'])
+    passo = np.where(pd.Index(tabelas).isin(TABELAS_TRIMESTRAIS), 3, 1)
+    meses = periodos['ano'].to_numpy(np.int64) * 12 + periodos['mes_final'].to_numpy(np.int64) - 1
+    return meses // passo, passo
+
+
+def codigos_periodo(indices, passo):
+    """Inverso de indices_periodo: codigos D3C dos indices (vetorizado)"""
+    por_ano = 12 // passo
+    numeros = (indices // por_ano) * 100 + indices % por_ano + 1
+    return numeros.astype(str)
+
+
+# ---------- MODELOS (ARRAYS series x tempo) ----------
+
+def _suavizar(valores, comprimento, alfa, beta, gama, nivel, tendencia, sazonais, linha_serie=None,
+              inicio_erro=0):
+    """Recursao do Holt-Winters aditivo, vetorizada nas linhas
+
+    valores: (series, T) alinhados a esquerda, NaN onde nao ha observacao (o
+    passo so propaga os estados); a linha i usa a serie linha_serie[i] (varias
+    combinacoes de parametros por serie) e para em comprimento[serie].
+    sazonais[:, 0] e o fator do primeiro periodo. Devolve nivel, tendencia,
+    sazonais realinhados ao periodo seguinte ao ultimo, soma dos erros
+    quadraticos e numero de erros (a partir de inicio_erro).
+    """
+    linhas = len(nivel)
+    linha_serie = np.arange(linhas) if linha_serie is None else linha_serie
+    m = sazonais.shape[1]
+    fim = comprimento[linha_serie]
+    nivel, tendencia, sazonais = nivel.copy(), tendencia.copy(), sazonais.copy()
+    soma_erros = np.zeros(linhas)
+    n_erros = np.zeros(linhas, dtype=np.int64)
+
+    for t in range(valores.shape[1]):
+        ativo = t < fim
+        y = valores[linha_serie, t]
+        fator = sazonais[:, t % m]
+        previsto = nivel + tendencia + fator
+        observado = ativo & ~np.isnan(y)
+        y = np.where(observado, y, previsto)
+        if t >= inicio_erro:
+            erro = y - previsto
+            soma_erros += erro * erro
+            n_erros += observado
+        novo_nivel = alfa * (y - fator) + (1 - alfa) * (nivel + tendencia)
+        novo_nivel = np.where(ativo, novo_nivel, nivel)
+        tendencia = np.where(ativo, beta * (novo_nivel - nivel) + (1 - beta) * tendencia, tendencia)
+        sazonais[:, t % m] = np.where(ativo, gama * (y - novo_nivel) + (1 - gama) * fator, fator)
+        nivel = novo_nivel
+
+    colunas = (np.arange(m) + fim[:, None]) % m
+    sazonais = np.take_along_axis(sazonais, colunas, axis=1)
+    return nivel, tendencia, sazonais, soma_erros, n_erros
+
+
+def _estados_iniciais(valores, m):
+    """Nivel/tendencia pelas medias dos dois primeiros ciclos; sazonais pelo primeiro"""
+    primeiro, segundo = valores[:, :m], valores[:, m:2 * m]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media1 = np.nansum(primeiro, axis=1) / (~np.isnan(primeiro)).sum(axis=1)
+        media2 = np.nansum(segundo, axis=1) / (~np.isnan(segundo)).sum(axis=1)
+    tendencia = np.nan_to_num((media2 - media1) / m)
+    media1 = np.nan_to_num(media1)
+    sazonais = np.nan_to_num(primeiro - media1[:, None])
+    sazonais -= sazonais.mean(axis=1, keepdims=True)
+    # nivel "antes" do primeiro periodo (a media do ciclo esta no meio dele)
+    return media1 - tendencia * (m + 1) / 2, tendencia, sazonais
+
+
+def ajustar_grade(valores, comprimento, m, grade=GRADE):
+    """Holt-Winters com a melhor combinacao da grade para cada serie (erro quadratico medio)"""
+    n_series, n_grade = len(valores), len(grade)
+    nivel, tendencia, sazonais = _estados_iniciais(valores, m)
+    linha_serie = np.repeat(np.arange(n_series), n_grade)
+    alfa, beta, gama = (np.tile(grade[:, i], n_series) for i in range(3))
+
+    nivel, tendencia, sazonais, soma_erros, n_erros = _suavizar(
+        valores, comprimento, alfa, beta, gama, nivel[linha_serie], tendencia[linha_serie],
+        sazonais[linha_serie], linha_serie, inicio_erro=m
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mse = (soma_erros / n_erros).reshape(n_series, n_grade)
+    melhor = np.argmin(np.where(np.isnan(mse), np.inf, mse), axis=1)
+    escolhida = np.arange(n_series) * n_grade + melhor
+    return {
+        'alfa': grade[melhor, 0], 'beta': grade[melhor, 1], 'gama': grade[melhor, 2],
+        'nivel': nivel[escolhida], 'tendencia': tendencia[escolhida], 'sazonais': sazonais[escolhida],
+        'sigma': np.sqrt(mse[np.arange(n_series), melhor]), 'erros': n_erros[escolhida]
+    }
+
+
+def _ajustar_bloco_empacotado(argumentos):
+    return ajustar_grade(*argumentos)
+
+
+def ajustar_grade_em_blocos(valores, comprimento, m, processos=None, lote=LOTE_SERIES):
+    """ajustar_grade por blocos de series; muitas series vao para um pool de processos"""
+    blocos = [(valores[i:i + lote], comprimento[i:i + lote], m) for i in range(0, len(valores), lote)]
+    processos = processos or os.cpu_count() or 1
+    if len(valores) >= LIMIAR_PARALELO and processos > 1 and len(blocos) > 1:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            resultados = list(executor.map(_ajustar_bloco_empacotado, blocos))
+    else:
+        resultados = [ajustar_grade(*bloco) for bloco in blocos]
+    return {nome: np.concatenate([resultado[nome] for resultado in resultados]) for nome in resultados[0]}
+
+
+def decompor(valores, comprimento, m):
+    """Decomposicao classica aditiva: media movel centrada 2xm, fatores por fase
+
+    Devolve (fatores (series, m) na fase local - coluna 0 = primeiro periodo da
+    serie - e forca sazonal 1 - var(resto) / var(sem tendencia), entre 0 e 1).
+    """
+    n_series, n_periodos = valores.shape
+    meio = m // 2
+    validos = ~np.isnan(valores)
+    soma = np.concatenate([np.zeros((n_series, 1)), np.cumsum(np.where(validos, valores, 0), axis=1)], axis=1)
+    contagem = np.concatenate([np.zeros((n_series, 1)), np.cumsum(validos, axis=1)], axis=1)
+
+    tendencia = np.full_like(valores, np.nan)
+    if n_periodos > m:
+        centro = np.arange(meio, n_periodos - meio)
+        janela = soma[:, centro + meio + 1] - soma[:, centro - meio]
+        completa = (contagem[:, centro + meio + 1] - contagem[:, centro - meio]) == m + 1
+        pontas = valores[:, centro - meio] + valores[:, centro + meio]
+        tendencia[:, centro] = np.where(completa, (janela - pontas / 2) / m, np.nan)
+    sem_tendencia = valores - tendencia
+
+    # media por fase: colunas completadas ate multiplo de m -> (series, ciclos, m)
+    ciclos = -(-n_periodos // m)
+    dobrado = np.full((n_series, ciclos * m), np.nan)
+    dobrado[:, :n_periodos] = sem_tendencia
+    dobrado = dobrado.reshape(n_series, ciclos, m)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fatores = np.nansum(dobrado, axis=1) / (~np.isnan(dobrado)).sum(axis=1)
+    fatores = np.nan_to_num(fatores)
+    fatores -= fatores.mean(axis=1, keepdims=True)
+
+    resto = sem_tendencia - np.tile(fatores, ciclos)[:, :n_periodos]
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        # series sem ciclo completo: var de fatia vazia
+        warnings.simplefilter('ignore', RuntimeWarning)
+        forca = 1 - np.nanvar(resto, axis=1) / np.nanvar(sem_tendencia, axis=1)
+    forca = np.clip(forca, 0, 1)
+    forca[comprimento < 2 * m] = np.nan
+    return fatores, forca
+
+
+def sazonal_ingenuo(valores, comprimento, m):
+    """Ultimo ciclo observado (o fator do proximo periodo na coluna 0) e desvio das diferencas sazonais"""
+    linhas = np.arange(len(valores))[:, None]
+    colunas = comprimento[:, None] - m + np.arange(m)
+    ultimo_ciclo = np.where(colunas >= 0, valores[linhas, np.maximum(colunas, 0)], np.nan)
+    diferencas = valores[:, m:] - valores[:, :-m]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.sqrt(np.nansum(diferencas ** 2, axis=1) / (~np.isnan(diferencas)).sum(axis=1))
+    return ultimo_ciclo, sigma
+
+
+# ---------- ATUALIZACAO INCREMENTAL ----------
+
+def _preparar(df):
+    """Chave da serie, indice sequencial do periodo e valor; ordenado por serie e periodo"""
+    dados = pd.DataFrame({coluna: df[coluna].astype(str).to_numpy() for coluna in CHAVE_SERIE + ['D3C']})
+    dados['indice'], dados['passo'] = indices_periodo(dados['D3C'], dados['tabela'])
+    dados['valor'] = tipos.para_float64(df['taxa_desocupacao']).to_numpy()
+    dados = dados.sort_values(CHAVE_SERIE + ['indice'], kind='stable', ignore_index=True)
+    dados['serie'] = dados.groupby(CHAVE_SERIE, sort=False).ngroup().to_numpy()
+    return dados
+
+
+def _matriz(serie, coluna, valores, n_series):
+    """(series, T) alinhada a esquerda a partir de codigos de serie e colunas"""
+    matriz = np.full((n_series, int(coluna.max()) + 1 if len(coluna) else 0), np.nan)
+    matriz[serie, coluna] = valores
+    return matriz
+
+
+def _classificar(dados, series, estado):
+    """Marca cada serie como 'grade' (ajuste completo), 'incremental' ou inalterada"""
+    series = series.join(estado, on=CHAVE_SERIE)
+    conhecida = series['ultimo_periodo'].notna().to_numpy() & (series['periodo_sazonal'] == series['m']).to_numpy()
+
+    # historico ja ajustado ainda igual? (mesmas linhas e soma ate ultimo_periodo)
+    ultimo_estado = series['ultimo_periodo'].fillna('').to_numpy()[dados['serie'].to_numpy()]
+    antigos = dados[dados['D3C'].to_numpy() <= ultimo_estado]
+    atual = antigos.groupby('serie')['valor'].agg(['count', 'sum']).reindex(range(len(series)), fill_value=0)
+    revisada = conhecida & (
+        (atual['count'].to_numpy() != series['linhas'].fillna(-1).to_numpy())
+        | ~np.isclose(atual['sum'].to_numpy(), series['soma'].fillna(0).to_numpy(), rtol=1e-9, atol=1e-9)
+    )
+
+    indice_estado = np.full(len(series), -1, dtype=np.int64)
+    if conhecida.any():
+        indice_estado[conhecida] = indices_periodo(
+            series.loc[conhecida, 'ultimo_periodo'], series.loc[conhecida, 'tabela']
+        )[0]
+    novos = np.where(conhecida, series['ultimo_indice'].to_numpy() - indice_estado, 0)
+    desde_grade = series['periodos_desde_grade'].fillna(0).to_numpy(np.int64) + novos
+    sem_modelo = series['alfa'].isna().to_numpy() & (series['comprimento'] >= 2 * series['m']).to_numpy()
+
+    # refaz a grade para series novas/revisadas e a cada ciclo sazonal completo de dados novos
+    grade = ~conhecida | revisada | sem_modelo | (desde_grade >= series['m'].to_numpy())
+    series['acao'] = np.select([grade, novos > 0], ['grade', 'incremental'], 'inalterada')
+    series['indice_estado'] = indice_estado
+    series['periodos_desde_grade'] = np.where(grade, 0, desde_grade)
+    return series
+
+
+def _previsoes_modelo(series, modelo, base, sazonais, sigma, tendencia=None):
+    """Linhas de previsoes para h = 1..m; base + h * tendencia + sazonal[(h - 1) % m]"""
+    m = sazonais.shape[1]
+    horizonte = np.arange(1, m + 1)
+    previsao = base[:, None] + sazonais
+    if tendencia is None:
+        escala = np.ones(m)        # sazonal ingenuo: o erro cresce a cada ciclo, aqui so ha um
+    else:
+        previsao = previsao + tendencia[:, None] * horizonte
+        escala = np.sqrt(horizonte)
+    margem = Z_INTERVALO * sigma[:, None] * escala
+    n = len(series)
+    return pd.DataFrame({
+        'tabela': np.repeat(series['tabela'].to_numpy(), m),
+        'D2C': np.repeat(series['D2C'].to_numpy(), m),
+        'D1C': np.repeat(series['D1C'].to_numpy(), m),
+        'modelo': modelo,
+        'D3C': codigos_periodo((series['ultimo_indice'].to_numpy()[:, None] + horizonte).ravel(),
+                               np.repeat(series['passo'].to_numpy(), m)),
+        'horizonte': np.tile(horizonte, n),
+        'origem': np.repeat(series['ultimo_periodo_dados'].to_numpy(), m),
+        'previsao': previsao.ravel(),
+        'inferior': (previsao - margem).ravel(),
+        'superior': (previsao + margem).ravel()
+    }).dropna(subset=['previsao'])
+
+
+def _avancar_estados(dados, sub, m):
+    """Estados guardados avancados pelos periodos novos, com os parametros guardados"""
+    local = pd.Series(np.arange(len(sub)), index=sub.index)
+    novos = dados[dados['serie'].isin(sub.index)]
+    novos = novos[novos['indice'].to_numpy() > sub['indice_estado'].reindex(novos['serie']).to_numpy()]
+    serie = local[novos['serie']].to_numpy()
+    coluna = novos['indice'].to_numpy() - sub['indice_estado'].to_numpy()[serie] - 1
+    valores = _matriz(serie, coluna, novos['valor'].to_numpy(), len(sub))
+
+    sazonais = np.array([json.loads(texto) for texto in sub['sazonais']])
+    nivel, tendencia, sazonais, soma_erros, n_erros = _suavizar(
+        valores, (sub['ultimo_indice'] - sub['indice_estado']).to_numpy(),
+        sub['alfa'].to_numpy(), sub['beta'].to_numpy(), sub['gama'].to_numpy(),
+        sub['nivel'].to_numpy(), sub['tendencia'].to_numpy(), sazonais
+    )
+    # erro medio antigo ponderado pelos periodos ajustados (os m primeiros nao contam)
+    anteriores = np.maximum(sub['linhas'].to_numpy() - m, 1)
+    sigma = np.sqrt((sub['sigma'].to_numpy() ** 2 * anteriores + soma_erros) / (anteriores + n_erros))
+    return {
+        'alfa': sub['alfa'].to_numpy(), 'beta': sub['beta'].to_numpy(), 'gama': sub['gama'].to_numpy(),
+        'nivel': nivel, 'tendencia': tendencia, 'sazonais': sazonais, 'sigma': sigma
+    }
+
+
+def _json(linhas):
+    return [None if np.isnan(linha).all() else json.dumps(np.round(linha, 6).tolist()) for linha in linhas]
+
+
+def _ajustar_periodicidade(dados, sub, m, processos):
+    """Decomposicao, sazonal ingenuo e Holt-Winters das series de mesmo periodo sazonal"""
+    local = pd.Series(np.arange(len(sub)), index=sub.index)
+    linhas = dados[dados['serie'].isin(sub.index)]
+    serie = local[linhas['serie']].to_numpy()
+    primeiro = sub['primeiro_indice'].to_numpy()
+    valores = _matriz(serie, linhas['indice'].to_numpy() - primeiro[serie], linhas['valor'].to_numpy(), len(sub))
+    comprimento = sub['comprimento'].to_numpy()
+
+    fatores, forca = decompor(valores, comprimento, m)
+    # fase local p -> fase do calendario (primeiro + p) % m
+    fatores = np.take_along_axis(fatores, (np.arange(m) - primeiro[:, None]) % m, axis=1)
+    ultimo_ciclo, sigma_ingenuo = sazonal_ingenuo(valores, comprimento, m)
+
+    modelo = {nome: np.full(len(sub), np.nan) for nome in ('alfa', 'beta', 'gama', 'nivel', 'tendencia', 'sigma')}
+    modelo['sazonais'] = np.full((len(sub), m), np.nan)
+    grade = (sub['acao'] == 'grade').to_numpy() & (comprimento >= 2 * m)
+    incremental = (sub['acao'] == 'incremental').to_numpy() & sub['alfa'].notna().to_numpy()
+    if grade.any():
+        ajuste = ajustar_grade_em_blocos(valores[grade], comprimento[grade], m, processos)
+        for nome in modelo:
+            modelo[nome][grade] = ajuste[nome]
+    if incremental.any():
+        ajuste = _avancar_estados(dados, sub[incremental], m)
+        for nome in modelo:
+            modelo[nome][incremental] = ajuste[nome]
+
+    parametros = sub[CHAVE_SERIE].copy()
+    parametros['periodo_sazonal'] = m
+    parametros['ultimo_periodo'] = sub['ultimo_periodo_dados']
+    parametros['linhas'] = sub['linhas_dados']
+    parametros['soma'] = sub['soma_dados']
+    for nome in ('alfa', 'beta', 'gama', 'nivel', 'tendencia'):
+        parametros[nome] = modelo[nome]
+    parametros['sazonais'] = _json(modelo['sazonais'])
+    parametros['sigma'] = modelo['sigma']
+    parametros['periodos_desde_grade'] = sub['periodos_desde_grade']
+    parametros['forca_sazonal'] = forca
+    parametros['fatores_sazonais'] = _json(fatores)
+    parametros['ajustado_em'] = datetime.now().isoformat(timespec='seconds')
+
+    previsoes = pd.concat([
+        _previsoes_modelo(sub, 'holt_winters', modelo['nivel'], modelo['sazonais'], modelo['sigma'],
+                          modelo['tendencia']),
+        _previsoes_modelo(sub, 'sazonal_ingenuo', np.zeros(len(sub)), ultimo_ciclo, sigma_ingenuo)
+    ], ignore_index=True)
+    return parametros, previsoes
+
+
+def _linhas_sql(df):
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def atualizar_previsoes(conn, df, processos=None, forcar=False):
+    """Ajusta as series de df (colunas de dashboard_pnad) e regrava as previsoes alteradas
+
+    Series novas, revisadas ou com um ciclo sazonal de periodos novos desde a
+    ultima grade sao ajustadas de novo; com menos periodos novos, os estados
+    guardados so avancam por eles (parametros mantidos). Series sem periodos
+    novos nao sao tocadas. Devolve {acao: numero de series}.
+    """
+    garantir_tabelas(conn)
+    if df.empty:
+        print(" Previsoes: nenhuma serie para ajustar")
+        return {'grade': 0, 'incremental': 0, 'inalterada': 0}
+    dados = _preparar(df)
+    # dados ordenados por serie: primeira/ultima linha de cada uma por posicao
+    codigos = dados['serie'].to_numpy()
+    inicios = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+    fins = np.r_[inicios[1:], len(codigos)] - 1
+    validos = ~np.isnan(dados['valor'].to_numpy())
+    series = dados.iloc[inicios][CHAVE_SERIE + ['passo']].reset_index(drop=True)
+    series['primeiro_indice'] = dados['indice'].to_numpy()[inicios]
+    series['ultimo_indice'] = dados['indice'].to_numpy()[fins]
+    series['ultimo_periodo_dados'] = dados['D3C'].to_numpy()[fins]
+    series['linhas_dados'] = np.bincount(codigos, weights=validos, minlength=len(inicios)).astype(np.int64)
+    series['soma_dados'] = np.bincount(codigos, weights=np.where(validos, dados['valor'].to_numpy(), 0),
+                                       minlength=len(inicios))
+    series['comprimento'] = series['ultimo_indice'] - series['primeiro_indice'] + 1
+    series['m'] = 12 // series['passo']
+
+    estado = pd.read_sql("SELECT * FROM parametros_previsao", conn).set_index(CHAVE_SERIE)
+    numericas = [coluna for coluna, tipo in _COLUNAS_PARAMETROS if not tipo.startswith('TEXT')]
+    estado[numericas] = estado[numericas].astype('float64')
+    series = _classificar(dados, series, estado)
+    if forcar:
+        series['acao'] = 'grade'
+        series['periodos_desde_grade'] = 0
+
+    parametros, previsoes = [], []
+    for m in series.loc[series['acao'] != 'inalterada', 'm'].unique():
+        sub = series[(series['acao'] != 'inalterada') & (series['m'] == m)]
+        resultado = _ajustar_periodicidade(dados, sub, int(m), processos)
+        parametros.append(resultado[0])
+        previsoes.append(resultado[1])
+
+    contagem = series['acao'].value_counts().to_dict()
+    if parametros:
+        parametros = pd.concat(parametros, ignore_index=True)
+        previsoes = pd.concat(previsoes, ignore_index=True)
+        colunas = CHAVE_SERIE + [coluna for coluna, _ in _COLUNAS_PARAMETROS]
+        colunas_previsao = list(previsoes.columns)
+        with conn:
+            conn.executemany(
+                f"DELETE FROM previsoes WHERE {' AND '.join(f'{c} = ?' for c in CHAVE_SERIE)}",
+                _linhas_sql(parametros[CHAVE_SERIE])
+            )
+            conn.executemany(
+                f"INSERT INTO previsoes ({', '.join(colunas_previsao)}) "
+                f"VALUES ({', '.join('?' * len(colunas_previsao))})",
+                _linhas_sql(previsoes)
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO parametros_previsao ({', '.join(colunas)}) "
+                f"VALUES ({', '.join('?' * len(colunas))})",
+                _linhas_sql(parametros[colunas])
+            )
+
+    print(f" Previsoes: {contagem.get('grade', 0)} series ajustadas na grade, "
+          f"{contagem.get('incremental', 0)} atualizadas, {contagem.get('inalterada', 0)} inalteradas")
+    return {acao: contagem.get(acao, 0) for acao in ('grade', 'incremental', 'inalterada')}
+
+
+def ler_previsoes(conn, onde='', parametros=()):
+    """Tabela previsoes (ex.: "WHERE D1C = ? AND modelo = 'holt_winters'")"""
+    garantir_tabelas(conn)
+    return pd.read_sql(f"SELECT * FROM previsoes {onde} ORDER BY tabela, D2C, D1C, modelo, D3C",
+                       conn, params=parametros)
+
+
+if __name__ == "__main__":
+    # python previsoes.py [--forcar]: ajusta a partir de dashboard_pnad (--forcar refaz a grade)
+    conn = esquema.conectar(CAMINHO_BANCO)
+    try:
+        dashboard = pd.read_sql(f"SELECT {', '.join(CHAVE_SERIE)}, D3C, taxa_desocupacao FROM dashboard_pnad", conn)
+        atualizar_previsoes(conn, dashboard, forcar='--forcar' in sys.argv)
+        print(pd.read_sql(
+            "SELECT tabela, D2C, D1C, periodo_sazonal, ultimo_periodo, alfa, beta, gama, sigma, forca_sazonal "
+            "FROM parametros_previsao ORDER BY forca_sazonal DESC LIMIT 10", conn
+        ).to_string(index=False))
+    finally:
+        conn.close()
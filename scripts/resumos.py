@@ -0,0 +1,207 @@
+# resumos.py - TABELAS DE RESUMO MATERIALIZADAS (ATUALIZACAO INCREMENTAL)
+import numpy as np
+import pandas as pd
+
+import configuracao
+import esquema
+import tipos
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+
+CHAVE_SERIE = ['tabela', 'D2C', 'D1C']
+
+# Serie de referencia dos resumos (Brasil, tabela 6381, taxa de desocupacao)
+SERIE_NACIONAL = ('6381', '4099', '1')
+
+# Valores do periodo mais recente, levados para o resumo
+COLUNAS_ULTIMO = ['ultimo_valor', 'media_movel_4p', 'variacao_periodo', 'variacao_anual']
+
+_COLUNAS_AGREGADAS = [
+    ('linhas', 'INTEGER NOT NULL'),   # linhas (periodos) recebidas
+    ('n', 'INTEGER NOT NULL'),        # linhas com valor
+    ('soma', 'REAL NOT NULL'),
+    ('minimo', 'REAL'),
+    ('maximo', 'REAL'),
+    ('primeiro_periodo', 'TEXT NOT NULL'),
+    ('ultimo_periodo', 'TEXT NOT NULL'),
+    ('ultima_data', 'DATE'),
+    ('ultimo_valor', 'REAL'),
+    ('media_movel_4p', 'REAL'),
+    ('variacao_periodo', 'REAL'),
+    ('variacao_anual', 'REAL')
+]
+
+# resumo -> (chave, colunas)
+RESUMOS = {
+    'resumo_serie': (CHAVE_SERIE, [('localidade', 'TEXT')] + _COLUNAS_AGREGADAS),
+    'resumo_anual': (CHAVE_SERIE + ['ano'], _COLUNAS_AGREGADAS)
+}
+
+SQL_VIEW_INDICADOR = """
+    CREATE VIEW IF NOT EXISTS resumo_indicador AS
+    SELECT tabela, D2C,
+           COUNT(*) AS territorios,
+           SUM(linhas) AS linhas,
+           SUM(n) AS n,
+           SUM(soma) / SUM(n) AS media,
+           MIN(minimo) AS minimo,
+           MAX(maximo) AS maximo,
+           MAX(ultimo_periodo) AS ultimo_periodo
+    FROM resumo_serie
+    GROUP BY tabela, D2C
+"""
+
+
+def garantir_tabelas(conn):
+    for resumo, (chave, colunas) in RESUMOS.items():
+        definicoes = [f"{coluna} TEXT NOT NULL" for coluna in CHAVE_SERIE]
+        if 'ano' in chave:
+            definicoes.append("ano INTEGER NOT NULL")
+        definicoes += [f"{coluna} {tipo}" for coluna, tipo in colunas]
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {resumo} (\n    " + ',\n    '.join(definicoes)
+            + f",\n    PRIMARY KEY ({', '.join(chave)})\n)"
+        )
+    conn.execute(SQL_VIEW_INDICADOR)
+
+
+def sql_mesclar(resumo):
+    """Upsert que soma contagens, combina min/max e fica com o periodo mais recente
+
+    No UPDATE do SQLite as colunas a direita do '=' sao os valores antigos.
+    """
+    chave, colunas = RESUMOS[resumo]
+    nomes = chave + [coluna for coluna, _ in colunas]
+    mais_recente = "excluded.ultimo_periodo > ultimo_periodo"
+
+    atualizacoes = []
+    for coluna, _ in colunas:
+        if coluna in ('linhas', 'n', 'soma'):
+            atualizacoes.append(f"{coluna} = {coluna} + excluded.{coluna}")
+        elif coluna in ('minimo', 'maximo'):
+            funcao = 'MIN' if coluna == 'minimo' else 'MAX'
+            atualizacoes.append(
+                f"{coluna} = COALESCE({funcao}({coluna}, excluded.{coluna}), {coluna}, excluded.{coluna})"
+            )
+        elif coluna == 'primeiro_periodo':
+            atualizacoes.append(f"{coluna} = MIN({coluna}, excluded.{coluna})")
+        elif coluna == 'ultimo_periodo':
+            atualizacoes.append(f"{coluna} = MAX({coluna}, excluded.{coluna})")
+        else:
+            atualizacoes.append(f"{coluna} = CASE WHEN {mais_recente} THEN excluded.{coluna} ELSE {coluna} END")
+
+    return (
+        f"INSERT INTO {resumo} ({', '.join(nomes)}) VALUES ({', '.join('?' * len(nomes))}) "
+        f"ON CONFLICT ({', '.join(chave)}) DO UPDATE SET {', '.join(atualizacoes)}"
+    )
+
+
+def _preparar(df):
+    """Colunas usadas nos resumos, com chaves em texto e valores em float64"""
+    dados = pd.DataFrame({coluna: df[coluna].astype(str) for coluna in CHAVE_SERIE + ['D3C']})
+    dados['ano'] = df['ano'].astype('int64').to_numpy()
+    dados['valor'] = tipos.para_float64(df['taxa_desocupacao']).to_numpy()
+    dados['data_referencia'] = pd.to_datetime(df['data_referencia']).to_numpy()
+    dados['localidade'] = df['localidade'].astype(str).to_numpy() if 'localidade' in df.columns else None
+    for coluna in ('media_movel_4p', 'variacao_periodo', 'variacao_anual'):
+        dados[coluna] = tipos.para_float64(df[coluna]).to_numpy() if coluna in df.columns else np.nan
+    return dados
+
+
+def agregar(dados, chave):
+    """Agregados por chave para as linhas recebidas"""
+    dados = dados.sort_values('D3C', kind='stable')
+    grupos = dados.groupby(chave, sort=False)
+    agregados = grupos.agg(
+        linhas=('D3C', 'size'),
+        n=('valor', 'count'),
+        soma=('valor', 'sum'),
+        minimo=('valor', 'min'),
+        maximo=('valor', 'max'),
+        primeiro_periodo=('D3C', 'first'),
+        localidade=('localidade', 'last')
+    )
+    ultimas = grupos.tail(1).set_index(chave)
+    agregados['ultimo_periodo'] = ultimas['D3C']
+    agregados['ultima_data'] = ultimas['data_referencia'].dt.strftime('%Y-%m-%d')
+    agregados['ultimo_valor'] = ultimas['valor']
+    for coluna in ('media_movel_4p', 'variacao_periodo', 'variacao_anual'):
+        agregados[coluna] = ultimas[coluna]
+    return agregados.reset_index()
+
+
+def _linhas_sql(agregados, resumo):
+    chave, colunas = RESUMOS[resumo]
+    nomes = chave + [coluna for coluna, _ in colunas]
+    tabela = agregados[nomes].astype(object).where(agregados[nomes].notna(), None)
+    return list(tabela.itertuples(index=False, name=None))
+
+
+def atualizar_resumos(conn, df):
+    """Mescla nos resumos apenas os periodos novos de cada serie
+
+    Series cujos periodos ja resumidos mudaram (revisao do IBGE, linhas
+    removidas) sao recalculadas por completo. Devolve (linhas_novas, series_recalculadas).
+    """
+    garantir_tabelas(conn)
+    dados = _preparar(df)
+
+    estado = pd.read_sql(
+        f"SELECT {', '.join(CHAVE_SERIE)}, ultimo_periodo, linhas, soma FROM resumo_serie", conn,
+        dtype={'linhas': 'int64', 'soma': 'float64'}  # tabela vazia: sem isso, colunas object
+    ).set_index(CHAVE_SERIE)
+
+    chave_linhas = pd.MultiIndex.from_frame(dados[CHAVE_SERIE])
+    ultimo = estado['ultimo_periodo'].reindex(chave_linhas).to_numpy()
+    conhecida = pd.notna(ultimo)
+    novas = ~conhecida | (dados['D3C'].to_numpy() > np.where(conhecida, ultimo, ''))
+
+    # confere os periodos ja resumidos contra o estado gravado
+    antigos = dados[~novas].groupby(CHAVE_SERIE).agg(linhas=('D3C', 'size'), soma=('valor', 'sum'))
+    comparacao = estado.join(antigos, rsuffix='_atual', how='left')
+    divergentes = comparacao[
+        (comparacao['linhas'] != comparacao['linhas_atual'].fillna(0))
+        | ~np.isclose(comparacao['soma'], comparacao['soma_atual'].fillna(0), rtol=1e-9, atol=1e-9)
+    ].index
+
+    with conn:
+        if len(divergentes):
+            for resumo in RESUMOS:
+                conn.executemany(
+                    f"DELETE FROM {resumo} WHERE {' AND '.join(f'{c} = ?' for c in CHAVE_SERIE)}",
+                    list(divergentes)
+                )
+            recalcular = chave_linhas.isin(divergentes)
+            novas = novas | recalcular
+
+        dados_novos = dados[novas]
+        if len(dados_novos):
+            for resumo, (chave, _) in RESUMOS.items():
+                conn.executemany(sql_mesclar(resumo), _linhas_sql(agregar(dados_novos, chave), resumo))
+
+    print(f" Resumos: {len(dados_novos)} linhas novas, {len(divergentes)} series recalculadas")
+    return len(dados_novos), len(divergentes)
+
+
+def ler_resumo(conn, resumo, onde='', parametros=()):
+    """Le um resumo pequeno (resumo_serie, resumo_anual ou a view resumo_indicador)"""
+    garantir_tabelas(conn)
+    return pd.read_sql(f"SELECT * FROM {resumo} {onde}", conn, params=parametros)
+
+
+def reconstruir(caminho_banco=CAMINHO_BANCO):
+    """Apaga e recalcula os resumos a partir de dashboard_pnad"""
+    conn = esquema.conectar(caminho_banco)
+    try:
+        garantir_tabelas(conn)
+        with conn:
+            for resumo in RESUMOS:
+                conn.execute(f"DELETE FROM {resumo}")
+        df = pd.read_sql("SELECT * FROM dashboard_pnad", conn)
+        atualizar_resumos(conn, df)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    reconstruir()
@@ -0,0 +1,289 @@
+# revisoes.py - SAFRAS (VINTAGES) DO SIDRA: SO AS CELULAS ALTERADAS SAO GUARDADAS
+import json
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import configuracao
+import esquema
+from consulta import Consulta
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+
+CHAVE = esquema.CHAVE
+
+# Diferenca minima em V para contar como revisao (ruido de ponto flutuante)
+TOLERANCIA = 1e-9
+
+_COLUNAS_HISTORICO = [coluna for coluna, _ in esquema.TABELAS['pnad_historico']]
+
+# Nomes e unidade (NN, MN, D1N...): o IBGE tambem revisa so os rotulos de uma celula
+COLUNAS_DESCRITIVAS = [coluna for coluna in _COLUNAS_HISTORICO if coluna not in CHAVE + ['V']]
+
+
+def garantir_tabelas(conn):
+    """safras: uma linha por carga que alterou algo; revisoes_pnad: o delta de cada celula
+
+    pnad_historico guarda sempre o valor mais recente; as revisoes guardam o
+    valor anterior (deltas reversos), entao o passado e reconstruido so a
+    partir das celulas que mudaram.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS safras (
+            safra INTEGER PRIMARY KEY,
+            criada_em TEXT NOT NULL,
+            origem TEXT,
+            linhas_recebidas INTEGER NOT NULL,
+            revisadas INTEGER NOT NULL,
+            novas INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS revisoes_pnad (
+            tabela TEXT NOT NULL,
+            D2C TEXT NOT NULL,
+            D1C TEXT NOT NULL,
+            D3C TEXT NOT NULL,
+            safra INTEGER NOT NULL,
+            existia INTEGER NOT NULL,
+            V_anterior REAL,
+            V_novo REAL,
+            anteriores TEXT,
+            PRIMARY KEY (tabela, D2C, D1C, D3C, safra)
+        )
+    """)
+    # bancos criados antes de as colunas descritivas entrarem no delta
+    colunas = {coluna for _, coluna, *_ in conn.execute("PRAGMA table_info(revisoes_pnad)")}
+    if 'anteriores' not in colunas:
+        conn.execute("ALTER TABLE revisoes_pnad ADD COLUMN anteriores TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_revisoes_pnad_safra ON revisoes_pnad (safra)")
+
+
+def diferencas(conn, df):
+    """Celulas de df que sao novas ou cujo V ou colunas descritivas diferem do gravado
+
+    Le do banco so as colunas comparadas do recorte recebido (tabelas,
+    variaveis e intervalo de periodos de df) e compara em bloco. Devolve as
+    colunas CHAVE + existia, V_anterior, V_novo, anteriores (JSON com as
+    colunas descritivas gravadas antes); o indice e a posicao da linha em df.
+    """
+    colunas_delta = CHAVE + ['existia', 'V_anterior', 'V_novo', 'anteriores']
+    if df.empty:
+        return pd.DataFrame(columns=colunas_delta)
+
+    descritivas = [coluna for coluna in COLUNAS_DESCRITIVAS if coluna in df.columns]
+    recebidos = pd.DataFrame({coluna: df[coluna].astype(str).to_numpy() for coluna in CHAVE})
+    recebidos['V_novo'] = pd.to_numeric(df['V'], errors='coerce').to_numpy(np.float64)
+    for coluna in descritivas:
+        recebidos[f"{coluna}_novo"] = df[coluna].to_numpy(object)
+
+    armazenados = (
+        Consulta('pnad_historico').colunas(*CHAVE, 'V', *descritivas)
+        .tabelas(*recebidos['tabela'].unique()).indicadores(*recebidos['D2C'].unique())
+        .periodos(recebidos['D3C'].min(), recebidos['D3C'].max())
+        .dataframe(conn, tipar=False)
+        .rename(columns={'V': 'V_anterior'})
+    )
+    juntos = recebidos.merge(armazenados, on=CHAVE, how='left', indicator='_origem')
+
+    existia = (juntos['_origem'] == 'both').to_numpy()
+    anterior = pd.to_numeric(juntos['V_anterior'], errors='coerce').to_numpy(np.float64)
+    novo = juntos['V_novo'].to_numpy(np.float64)
+    with np.errstate(invalid='ignore'):
+        alterado = (np.isnan(anterior) != np.isnan(novo)) | (np.abs(anterior - novo) > TOLERANCIA)
+    for coluna in descritivas:
+        # texto gravado x recebido; nulos dos dois lados contam como iguais
+        gravado, recebido = juntos[coluna], juntos[f"{coluna}_novo"]
+        iguais = (gravado.isna() & recebido.isna()) | (gravado.astype(str) == recebido.astype(str))
+        alterado |= ~iguais.to_numpy()
+    mudou = ~existia | alterado
+
+    deltas = juntos.loc[mudou, CHAVE + ['V_anterior', 'V_novo']]
+    deltas.insert(len(CHAVE), 'existia', existia[mudou])
+    deltas['V_anterior'] = np.where(existia[mudou], anterior[mudou], np.nan)
+    deltas['anteriores'] = [
+        json.dumps({coluna: None if pd.isna(valor) else str(valor) for coluna, valor in zip(descritivas, linha)})
+        if existiu else None
+        for existiu, linha in zip(existia[mudou], juntos.loc[mudou, descritivas].itertuples(index=False))
+    ]
+    return deltas[colunas_delta]
+
+
+def _nulo(valor):
+    return None if np.isnan(valor) else float(valor)
+
+
+def registrar_safra(conn, deltas, linhas_recebidas, origem=None, safra=None):
+    """Grava a safra e seus deltas SEM commit; devolve o numero da safra (None sem mudancas)
+
+    Feito para rodar na mesma transacao da gravacao que vem em seguida:
+    deltas e valores novos entram juntos ou nenhum entra. Com `safra`, os
+    deltas e contagens sao somados a uma safra ja criada (carga em lotes).
+    """
+    if deltas.empty:
+        return safra
+    novas = int((~deltas['existia']).sum())
+    if safra is None:
+        safra = conn.execute(
+            "INSERT INTO safras (criada_em, origem, linhas_recebidas, revisadas, novas) VALUES (?, ?, ?, ?, ?)",
+            (datetime.now().isoformat(timespec='seconds'), origem, linhas_recebidas, len(deltas) - novas, novas)
+        ).lastrowid
+    else:
+        conn.execute(
+            "UPDATE safras SET linhas_recebidas = linhas_recebidas + ?, revisadas = revisadas + ?, "
+            "novas = novas + ? WHERE safra = ?",
+            (linhas_recebidas, len(deltas) - novas, novas, safra)
+        )
+    conn.executemany(
+        f"INSERT INTO revisoes_pnad ({', '.join(CHAVE)}, safra, existia, V_anterior, V_novo, anteriores) "
+        f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (tabela, variavel, territorio, periodo, safra, int(existia), _nulo(anterior), _nulo(novo), anteriores)
+            for tabela, variavel, territorio, periodo, existia, anterior, novo, anteriores
+            in deltas.itertuples(index=False, name=None)
+        ]
+    )
+    return safra
+
+
+def gravar_com_revisoes(conn, df, origem=None):
+    """Upsert em pnad_historico so das linhas novas ou alteradas, guardando os deltas
+
+    Uma recarga completa sem revisoes nao regrava nada: o custo da escrita
+    acompanha o numero de celulas alteradas. Deltas e upsert ficam numa unica
+    transacao (a de esquema.upsert). Devolve o numero de linhas gravadas.
+    """
+    garantir_tabelas(conn)
+    deltas = diferencas(conn, df)
+    safra = registrar_safra(conn, deltas, len(df), origem)
+    try:
+        gravadas = esquema.upsert(conn, 'pnad_historico', df.iloc[deltas.index])
+    except Exception:
+        # falha antes do `with conn` do upsert (ex.: coluna nao declarada): descarta os deltas
+        conn.rollback()
+        raise
+    if safra is not None:
+        novas = int((~deltas['existia']).sum())
+        print(f" Safra {safra}: {len(deltas) - novas} celulas revisadas, {novas} novas")
+    return gravadas
+
+
+class CargaEmLotes:
+    """Carga gravada lote a lote (extrator_sidra.extrair_para_banco) como uma unica safra
+
+    Cada lote passa pelo mesmo diff de gravar_com_revisoes; a safra e criada
+    no primeiro lote com mudancas e recebe os deltas dos seguintes.
+    """
+
+    def __init__(self, conn, origem=None):
+        self.conn = conn
+        self.origem = origem
+        self.safra = None
+        self.pendentes = 0  # linhas recebidas ainda nao somadas a safra
+        self.revisadas = 0
+        self.novas = 0
+        with conn:
+            garantir_tabelas(conn)
+
+    def gravar(self, df):
+        """Diff + deltas + upsert de um lote; devolve o numero de linhas gravadas"""
+        deltas = diferencas(self.conn, df)
+        self.pendentes += len(df)
+        if deltas.empty:
+            return 0
+        try:
+            safra = registrar_safra(self.conn, deltas, self.pendentes, self.origem, self.safra)
+            gravadas = esquema.upsert(self.conn, 'pnad_historico', df.iloc[deltas.index])
+        except Exception:
+            # a safra criada neste lote (se for o caso) sai junto com os deltas
+            self.conn.rollback()
+            raise
+        self.safra, self.pendentes = safra, 0
+        novas = int((~deltas['existia']).sum())
+        self.revisadas += len(deltas) - novas
+        self.novas += novas
+        return gravadas
+
+    def concluir(self):
+        """Soma a safra as linhas dos ultimos lotes sem mudancas e imprime o resumo"""
+        if self.safra is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE safras SET linhas_recebidas = linhas_recebidas + ? WHERE safra = ?",
+                              (self.pendentes, self.safra))
+        self.pendentes = 0
+        print(f" Safra {self.safra}: {self.revisadas} celulas revisadas, {self.novas} novas")
+        return self.safra
+
+
+# ---------- CONSULTAS ----------
+
+def sql_na_safra():
+    """SELECT de pnad_historico como estava ao fim da safra informada (parametro ?)
+
+    Para cada celula, a primeira revisao posterior a safra traz os valores da
+    epoca (V_anterior e as colunas descritivas em `anteriores`; deltas
+    gravados sem elas usam as atuais); celulas incluidas depois (existia = 0)
+    ficam de fora. Le so as revisoes posteriores (indice por safra) mais o
+    historico atual.
+    """
+    outras = ', '.join(
+        f"CASE WHEN json_type(p.anteriores, '$.{coluna}') IS NULL THEN h.{coluna} "
+        f"ELSE json_extract(p.anteriores, '$.{coluna}') END AS {coluna}"
+        if coluna in COLUNAS_DESCRITIVAS else f"h.{coluna}"
+        for coluna in _COLUNAS_HISTORICO if coluna != 'V'
+    )
+    return f"""
+        WITH posteriores AS (
+            SELECT tabela, D2C, D1C, D3C, MIN(safra) AS safra, existia, V_anterior, anteriores
+            FROM revisoes_pnad
+            WHERE safra > ?
+            GROUP BY tabela, D2C, D1C, D3C
+        )
+        SELECT {outras}, CASE WHEN p.safra IS NULL THEN h.V ELSE p.V_anterior END AS V
+        FROM pnad_historico h
+        LEFT JOIN posteriores p USING (tabela, D2C, D1C, D3C)
+        WHERE p.safra IS NULL OR p.existia = 1
+    """
+
+
+def ler_na_safra(conn, safra, onde='', parametros=()):
+    """pnad_historico como estava na safra; `onde` filtra o resultado (ex.: "WHERE D1C = ?")"""
+    garantir_tabelas(conn)
+    df = pd.read_sql(f"SELECT * FROM ({sql_na_safra()}) {onde}", conn, params=(int(safra),) + tuple(parametros))
+    return df[_COLUNAS_HISTORICO]
+
+
+def revisoes_da_celula(conn, tabela, variavel, territorio, periodo):
+    """Todas as versoes de uma celula, da mais antiga para a mais recente (chave primaria)"""
+    garantir_tabelas(conn)
+    return pd.read_sql("""
+        SELECT r.safra, s.criada_em, r.existia, r.V_anterior, r.V_novo, r.anteriores
+        FROM revisoes_pnad r JOIN safras s USING (safra)
+        WHERE r.tabela = ? AND r.D2C = ? AND r.D1C = ? AND r.D3C = ?
+        ORDER BY r.safra
+    """, conn, params=(tabela, variavel, territorio, periodo))
+
+
+def listar_safras(conn):
+    garantir_tabelas(conn)
+    return pd.read_sql("SELECT * FROM safras ORDER BY safra", conn)
+
+
+if __name__ == "__main__":
+    # python revisoes.py          -> lista as safras
+    # python revisoes.py <safra>  -> celulas revisadas (nao novas) na safra
+    conn = esquema.conectar(CAMINHO_BANCO)
+    try:
+        garantir_tabelas(conn)
+        if len(sys.argv) > 1:
+            print(pd.read_sql(
+                "SELECT * FROM revisoes_pnad WHERE safra = ? AND existia = 1 ORDER BY tabela, D2C, D1C, D3C",
+                conn, params=(int(sys.argv[1]),)
+            ).to_string(index=False))
+        else:
+            print(listar_safras(conn).to_string(index=False))
+    finally:
+        conn.close()
@@ -0,0 +1,361 @@
+# servico_pnad.py - SERVICO HTTP SOMENTE LEITURA SOBRE O BANCO PNAD (ASYNCIO, CACHE LRU, ETAG)
+import asyncio
+import hashlib
+import io
+import json
+import os
+import queue
+import sqlite3
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlsplit
+from urllib.request import pathname2url
+
+import pandas as pd
+
+import configuracao
+import esquema
+from consulta import Consulta
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # dependencia opcional: sem ela formato=arrow responde 406
+    pa = None
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+PORTA = 8766
+
+# Conexoes somente leitura (e threads de consulta) abertas no inicio
+CONEXOES = 4
+
+# Orcamento do cache de respostas (corpos serializados)
+MAXIMO_CACHE_MB = 64
+
+# Pragmas de leitura (journal_mode/synchronous nao se aplicam a conexao somente leitura)
+PRAGMAS_LEITURA = {
+    'query_only': 'ON',
+    'temp_store': 'MEMORY',
+    'cache_size': -32000,  # ~32 MB por conexao
+    'mmap_size': 268435456,
+    'busy_timeout': 5000
+}
+
+TIPOS_CONTEUDO = {
+    'json': 'application/json; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Colunas aceitas em /agregados?por=
+AGRUPAMENTOS = {'ano', 'tabela', 'D1C', 'D2C', 'trimestre', 'status', 'nivel_desocupacao', 'localidade'}
+
+MEDIDAS = {
+    'linhas': ('COUNT', '*'),
+    'media': ('AVG', 'taxa_desocupacao'),
+    'minimo': ('MIN', 'taxa_desocupacao'),
+    'maximo': ('MAX', 'taxa_desocupacao')
+}
+
+MOTIVOS = {
+    200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    406: 'Not Acceptable', 500: 'Internal Server Error', 503: 'Service Unavailable'
+}
+
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class PoolLeitura:
+    """Conexoes `mode=ro` reaproveitadas; cada consulta roda numa thread do executor
+
+    Em WAL os leitores nao esperam a trava de escrita do ETL: enxergam o
+    ultimo commit ate a carga em andamento terminar.
+    """
+
+    def __init__(self, caminho_banco, tamanho=CONEXOES):
+        uri = f"file:{pathname2url(os.path.abspath(caminho_banco))}?mode=ro"
+        self.livres = queue.Queue()
+        for _ in range(tamanho):
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            for pragma, valor in PRAGMAS_LEITURA.items():
+                conn.execute(f"PRAGMA {pragma} = {valor}")
+            self.livres.put(conn)
+        self.tamanho = tamanho
+        self.executor = ThreadPoolExecutor(max_workers=tamanho, thread_name_prefix='consulta')
+
+    def _executar(self, funcao):
+        conn = self.livres.get()
+        try:
+            return funcao(conn)
+        finally:
+            self.livres.put(conn)
+
+    async def executar(self, funcao):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._executar, funcao)
+
+    def fechar(self):
+        self.executor.shutdown(wait=True)
+        for _ in range(self.tamanho):
+            self.livres.get().close()
+
+
+class CacheLRU:
+    """Respostas serializadas por chave, descartando as menos usadas acima de `limite_bytes`"""
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self.itens = OrderedDict()
+        self.bytes = 0
+        self.acertos = 0
+        self.ausencias = 0
+
+    def obter(self, chave):
+        corpo = self.itens.get(chave)
+        if corpo is None:
+            self.ausencias += 1
+            return None
+        self.itens.move_to_end(chave)
+        self.acertos += 1
+        return corpo
+
+    def guardar(self, chave, corpo):
+        if len(corpo) > self.limite_bytes:
+            return
+        if chave in self.itens:
+            self.bytes -= len(self.itens.pop(chave))
+        self.itens[chave] = corpo
+        self.bytes += len(corpo)
+        while self.bytes > self.limite_bytes:
+            _, removido = self.itens.popitem(last=False)
+            self.bytes -= len(removido)
+
+    def limpar(self):
+        self.itens.clear()
+        self.bytes = 0
+
+    def estatisticas(self):
+        return {'itens': len(self.itens), 'bytes': self.bytes, 'acertos': self.acertos,
+                'ausencias': self.ausencias}
+
+
+# ---------- ROTAS (rodam nas threads do pool) ----------
+
+def _lista(parametros, nome):
+    return [valor for item in parametros.get(nome, []) for valor in item.split(',') if valor]
+
+
+def _unico(parametros, nome):
+    valores = parametros.get(nome)
+    return valores[-1] if valores else None
+
+
+def _filtrar(consulta, parametros):
+    """territorio, indicador, tabela (listas separadas por virgula), inicio/fim (D3C), ano_inicial/ano_final"""
+    if _lista(parametros, 'territorio'):
+        consulta = consulta.territorios(*_lista(parametros, 'territorio'))
+    if _lista(parametros, 'indicador'):
+        consulta = consulta.indicadores(*_lista(parametros, 'indicador'))
+    if _lista(parametros, 'tabela'):
+        consulta = consulta.tabelas(*_lista(parametros, 'tabela'))
+    consulta = consulta.periodos(_unico(parametros, 'inicio'), _unico(parametros, 'fim'))
+    return consulta.anos(_unico(parametros, 'ano_inicial'), _unico(parametros, 'ano_final'))
+
+
+def _ler(conn, consulta):
+    sql, parametros = consulta.sql()
+    return pd.read_sql(sql, conn, params=parametros)
+
+
+def rota_series(conn, parametros):
+    """/series: linhas de dashboard_pnad (colunas=, limite= opcionais)"""
+    consulta = _filtrar(Consulta('dashboard_pnad'), parametros).ordenar('tabela', 'D2C', 'D1C', 'D3C')
+    if _lista(parametros, 'colunas'):
+        consulta = consulta.colunas(*_lista(parametros, 'colunas'))
+    if _unico(parametros, 'limite'):
+        consulta = consulta.limitar(_unico(parametros, 'limite'))
+    return _ler(conn, consulta)
+
+
+def rota_agregados(conn, parametros):
+    """/agregados: linhas, media, minimo e maximo da taxa por `por` (padrao: ano)"""
+    por = _lista(parametros, 'por') or ['ano']
+    invalidos = set(por) - AGRUPAMENTOS
+    if invalidos:
+        raise ErroRequisicao(400, f"por invalido: {', '.join(sorted(invalidos))}")
+    return _filtrar(Consulta('dashboard_pnad'), parametros).agregar(conn, por, MEDIDAS)
+
+
+def rota_ultimos(conn, parametros):
+    """/ultimos: valor mais recente de cada serie (resumo_serie materializado pelo pipeline)"""
+    return _ler(conn, _filtrar(Consulta('resumo_serie'), parametros).ordenar('tabela', 'D2C', 'D1C'))
+
+
+ROTAS = {'/series': rota_series, '/agregados': rota_agregados, '/ultimos': rota_ultimos}
+
+
+def serializar(df, formato):
+    if formato == 'json':
+        return df.to_json(orient='records', force_ascii=False).encode('utf-8')
+    if formato == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    destino = io.BytesIO()
+    with ipc.new_stream(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return destino.getvalue()
+
+
+# ---------- SERVIDOR ----------
+
+class ServicoPNAD:
+    """Atende as rotas com cache LRU por versao do pipeline e ETag
+
+    A versao e o marcador gravado por esquema.marcar_versao ao fim de cada
+    execucao do pipeline que alterou dados: quando muda, o cache e esvaziado
+    e as ETags antigas deixam de casar.
+    """
+
+    def __init__(self, caminho_banco=CAMINHO_BANCO, conexoes=CONEXOES, maximo_cache_mb=MAXIMO_CACHE_MB):
+        self.caminho_banco = caminho_banco
+        self.pool = PoolLeitura(caminho_banco, conexoes)
+        self.cache = CacheLRU(maximo_cache_mb * 1024 ** 2)
+        self.versao = esquema.ler_versao(caminho_banco)
+        self.pendentes = {}
+
+    def _versao_atual(self):
+        versao = esquema.ler_versao(self.caminho_banco)
+        if versao != self.versao:
+            self.cache.limpar()
+            self.versao = versao
+        return versao
+
+    async def _calcular(self, chave, rota, parametros, formato):
+        """Executa a rota no pool; requisicoes iguais simultaneas esperam a mesma execucao"""
+        if chave in self.pendentes:
+            return await asyncio.shield(self.pendentes[chave])
+        futuro = asyncio.ensure_future(self.pool.executar(lambda conn: serializar(rota(conn, parametros), formato)))
+        self.pendentes[chave] = futuro
+        try:
+            corpo = await futuro
+        finally:
+            del self.pendentes[chave]
+        self.cache.guardar(chave, corpo)
+        return corpo
+
+    async def responder(self, metodo, alvo, cabecalhos):
+        """(status, cabecalhos da resposta, corpo)"""
+        if metodo not in ('GET', 'HEAD'):
+            raise ErroRequisicao(405, "Somente GET e HEAD")
+        url = urlsplit(alvo)
+        if url.path == '/saude':
+            estado = {'versao': self._versao_atual(), 'cache': self.cache.estatisticas()}
+            return 200, {'Content-Type': TIPOS_CONTEUDO['json']}, json.dumps(estado).encode('utf-8')
+
+        rota = ROTAS.get(url.path)
+        if rota is None:
+            raise ErroRequisicao(404, f"Rota desconhecida: {url.path} (rotas: {', '.join(ROTAS)})")
+        parametros = parse_qs(url.query)
+        formato = _unico(parametros, 'formato') or 'json'
+        if formato not in TIPOS_CONTEUDO:
+            raise ErroRequisicao(400, f"formato invalido: {formato} ({', '.join(TIPOS_CONTEUDO)})")
+        if formato == 'arrow' and pa is None:
+            raise ErroRequisicao(406, "pyarrow nao instalado no servidor")
+
+        # chave canonica: a ordem entre parametros nao importa; todos os valores repetidos
+        # entram, na ordem recebida (listas usam todos, parametros unicos o ultimo)
+        versao = self._versao_atual()
+        chave = f"{versao}|{url.path}?{urlencode(sorted(parametros.items()), doseq=True)}"
+        etag = '"' + hashlib.sha256(chave.encode('utf-8')).hexdigest()[:32] + '"'
+        extras = {'ETag': etag, 'Cache-Control': 'no-cache', 'Content-Type': TIPOS_CONTEUDO[formato]}
+        if etag in cabecalhos.get('if-none-match', ''):
+            return 304, extras, b''
+
+        corpo = self.cache.obter(chave)
+        if corpo is None:
+            corpo = await self._calcular(chave, rota, parametros, formato)
+        return 200, extras, corpo
+
+    async def _responder_seguro(self, metodo, alvo, cabecalhos):
+        try:
+            return await self.responder(metodo, alvo, cabecalhos)
+        except ErroRequisicao as erro:
+            status, mensagem = erro.status, str(erro)
+        except (ValueError, sqlite3.OperationalError, pd.errors.DatabaseError) as erro:
+            # coluna inexistente, limite nao numerico...; sem resumos materializados: 503
+            # (pd.read_sql embrulha o erro do sqlite3 em pd.errors.DatabaseError)
+            status = 503 if 'no such table' in str(erro) else 400
+            mensagem = str(erro)
+        except Exception as erro:
+            print(f" Erro em {alvo}: {type(erro).__name__}: {erro}")
+            status, mensagem = 500, 'Erro interno'
+        corpo = json.dumps({'erro': mensagem}, ensure_ascii=False).encode('utf-8')
+        return status, {'Content-Type': TIPOS_CONTEUDO['json']}, corpo
+
+    async def atender(self, leitor, escritor):
+        """Uma conexao HTTP/1.1 (keep-alive): le requisicoes ate o cliente fechar"""
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                partes = linha.decode('latin-1').split()
+                cabecalhos = {}
+                while True:
+                    linha = await leitor.readline()
+                    if linha in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = linha.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+                if len(partes) != 3:
+                    status, extras, corpo = 400, {'Content-Type': TIPOS_CONTEUDO['json']}, b'{"erro": "requisicao invalida"}'
+                    partes = ['GET', '/', 'HTTP/1.0']
+                else:
+                    status, extras, corpo = await self._responder_seguro(partes[0], partes[1], cabecalhos)
+
+                manter = partes[2] == 'HTTP/1.1' and cabecalhos.get('connection', '').lower() != 'close'
+                resposta = [f"HTTP/1.1 {status} {MOTIVOS[status]}"]
+                resposta += [f"{nome}: {valor}" for nome, valor in extras.items()]
+                resposta += [f"Content-Length: {len(corpo)}", f"Connection: {'keep-alive' if manter else 'close'}"]
+                escritor.write(('\r\n'.join(resposta) + '\r\n\r\n').encode('latin-1'))
+                if partes[0] != 'HEAD':
+                    escritor.write(corpo)
+                await escritor.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    def fechar(self):
+        self.pool.fechar()
+
+
+async def servir(caminho_banco=CAMINHO_BANCO, porta=PORTA, host='127.0.0.1', conexoes=CONEXOES):
+    servico = ServicoPNAD(caminho_banco, conexoes)
+    servidor = await asyncio.start_server(servico.atender, host, porta, backlog=512)
+    print(f"Servico PNAD em http://{host}:{servidor.sockets[0].getsockname()[1]} "
+          f"({caminho_banco}, {conexoes} conexoes somente leitura)", flush=True)
+    print(f" Rotas: {', '.join(ROTAS)}, /saude", flush=True)
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servico.fechar()
+
+
+if __name__ == "__main__":
+    # python servico_pnad.py [porta] [caminho_banco]
+    # Ex.: curl 'http://127.0.0.1:8766/series?territorio=35&ano_inicial=2020&formato=csv'
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else PORTA
+    caminho = sys.argv[2] if len(sys.argv) > 2 else CAMINHO_BANCO
+    try:
+        asyncio.run(servir(caminho, porta))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,153 @@
+# servidor_sidra_local.py - SUBSTITUTO LOCAL DA API SIDRA
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import configuracao
+
+CABECALHO_SIDRA = {
+    'NC': 'Nível Territorial (Código)',
+    'NN': 'Nível Territorial',
+    'MC': 'Unidade de Medida (Código)',
+    'MN': 'Unidade de Medida',
+    'V': 'Valor',
+    'D1C': 'Brasil (Código)',
+    'D1N': 'Brasil',
+    'D2C': 'Variável (Código)',
+    'D2N': 'Variável',
+    'D3C': 'Trimestre Móvel (Código)',
+    'D3N': 'Trimestre Móvel'
+}
+
+# /values/t/6381/n1/all/v/4099/p/201201-201412
+PADRAO_URL = re.compile(
+    r'^/values/t/(?P<tabela>\d+)/n(?P<nivel>\d+)/(?P<territorio>[^/]+)'
+    r'/v/(?P<variavel>\d+)/p/(?P<periodos>[^/?]+)'
+)
+
+
+def carregar_registros_do_banco(caminho_banco, tabela='pnad_historico'):
+    """Carrega registros no formato SIDRA a partir de um banco existente"""
+    conn = sqlite3.connect(caminho_banco)
+    conn.row_factory = sqlite3.Row
+    try:
+        linhas = conn.execute(f"SELECT * FROM {tabela}").fetchall()
+        # o SIDRA devolve todos os campos como texto
+        return [
+            {chave: None if linha[chave] is None else str(linha[chave]) for chave in CABECALHO_SIDRA}
+            for linha in linhas
+        ]
+    finally:
+        conn.close()
+
+
+def filtrar_periodos(registros, especificacao):
+    """Aplica a sintaxe de periodos do SIDRA: all, last N, inicio-fim e listas"""
+    if especificacao == 'all':
+        return registros
+
+    codigos = sorted({r['D3C'] for r in registros})
+    selecionados = set()
+
+    for parte in especificacao.replace('%20', ' ').split(','):
+        parte = parte.strip()
+        if parte.startswith('last'):
+            quantidade = int(parte.split()[1]) if ' ' in parte else 1
+            selecionados.update(codigos[-quantidade:])
+        elif '-' in parte:
+            inicio, fim = parte.split('-')
+            selecionados.update(c for c in codigos if inicio <= c <= fim)
+        else:
+            selecionados.add(parte)
+
+    return [r for r in registros if r['D3C'] in selecionados]
+
+
+class ManipuladorSIDRA(BaseHTTPRequestHandler):
+    registros = []
+    requisicoes = []
+    atraso = 0
+
+    def do_GET(self):
+        self.requisicoes.append(self.path)
+        if self.atraso:
+            time.sleep(self.atraso)
+
+        combinacao = PADRAO_URL.match(self.path)
+
+        if not combinacao:
+            self._responder(400, {'erro': 'Parametros invalidos'})
+            return
+
+        filtrados = [
+            r for r in self.registros
+            if r['D2C'] == combinacao['variavel']
+            and r['NC'] == combinacao['nivel']
+            and (combinacao['territorio'] == 'all' or r['D1C'] in combinacao['territorio'].split(','))
+        ]
+        filtrados = filtrar_periodos(filtrados, combinacao['periodos'])
+        filtrados = sorted(filtrados, key=lambda r: (r['D1C'], r['D3C']))
+
+        self._responder(200, [CABECALHO_SIDRA] + filtrados)
+
+    def _responder(self, status, conteudo):
+        corpo = json.dumps(conteudo, ensure_ascii=False).encode('utf-8')
+        etag = '"' + hashlib.sha256(corpo).hexdigest()[:32] + '"'
+
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class ServidorSIDRA(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def criar_servidor(registros, porta=0, atraso=0):
+    """Cria o servidor HTTP com os registros informados (atraso simula latencia da API)"""
+    manipulador = type('ManipuladorSIDRALocal', (ManipuladorSIDRA,), {
+        'registros': list(registros),
+        'requisicoes': [],
+        'atraso': atraso
+    })
+    return ServidorSIDRA(('127.0.0.1', porta), manipulador)
+
+
+def iniciar_servidor(registros, porta=0, atraso=0):
+    """Sobe o servidor em uma thread e devolve (servidor, url_base)"""
+    servidor = criar_servidor(registros, porta, atraso)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+
+    url_base = f"http://127.0.0.1:{servidor.server_address[1]}"
+    return servidor, url_base
+
+
+if __name__ == "__main__":
+    registros = carregar_registros_do_banco(configuracao.CAMINHO_BANCO)
+    servidor = criar_servidor(registros, porta=8765)
+    url_base = f"http://127.0.0.1:{servidor.server_address[1]}"
+    print(f"Servidor SIDRA local em {url_base} ({len(registros)} registros)")
+    print(f"Exemplo: SIDRA_BASE_URL={url_base} python pnad_etl.py")
+
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
@@ -0,0 +1,80 @@
+# tipos.py - POLITICA DE DTYPES (MEMORIA) PARA AS ETAPAS DE TRANSFORMACAO
+import numpy as np
+import pandas as pd
+
+# Texto de baixa cardinalidade: repete o mesmo valor em milhares de linhas
+COLUNAS_CATEGORICAS = [
+    'tabela', 'NC', 'NN', 'MC', 'MN', 'D1C', 'D1N', 'D2C', 'D2N', 'D3C', 'D3N',
+    'unidade_medida', 'unidade', 'localidade', 'indicador', 'periodo', 'trimestre',
+    'status', 'nivel_desocupacao'
+]
+
+# Taxas em % com uma casa decimal: float32 basta
+COLUNAS_FLOAT32 = [
+    'V', 'taxa_desocupacao', 'variacao_periodo', 'vs_media_historica', 'media_movel_4p',
+    'variacao_anual', 'desvio_sazonal'
+]
+
+COLUNAS_INTEIRAS = {'ano': 'Int16'}
+
+POLITICA = {
+    **{coluna: 'category' for coluna in COLUNAS_CATEGORICAS},
+    **{coluna: 'float32' for coluna in COLUNAS_FLOAT32},
+    **COLUNAS_INTEIRAS
+}
+
+
+def _converter(serie, dtype):
+    if dtype == 'category':
+        return serie.astype('category')
+    # numericas: '...' e '-' do SIDRA viram NaN/NA
+    return pd.to_numeric(serie, errors='coerce').astype(dtype)
+
+
+def aplicar_tipos(df, politica=POLITICA):
+    """Converte as colunas conhecidas para os dtypes da politica
+
+    Colunas ja no dtype certo (e as fora da politica) sao reaproveitadas sem
+    copia; so as convertidas ocupam memoria nova.
+    """
+    colunas = {}
+    for coluna in df.columns:
+        dtype = politica.get(coluna)
+        serie = df[coluna]
+        if dtype is not None and serie.dtype != dtype:
+            serie = _converter(serie, dtype)
+        colunas[coluna] = serie
+    return pd.DataFrame(colunas, index=df.index, copy=False)
+
+
+def para_float64(serie):
+    """float32 -> float64 pelo menor decimal (10.1 e nao 10.100000381469727)
+
+    Usado antes de calculos derivados e na gravacao; a conversao via texto e
+    feita uma vez por valor distinto.
+    """
+    if serie.dtype != np.float32:
+        return pd.to_numeric(serie, errors='coerce').astype(np.float64)
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    unicos = np.asarray(unicos).astype(str).astype(np.float64)
+    return pd.Series(unicos[codigos], index=serie.index, name=serie.name)
+
+
+def uso_memoria(df):
+    """Bytes ocupados pelo DataFrame (inclui o conteudo das strings)"""
+    if df is None:
+        return 0
+    return int(df.memory_usage(deep=True).sum())
+
+
+def formatar_bytes(n_bytes):
+    if n_bytes < 1024 ** 2:
+        return f"{n_bytes / 1024:.1f} KB"
+    return f"{n_bytes / 1024 ** 2:.1f} MB"
+
+
+def imprimir_memoria(rotulo, antes, depois):
+    """Ex.: ' [preparar] memoria: 812.4 MB -> 96.3 MB (8.4x menor)'"""
+    reducao = f" ({antes / depois:.1f}x menor)" if depois and antes > depois else ""
+    print(f" [{rotulo}] memoria: {formatar_bytes(antes)} -> {formatar_bytes(depois)}{reducao}")
+
@@ -0,0 +1,260 @@
+# validacao.py - REGRAS DE QUALIDADE DECLARATIVAS (CHECAGENS VETORIZADAS)
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import configuracao
+from periodos import interpretar_periodos
+
+DIRETORIO_RELATORIOS = configuracao.caminho_dados('validacao')
+
+CHAVE_SERIE = ['tabela', 'D2C', 'D1C']
+
+# Colunas de valor aceitas (bruto SIDRA ou tabelas derivadas)
+COLUNAS_VALOR = ['taxa_desocupacao', 'V']
+
+MAXIMO_EXEMPLOS = 5
+
+# Bits reservados ao mes (ano * 12 + mes) na chave inteira (serie, mes)
+BITS_MES = 20
+
+# mes final -> trimestre-padrao (1-4) ou 0 (trimestre movel)
+TRIMESTRE_DO_MES = np.array([0, 0, 0, 1, 0, 0, 2, 0, 0, 3, 0, 0, 4], dtype=np.int8)
+
+
+class ErroValidacao(ValueError):
+    """Dados reprovados em regra de severidade 'erro'; `relatorio` traz o detalhe"""
+
+    def __init__(self, relatorio):
+        self.relatorio = relatorio
+        reprovadas = [regra['nome'] for regra in relatorio['regras'] if regra['bloqueia']]
+        super().__init__(f"Validacao '{relatorio['conjunto']}' reprovada nas regras: {', '.join(reprovadas)}")
+
+
+class Regra:
+    """Regra declarativa: funcao(contexto) -> posicoes (no DataFrame) das linhas que violam
+
+    A severidade depende do conjunto de regras (CONJUNTOS). Regras com
+    `vazio=True` tambem rodam sem linhas (contexto None); as demais passam.
+    """
+
+    def __init__(self, nome, descricao, funcao, vazio=False):
+        self.nome = nome
+        self.descricao = descricao
+        self.funcao = funcao
+        self.vazio = vazio
+
+
+class ContextoValidacao:
+    """Arrays calculados uma vez e compartilhados por todas as regras
+
+    `meses`, `ano`, `trimestre` e os marcadores de serie estao ordenados por
+    (serie, mes); `ordem` leva cada posicao ordenada de volta ao DataFrame.
+    `valores` fica na ordem original (regras por linha nao precisam ordenar).
+    """
+
+    def __init__(self, df):
+        self.df = df
+        n = len(df)
+
+        codigos = np.zeros(n, dtype=np.int64)
+        for coluna in CHAVE_SERIE:
+            if coluna not in df.columns:
+                continue
+            serie = df[coluna]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                atuais, n_valores = serie.cat.codes.to_numpy(np.int64), len(serie.cat.categories)
+            else:
+                atuais, unicos = pd.factorize(serie)
+                n_valores = len(unicos)
+            codigos = codigos * (n_valores + 1) + atuais + 1
+
+        tabelas = df['tabela'] if 'tabela' in df.columns else None
+        periodos = interpretar_periodos(df['D3C'], tabelas, colunas=['ano', 'mes_final'])
+        meses = periodos['ano'].to_numpy(np.int64) * 12 + periodos['mes_final'].to_numpy(np.int64)
+
+        self.coluna_valor = next(coluna for coluna in COLUNAS_VALOR if coluna in df.columns)
+        self.valores = pd.to_numeric(df[self.coluna_valor], errors='coerce').to_numpy(np.float64)
+
+        # uma ordenacao e uma unica leitura fora de ordem (serie e mes no mesmo inteiro)
+        chave = (codigos << BITS_MES) | meses
+        self.ordem = np.argsort(chave, kind='stable')
+        chave = chave[self.ordem]
+        self.meses = (chave & ((1 << BITS_MES) - 1)).astype(np.int32)
+        self.ano = (self.meses - 1) // 12
+        self.trimestre = TRIMESTRE_DO_MES[self.meses - self.ano * 12]
+
+        codigos = chave >> BITS_MES
+        self.inicio_serie = np.ones(n, dtype=bool)
+        self.inicio_serie[1:] = codigos[1:] != codigos[:-1]
+        self.fim_serie = np.ones(n, dtype=bool)
+        self.fim_serie[:-1] = self.inicio_serie[1:]
+        self.grupos = np.cumsum(self.inicio_serie) - 1
+        self.n_grupos = int(self.grupos[-1]) + 1
+
+    def posicoes(self, mascara_ordenada):
+        """Posicoes no DataFrame das linhas marcadas na ordem (serie, mes)"""
+        return np.sort(self.ordem[np.flatnonzero(mascara_ordenada)])
+
+
+# ---------- REGRAS ----------
+
+def chave_duplicada(ctx):
+    """Mesma (tabela, variavel, territorio, periodo) mais de uma vez"""
+    repetida = np.zeros(len(ctx.meses), dtype=bool)
+    repetida[1:] = ~ctx.inicio_serie[1:] & (ctx.meses[1:] == ctx.meses[:-1])
+    return ctx.posicoes(repetida)
+
+
+def lacuna_na_serie(ctx):
+    """Salto maior que um periodo entre linhas consecutivas da mesma serie
+
+    O passo esperado e 3 meses quando todos os periodos da serie sao fins de
+    trimestre (tabelas trimestrais, dados corrigidos) e 1 mes nos trimestres moveis.
+    """
+    moveis = np.bincount(ctx.grupos[ctx.trimestre == 0], minlength=ctx.n_grupos) > 0
+    passo = np.where(moveis, 1, 3)[ctx.grupos[1:]]
+
+    salto = np.zeros(len(ctx.meses), dtype=bool)
+    salto[1:] = ~ctx.inicio_serie[1:] & (np.diff(ctx.meses) > passo)
+    return ctx.posicoes(salto)
+
+
+def taxa_fora_do_intervalo(ctx):
+    """Taxa (%) fora de [0, 100]"""
+    return np.flatnonzero((ctx.valores < 0) | (ctx.valores > 100))
+
+
+def valor_ausente(ctx):
+    """Valor vazio ou nao numerico ('...', '-', texto) apos to_numeric(errors='coerce')"""
+    return np.flatnonzero(np.isnan(ctx.valores))
+
+
+def trimestres_por_ano(ctx):
+    """Ano com numero de trimestres-padrao diferente de 4
+
+    O primeiro e o ultimo ano de cada serie podem estar incompletos (< 4).
+    """
+    padrao = np.flatnonzero(ctx.trimestre > 0)
+    if not len(padrao):
+        return padrao
+    grupos, anos = ctx.grupos[padrao], ctx.ano[padrao]
+
+    # linhas ja ordenadas por (serie, mes): cada (serie, ano) e um trecho contiguo
+    inicio = np.ones(len(padrao), dtype=bool)
+    inicio[1:] = (grupos[1:] != grupos[:-1]) | (anos[1:] != anos[:-1])
+    trecho = np.cumsum(inicio) - 1
+    contagem = np.bincount(trecho)
+
+    ano_trecho, grupo_trecho = anos[inicio], grupos[inicio]
+    primeiro_ano = ctx.ano[ctx.inicio_serie][grupo_trecho]
+    ultimo_ano = ctx.ano[ctx.fim_serie][grupo_trecho]
+    extremo = (ano_trecho == primeiro_ano) | (ano_trecho == ultimo_ano)
+    invalido = (contagem > 4) | ((contagem < 4) & ~extremo)
+
+    return np.sort(ctx.ordem[padrao[invalido[trecho]]])
+
+
+def trimestre_movel(ctx):
+    """Trimestre movel sobreposto (ex.: 'fev-mar-abr') onde so cabem trimestres-padrao"""
+    return ctx.posicoes(ctx.trimestre == 0)
+
+
+def conjunto_vazio(ctx):
+    """Nenhuma linha (carga vazia nao segue adiante)"""
+    # sem linhas nao ha posicao a apontar: uma violacao do conjunto inteiro
+    return np.zeros(1 if ctx is None else 0, dtype=np.int64)
+
+
+REGRAS = {
+    'nao_vazio': Regra('nao_vazio', conjunto_vazio.__doc__, conjunto_vazio, vazio=True),
+    'chave_unica': Regra('chave_unica', chave_duplicada.__doc__, chave_duplicada),
+    'sem_lacunas': Regra('sem_lacunas', lacuna_na_serie.__doc__.splitlines()[0], lacuna_na_serie),
+    'taxa_0_100': Regra('taxa_0_100', taxa_fora_do_intervalo.__doc__, taxa_fora_do_intervalo),
+    'sem_ausentes': Regra('sem_ausentes', valor_ausente.__doc__, valor_ausente),
+    'quatro_trimestres': Regra('quatro_trimestres', trimestres_por_ano.__doc__.splitlines()[0], trimestres_por_ano),
+    'so_trimestres_padrao': Regra('so_trimestres_padrao', trimestre_movel.__doc__, trimestre_movel)
+}
+
+# Conjunto -> {regra: severidade}. 'aviso' entra no relatorio sem bloquear.
+CONJUNTOS = {
+    # bruto do SIDRA: '...' (sem dado) e legitimo
+    'historico': {
+        'nao_vazio': 'erro', 'chave_unica': 'erro', 'taxa_0_100': 'erro', 'sem_ausentes': 'aviso',
+        'sem_lacunas': 'aviso', 'quatro_trimestres': 'aviso'
+    },
+    'dashboard': {
+        'nao_vazio': 'erro', 'chave_unica': 'erro', 'taxa_0_100': 'erro', 'sem_ausentes': 'erro',
+        'sem_lacunas': 'erro', 'quatro_trimestres': 'erro'
+    },
+    'corrigido': {
+        'chave_unica': 'erro', 'taxa_0_100': 'erro', 'sem_ausentes': 'erro',
+        'sem_lacunas': 'erro', 'quatro_trimestres': 'erro', 'so_trimestres_padrao': 'erro'
+    }
+}
+
+
+def _exemplos(ctx, posicoes):
+    posicoes = posicoes[:MAXIMO_EXEMPLOS]
+    colunas = [coluna for coluna in CHAVE_SERIE + ['D3C', ctx.coluna_valor] if coluna in ctx.df.columns]
+    exemplos = ctx.df.iloc[posicoes][colunas].astype(object)
+    return exemplos.where(exemplos.notna(), None).to_dict('records')
+
+
+def validar(df, conjunto='dashboard', salvar=True, diretorio=DIRETORIO_RELATORIOS):
+    """Roda as regras do conjunto sobre df e devolve o relatorio (dict serializavel)"""
+    inicio = time.perf_counter()
+    ctx = ContextoValidacao(df) if len(df) else None
+
+    resultados = []
+    for nome, severidade in CONJUNTOS[conjunto].items():
+        regra = REGRAS[nome]
+        posicoes = regra.funcao(ctx) if ctx is not None or regra.vazio else np.empty(0, dtype=np.int64)
+        violacoes = len(posicoes)
+        resultados.append({
+            'nome': nome,
+            'descricao': regra.descricao.strip(),
+            'severidade': severidade,
+            'violacoes': violacoes,
+            'bloqueia': violacoes > 0 and severidade == 'erro',
+            'exemplos': _exemplos(ctx, posicoes) if violacoes and ctx is not None else []
+        })
+
+    relatorio = {
+        'conjunto': conjunto,
+        'executado_em': datetime.now().isoformat(timespec='seconds'),
+        'linhas': len(df),
+        'duracao_s': round(time.perf_counter() - inicio, 4),
+        'valido': not any(resultado['bloqueia'] for resultado in resultados),
+        'regras': resultados
+    }
+
+    if salvar:
+        os.makedirs(diretorio, exist_ok=True)
+        with open(os.path.join(diretorio, f"{conjunto}.json"), 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2, default=str)
+    return relatorio
+
+
+def imprimir_relatorio(relatorio):
+    situacao = 'OK' if relatorio['valido'] else 'REPROVADO'
+    print(f" Validacao '{relatorio['conjunto']}': {situacao} "
+          f"({relatorio['linhas']} linhas em {relatorio['duracao_s']:.3f} s)")
+    for regra in relatorio['regras']:
+        if regra['violacoes']:
+            print(f"  [{regra['severidade']}] {regra['nome']}: {regra['violacoes']} linhas - {regra['descricao']}")
+            for exemplo in regra['exemplos'][:3]:
+                print(f"      {exemplo}")
+
+
+def exigir_valido(df, conjunto):
+    """Valida e levanta ErroValidacao se alguma regra de erro falhar (uso no pipeline)"""
+    relatorio = validar(df, conjunto)
+    imprimir_relatorio(relatorio)
+    if not relatorio['valido']:
+        raise ErroValidacao(relatorio)
+    return relatorio
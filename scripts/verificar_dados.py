@@ -1,32 +1,78 @@
 # verificar_dados.py
-import pandas as pd
-import sqlite3
+import sys
 
-def verificar_dashboard():
+import configuracao
+import esquema
+import instrumentacao
+import resumos
+import validacao
+from consulta import Consulta
+
+CAMINHO_BANCO = configuracao.CAMINHO_BANCO
+
+def resumir_dashboard(conn):
+    """Imprime o resumo de verificacao lendo as tabelas de resumo (sem varrer o historico)"""
+    existentes = {nome for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if not existentes >= set(resumos.RESUMOS):
+        # conexao somente leitura nao cria as tabelas de resumo
+        print(" Resumos ausentes - execute pipeline.py")
+        return
+    anual = resumos.ler_resumo(conn, 'resumo_anual')
+    if anual.empty:
+        print(" Resumos vazios - execute pipeline.py")
+        return
+    
+    por_ano = anual.groupby('ano')['linhas'].sum()
+    print(f" Total de registros: {por_ano.sum()}")
+    print(f" Anos: {por_ano.index.min()} a {por_ano.index.max()}")
+    
+    print("\n Primeiras linhas:")
+    print(
+        Consulta('dashboard_pnad').colunas('periodo', 'ano', 'trimestre', 'taxa_desocupacao')
+        .ordenar('D3C').limitar(10).dataframe(conn, tipar=False)
+    )
+    
+    # serie nacional quando existe; senao a de data mais recente (D3C e AAAAMM ou AAAAQQ conforme a tabela)
+    serie = resumos.ler_resumo(
+        conn, 'resumo_serie',
+        "ORDER BY (tabela = ? AND D2C = ? AND D1C = ?) DESC, ultima_data DESC, D1C LIMIT 1",
+        resumos.SERIE_NACIONAL
+    ).iloc[0]
+    print(f"\n Taxa mais recente: {serie['ultimo_valor']:.2f}% ({serie['localidade']}, {serie['ultimo_periodo']})")
+    print(f" Média histórica: {anual['soma'].sum() / anual['n'].sum():.2f}%")
+
+def verificar_dashboard(somente_leitura=False):
+    """Valida dashboard_pnad (regras de validacao.py) e imprime o resumo; devolve True se valido
+
+    somente_leitura (pnad.py check): banco em `mode=ro`, sem migracoes,
+    metricas exportadas nem relatorio de validacao gravado.
+    """
     print(" VERIFICANDO DADOS DO DASHBOARD...")
     
-    conn = sqlite3.connect('../data/ibge_analise.db')
+    conn = esquema.conectar_leitura(CAMINHO_BANCO) if somente_leitura else esquema.conectar(CAMINHO_BANCO)
     
     try:
-        # Ler dados da tabela dashboard_pnad
-        df = pd.read_sql('SELECT * FROM dashboard_pnad', conn)
-        
-        print(f" Total de registros: {len(df)}")
-        print(f" Anos únicos: {sorted(df['ano'].unique())}")
-        
-        print("\n Períodos por ano:")
-        print(df.groupby('ano').size())
-        
-        print("\n Primeiras linhas:")
-        print(df[['periodo', 'ano', 'trimestre', 'taxa_desocupacao']].head(10))
-        
-        print(f"\n Taxa mais recente: {df['taxa_desocupacao'].iloc[-1]:.2f}%")
-        print(f" Média histórica: {df['taxa_desocupacao'].mean():.2f}%")
+        with instrumentacao.etapa('verificar') as medicao:
+            # so as colunas que as regras usam (chave da serie, periodo e taxa)
+            df = Consulta('dashboard_pnad').colunas(*validacao.CHAVE_SERIE, 'D3C', 'taxa_desocupacao').dataframe(conn)
+            medicao.linhas_entrada = len(df)
+            
+            with instrumentacao.span('validate'):
+                relatorio = validacao.validar(df, 'dashboard', salvar=not somente_leitura)
+            validacao.imprimir_relatorio(relatorio)
+            
+            # Resumos materializados pelo pipeline (etapa resumir)
+            print()
+            resumir_dashboard(conn)
+        return relatorio['valido']
         
     except Exception as e:
         print(f" Erro: {e}")
+        raise
     finally:
         conn.close()
+        # 'nenhum' so esvazia o registro de spans
+        instrumentacao.exportar('nenhum' if somente_leitura else None)
 
 if __name__ == "__main__":
-    verificar_dashboard()
\ No newline at end of file
+    sys.exit(0 if verificar_dashboard() else 1)
\ No newline at end of file
@@ -0,0 +1,14 @@
+# conftest.py - OS MODULOS FICAM EM scripts/; DADOS, CACHE E METRICAS EM UM DIRETORIO TEMPORARIO
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'scripts'))
+
+# lidos por configuracao.py na importacao: nenhum teste toca em data/
+os.environ['PNAD_DADOS'] = tempfile.mkdtemp(prefix='pnad_testes_')
+os.environ['PNAD_METRICAS'] = 'nenhum'
+os.environ.pop('PNAD_BANCO', None)
+os.environ.pop('PNAD_TERRITORIOS', None)
+os.environ.pop('PNAD_TABELAS', None)
@@ -0,0 +1,57 @@
+# test_esquema.py - MIGRACAO DO HISTORICO GRAVADO POR to_sql E UPSERT
+import sqlite3
+
+import pandas as pd
+
+import esquema
+
+
+def linha_sidra(**valores):
+    linha = dict(tabela='6381', NC='1', NN='Brasil', MC='2', MN='%', V='7.5', D1C='1', D1N='Brasil',
+                 D2C='4099', D2N='Taxa', D3C='202401', D3N='nov-dez-jan 2024')
+    linha.update(valores)
+    return linha
+
+
+def test_migracao_converte_historico_legado(tmp_path):
+    caminho = str(tmp_path / 'legado.db')
+    legado = pd.DataFrame([
+        linha_sidra(D3C='202401', V='7.5'),
+        linha_sidra(D3C='202402', V='X'),
+        linha_sidra(D3C='202403', V='..'),
+        linha_sidra(D3C='202404', V='')
+    ]).drop(columns='tabela')
+    with sqlite3.connect(caminho) as conn:
+        legado.to_sql('pnad_historico', conn, index=False)
+
+    conn = esquema.conectar(caminho)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(esquema.MIGRACOES)
+        valores = dict(conn.execute("SELECT D3C, V FROM pnad_historico").fetchall())
+        # simbolos do SIDRA viram NULL, nao 0.0
+        assert valores == {'202401': 7.5, '202402': None, '202403': None, '202404': None}
+        assert conn.execute("SELECT DISTINCT tabela FROM pnad_historico").fetchall() == [(esquema.TABELA_PADRAO,)]
+    finally:
+        conn.close()
+
+    # reabrir nao reaplica migracoes
+    conn = esquema.conectar(caminho)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM pnad_historico").fetchone()[0] == 4
+    finally:
+        conn.close()
+
+
+def test_upsert_atualiza_pela_chave(tmp_path):
+    conn = esquema.conectar(str(tmp_path / 'upsert.db'))
+    try:
+        df = pd.DataFrame([linha_sidra(D3C='202401'), linha_sidra(D3C='202402', V='7.6')])
+        esquema.upsert(conn, 'pnad_historico', df)
+        esquema.upsert(conn, 'pnad_historico', df)
+        assert conn.execute("SELECT COUNT(*) FROM pnad_historico").fetchone()[0] == 2
+
+        esquema.upsert(conn, 'pnad_historico', pd.DataFrame([linha_sidra(D3C='202402', V='8.1')]))
+        valores = dict(conn.execute("SELECT D3C, V FROM pnad_historico").fetchall())
+        assert valores == {'202401': 7.5, '202402': 8.1}
+    finally:
+        conn.close()
@@ -0,0 +1,32 @@
+# test_periodos.py - D3C EM AAAAMM (TRIMESTRE MOVEL, 6381) E AAAAQQ (TRIMESTRAL, 4099)
+import pandas as pd
+import pytest
+
+import periodos
+
+
+def test_aaaamm_trimestre_movel():
+    resultado = periodos.interpretar_periodos(['202403', '202401'], tabelas=['6381', '6381'])
+    assert resultado['ano'].tolist() == [2024, 2024]
+    assert resultado['mes_final'].tolist() == [3, 1]
+    # fevereiro-marco-abril etc. nao sao trimestres civis: trimestre_num 0
+    assert resultado['trimestre_num'].tolist() == [1, 0]
+    assert resultado['trimestre'].tolist() == ['jan-fev-mar', 'nov-dez-jan']
+    assert resultado['data_referencia'].tolist() == [pd.Timestamp('2024-03-31'), pd.Timestamp('2024-01-31')]
+
+
+def test_aaaaqq_trimestral():
+    resultado = periodos.interpretar_periodos(['202402', '202304'], tabelas=['4099', '4099'])
+    assert resultado['mes_final'].tolist() == [6, 12]
+    assert resultado['trimestre_num'].tolist() == [2, 4]
+    assert resultado['data_referencia'].tolist() == [pd.Timestamp('2024-06-30'), pd.Timestamp('2023-12-31')]
+
+
+def test_mesmo_codigo_depende_da_tabela():
+    resultado = periodos.interpretar_periodos(['202402', '202402'], tabelas=['6381', '4099'])
+    assert resultado['mes_final'].tolist() == [2, 6]
+
+
+def test_codigo_invalido():
+    with pytest.raises(ValueError):
+        periodos.interpretar_periodos(['202405'], tabelas=['4099'])
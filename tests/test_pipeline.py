@@ -0,0 +1,55 @@
+# test_pipeline.py - DAG DO PIPELINE: ETAPAS PULADAS, VALIDACAO E MARCADOR DE VERSAO
+import pandas as pd
+import pytest
+
+import esquema
+import validacao
+from pipeline import Etapa, Pipeline
+
+
+def gerar():
+    return pd.DataFrame({'a': [1, 2, 3]})
+
+
+def falhar(df):
+    raise RuntimeError("etapa quebrada")
+
+
+def test_etapas_inalteradas_nao_mudam_a_versao(tmp_path):
+    caminho = str(tmp_path / 'pipeline.db')
+    Pipeline([Etapa('gerar', gerar, tabela='saida_teste')], caminho).executar()
+    versao = esquema.ler_versao(caminho)
+    assert versao
+
+    Pipeline([Etapa('gerar', gerar, tabela='saida_teste')], caminho).executar()
+    assert esquema.ler_versao(caminho) == versao
+
+
+def test_falha_posterior_ainda_marca_a_versao(tmp_path):
+    caminho = str(tmp_path / 'pipeline.db')
+    etapas = [Etapa('gerar', gerar, tabela='saida_teste'), Etapa('falhar', falhar, ['gerar'])]
+    with pytest.raises(RuntimeError):
+        Pipeline(etapas, caminho).executar()
+    # 'gerar' gravou saida_teste: o servico precisa descartar o cache
+    assert esquema.ler_versao(caminho)
+
+
+def gerar_invalido():
+    return pd.DataFrame({'tabela': ['6381'], 'D2C': ['4099'], 'D1C': ['1'], 'D3C': ['202401'],
+                         'taxa_desocupacao': [140.0]})
+
+
+def test_validacao_reprovada_nao_grava(tmp_path):
+    caminho = str(tmp_path / 'pipeline.db')
+    etapa = Etapa('gerar', gerar_invalido, tabela='saida_teste', validacao='corrigido')
+    with pytest.raises(validacao.ErroValidacao):
+        Pipeline([etapa], caminho).executar()
+
+    conn = esquema.conectar(caminho)
+    try:
+        gravada = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'saida_teste'"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    assert not gravada
@@ -0,0 +1,94 @@
+# test_pnad_etl.py - EXTRACAO INCREMENTAL (MARCA D'AGUA) E CACHE CONTRA O SIDRA LOCAL
+import pytest
+import requests
+
+import esquema
+import pnad_etl
+from cache_sidra import CacheSIDRA
+from dados_sinteticos import gerar_registros_sidra
+from servidor_sidra_local import iniciar_servidor
+
+
+@pytest.fixture
+def sidra():
+    registros = gerar_registros_sidra(n_territorios=1, n_periodos=28, nivel='1', periodicidade='movel')
+    servidor, url = iniciar_servidor(registros[:24])
+    servidor.novos = registros[24:]
+    yield servidor, url
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_inicio_incremental():
+    # os 8 ultimos periodos gravados voltam, em meses (6381) ou trimestres (4099)
+    assert pnad_etl.inicio_incremental('202403', '6381') == '202308'
+    assert pnad_etl.inicio_incremental('202402', '4099') == '202203'
+    assert pnad_etl.inicio_incremental('202404', '4099', janela=1) == '202404'
+
+
+def test_busca_incremental_parte_da_marca_d_agua(sidra, tmp_path):
+    servidor, url = sidra
+    requisicoes = servidor.RequestHandlerClass.requisicoes
+    caminho = str(tmp_path / 'pnad.db')
+
+    primeira = pnad_etl.buscar_mais_dados_pnad(True, caminho, url, usar_cache=False)
+    assert len(primeira) == 24
+    assert requisicoes[-1].endswith('/p/all')
+
+    conn = esquema.conectar(caminho)
+    ultimo = conn.execute("SELECT MAX(D3C) FROM pnad_historico").fetchone()[0]
+    marca = conn.execute(
+        "SELECT ultimo_periodo FROM controle_extracao WHERE tabela = ? AND variavel = ?",
+        (pnad_etl.TABELA_PNAD, pnad_etl.VARIAVEL_DESOCUPACAO)
+    ).fetchone()[0]
+    conn.close()
+    assert marca == ultimo
+
+    # o IBGE publica 4 periodos novos
+    servidor.RequestHandlerClass.registros.extend(servidor.novos)
+    segunda = pnad_etl.buscar_mais_dados_pnad(True, caminho, url, usar_cache=False)
+    inicio = pnad_etl.inicio_incremental(ultimo)
+    assert f"/p/{inicio}-" in requisicoes[-1]
+    # volta so a janela de revisao mais os periodos novos; apenas estes sao gravados
+    assert len(segunda) == pnad_etl.JANELA_REVISAO + len(servidor.novos)
+
+    conn = esquema.conectar(caminho)
+    assert conn.execute("SELECT COUNT(*) FROM pnad_historico").fetchone()[0] == 28
+    assert conn.execute("SELECT COUNT(*) FROM revisoes_pnad WHERE safra = 2").fetchone()[0] == len(servidor.novos)
+    marca = conn.execute("SELECT ultimo_periodo FROM controle_extracao").fetchone()[0]
+    conn.close()
+    assert marca == max(registro['D3C'] for registro in servidor.novos)
+
+
+def buscar_http(url, cabecalhos):
+    return requests.get(url, headers=cabecalhos, stream=True, timeout=10)
+
+
+def test_cache_revalida_com_etag(sidra, tmp_path):
+    _, url = sidra
+    consulta = f"{url}/values/t/6381/n1/all/v/4099/p/all"
+    cache = CacheSIDRA(str(tmp_path / 'cache'), ttl=3600)
+
+    baixada = cache.obter(consulta, buscar_http)
+    assert baixada.origem == 'rede'
+    assert cache.obter(consulta, buscar_http).origem == 'cache'
+
+    # TTL vencido: pergunta com If-None-Match e o servidor responde 304
+    cache.ttl = 0
+    revalidada = cache.obter(consulta, buscar_http)
+    assert revalidada.origem == 'revalidado'
+    assert revalidada.hash_conteudo == baixada.hash_conteudo
+    assert (cache.ausencias, cache.acertos, cache.revalidacoes) == (1, 1, 1)
+
+
+def test_processado_por_destino(sidra, tmp_path):
+    _, url = sidra
+    consulta = f"{url}/values/t/6381/n1/all/v/4099/p/all"
+    cache = CacheSIDRA(str(tmp_path / 'cache'))
+    entrada = cache.obter(consulta, buscar_http)
+
+    destino = pnad_etl.destino_carga(str(tmp_path / 'a.db'))
+    cache.marcar_processado(consulta, entrada.hash_conteudo, destino)
+    assert cache.ja_processado(consulta, entrada.hash_conteudo, destino)
+    # o mesmo payload ainda nao foi carregado em outro banco
+    assert not cache.ja_processado(consulta, entrada.hash_conteudo, pnad_etl.destino_carga(str(tmp_path / 'b.db')))
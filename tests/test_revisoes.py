@@ -0,0 +1,65 @@
+# test_revisoes.py - SAFRAS, DELTAS E LEITURA DE VERSOES PASSADAS
+import pandas as pd
+
+import esquema
+import revisoes
+
+
+def historico(alteracoes=None):
+    linha = dict(tabela='6381', NC='1', NN='Brasil', MC='2', MN='%', V='7.5', D1C='1', D1N='Brasil',
+                 D2C='4099', D2N='Taxa', D3C='202401', D3N='nov-dez-jan 2024')
+    df = pd.DataFrame([linha, dict(linha, D3C='202402', V='7.6', D3N='dez-jan-fev 2024')])
+    for (periodo, coluna), valor in (alteracoes or {}).items():
+        df.loc[df['D3C'] == periodo, coluna] = valor
+    return df
+
+
+def contar(conn, tabela):
+    return conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+
+
+def test_recarga_sem_mudancas_nao_cria_safra():
+    conn = esquema.conectar(':memory:')
+    assert revisoes.gravar_com_revisoes(conn, historico()) == 2
+    assert revisoes.gravar_com_revisoes(conn, historico()) == 0
+    assert contar(conn, 'safras') == 1
+    assert contar(conn, 'revisoes_pnad') == 2
+    conn.close()
+
+
+def test_revisao_de_valor_e_de_rotulo():
+    conn = esquema.conectar(':memory:')
+    revisoes.gravar_com_revisoes(conn, historico())
+    revisoes.gravar_com_revisoes(conn, historico({('202401', 'V'): '7.9'}))
+    # revisao so de metadado (rotulo do periodo) tambem e uma revisao
+    revisoes.gravar_com_revisoes(conn, historico({('202401', 'V'): '7.9', ('202402', 'D3N'): 'rotulo novo'}))
+
+    celula = revisoes.revisoes_da_celula(conn, '6381', '4099', '1', '202401')
+    assert celula['V_anterior'].tolist()[1:] == [7.5]
+    assert celula['V_novo'].tolist() == [7.5, 7.9]
+
+    na_safra_1 = revisoes.ler_na_safra(conn, 1).set_index('D3C')
+    assert na_safra_1.loc['202401', 'V'] == 7.5
+    assert na_safra_1.loc['202402', 'D3N'] == 'dez-jan-fev 2024'
+    na_safra_2 = revisoes.ler_na_safra(conn, 2).set_index('D3C')
+    assert na_safra_2.loc['202401', 'V'] == 7.9
+    assert na_safra_2.loc['202402', 'D3N'] == 'dez-jan-fev 2024'
+    conn.close()
+
+
+def test_carga_em_lotes_e_uma_safra():
+    conn = esquema.conectar(':memory:')
+    df = historico()
+    carga = revisoes.CargaEmLotes(conn, origem='teste')
+    assert carga.gravar(df.iloc[:1]) == 1
+    assert carga.gravar(df.iloc[1:]) == 1
+    assert carga.gravar(df.iloc[1:]) == 0
+    assert carga.concluir() == 1
+    assert conn.execute("SELECT safra, linhas_recebidas FROM safras").fetchall() == [(1, 3)]
+    assert contar(conn, 'revisoes_pnad') == 2
+
+    carga = revisoes.CargaEmLotes(conn)
+    carga.gravar(historico({('202402', 'V'): '8.0'}))
+    assert carga.concluir() == 2
+    assert revisoes.ler_na_safra(conn, 1).set_index('D3C').loc['202402', 'V'] == 7.6
+    conn.close()
@@ -0,0 +1,89 @@
+# test_servico_pnad.py - CODIGOS DE STATUS, ETAG E CACHE DO SERVICO HTTP
+import asyncio
+import json
+
+import pytest
+
+import esquema
+import resumos
+import servico_pnad
+import tipos
+from dados_sinteticos import gerar_dashboard_sintetico
+
+
+def criar_banco(caminho, com_resumos=True):
+    df = tipos.aplicar_tipos(gerar_dashboard_sintetico(300, n_territorios=3, n_periodos=100))
+    conn = esquema.conectar(caminho)
+    try:
+        esquema.carregar_em_massa(conn, 'dashboard_pnad', df)
+        if com_resumos:
+            resumos.atualizar_resumos(conn, df)
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def banco(tmp_path):
+    caminho = str(tmp_path / 'servico.db')
+    criar_banco(caminho)
+    return caminho
+
+
+@pytest.fixture
+def servico(banco):
+    servico = servico_pnad.ServicoPNAD(banco, conexoes=1)
+    yield servico
+    servico.fechar()
+
+
+def requisitar(servico, alvo, cabecalhos=None):
+    return asyncio.run(servico._responder_seguro('GET', alvo, cabecalhos or {}))
+
+
+def test_series_responde_json(servico):
+    status, cabecalhos, corpo = requisitar(servico, '/series?territorio=11&colunas=D3C,taxa_desocupacao')
+    assert status == 200
+    linhas = json.loads(corpo)
+    assert linhas and set(linhas[0]) == {'D3C', 'taxa_desocupacao'}
+    assert cabecalhos['ETag']
+
+
+@pytest.mark.parametrize('alvo, esperado', [
+    ('/series?colunas=foo', 400),
+    ('/series?limite=abc', 400),
+    ('/agregados?por=senha', 400),
+    ('/series?formato=xml', 400),
+    ('/nada', 404)
+])
+def test_requisicoes_invalidas(servico, alvo, esperado):
+    status, _, corpo = requisitar(servico, alvo)
+    assert status == esperado
+    assert 'erro' in json.loads(corpo)
+
+
+def test_ultimos_sem_resumos_responde_503(tmp_path):
+    caminho = str(tmp_path / 'sem_resumos.db')
+    criar_banco(caminho, com_resumos=False)
+    servico = servico_pnad.ServicoPNAD(caminho, conexoes=1)
+    try:
+        assert requisitar(servico, '/ultimos')[0] == 503
+    finally:
+        servico.fechar()
+
+
+def test_etag_revalida_ate_o_pipeline_marcar_versao(servico, banco):
+    _, cabecalhos, _ = requisitar(servico, '/ultimos')
+    etag = cabecalhos['ETag']
+    assert requisitar(servico, '/ultimos', {'if-none-match': etag})[0] == 304
+
+    esquema.marcar_versao(banco)
+    status, cabecalhos, _ = requisitar(servico, '/ultimos', {'if-none-match': etag})
+    assert status == 200
+    assert cabecalhos['ETag'] != etag
+
+
+def test_chave_usa_todos_os_valores_repetidos(servico):
+    _, um, corpo_um = requisitar(servico, '/series?territorio=11')
+    _, dois, corpo_dois = requisitar(servico, '/series?territorio=11&territorio=12')
+    assert um['ETag'] != dois['ETag']
+    assert len(json.loads(corpo_dois)) > len(json.loads(corpo_um))
@@ -0,0 +1,30 @@
+# test_validacao.py - REGRAS DE ERRO BLOQUEIAM A GRAVACAO
+import pandas as pd
+import pytest
+
+import validacao
+from dados_sinteticos import gerar_dashboard_sintetico
+
+
+@pytest.fixture
+def dashboard():
+    return gerar_dashboard_sintetico(120, n_territorios=3, n_periodos=40)
+
+
+def test_dashboard_sintetico_e_valido(dashboard):
+    assert validacao.validar(dashboard, 'dashboard', salvar=False)['valido']
+
+
+def test_vazio_bloqueia(dashboard):
+    with pytest.raises(validacao.ErroValidacao) as erro:
+        validacao.exigir_valido(dashboard.iloc[:0], 'dashboard')
+    assert 'nao_vazio' in str(erro.value)
+
+
+def test_taxa_fora_do_intervalo_e_chave_duplicada(dashboard):
+    invalido = pd.concat([dashboard, dashboard.iloc[[1]]], ignore_index=True)
+    invalido.loc[0, 'taxa_desocupacao'] = 140.0
+    relatorio = validacao.validar(invalido, 'dashboard', salvar=False)
+    bloqueadas = {regra['nome'] for regra in relatorio['regras'] if regra['bloqueia']}
+    assert not relatorio['valido']
+    assert {'taxa_0_100', 'chave_unica'} <= bloqueadas